@@ -0,0 +1,135 @@
+"""
+Альбомы фото (middlewares/media_group.py): сколько ответов и записей в FSM
+стоит альбом из --photos фото.
+
+Через диспетчер (Bot API — заглушка) альбом отправляют админ на шаге фото
+товара (AddProductStates.waiting_for_photos) и покупатель на шаге фото
+заказа (OrderStates.images): части альбома приходят отдельными апдейтами
+с паузой --gap-ms и обрабатываются параллельно, как при polling. Печатает
+ответы бота и записи в FSM на альбом без MediaGroupMiddleware и с ним.
+
+Проверки (код выхода 1 при ошибке): с middleware альбом — один ответ и одна
+запись в FSM, в данных все фото в порядке сообщений; одиночное фото и
+следующий альбом дописываются к уже сохранённым.
+
+    python -m benchmarks.album_bench --photos 10
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+
+from aiogram.fsm.state import State
+
+from benchmarks.fake_telegram import FakeSession
+from benchmarks.stateless_nav_bench import CountingStorage
+from fsm import AddProductStates, OrderStates
+from middlewares.media_group import media_groups
+
+
+ADMIN_ID = 5129105635
+USER_ID = 40_000_003
+
+_ids = itertools.count(1)
+
+
+def photo(user_id: int, media_group_id: str | None, file_id: str) -> dict:
+    message_id = next(_ids)
+    message = {
+        "message_id": message_id, "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+        "photo": [{"file_id": file_id, "file_unique_id": f"u{file_id}", "width": 1280, "height": 960}],
+    }
+    if media_group_id:
+        message["media_group_id"] = media_group_id
+    return {"update_id": message_id, "message": message}
+
+
+async def send_album(dp, bot, user_id: int, file_ids: list[str], gap: float) -> None:
+    """Части альбома — отдельные апдейты, обрабатываются параллельно"""
+    media_group_id = f"album{next(_ids)}"
+    tasks = []
+    for file_id in file_ids:
+        tasks.append(asyncio.create_task(dp.feed_raw_update(bot, photo(user_id, media_group_id, file_id))))
+        await asyncio.sleep(gap)
+    await asyncio.gather(*tasks)
+
+
+async def scenario(dp, bot, api, storage, user_id: int, state: State, key: str, args, failures, label: str):
+    """Альбом, одиночное фото и ещё один альбом; возвращает (ответов, записей) на первый альбом"""
+    context = dp.fsm.get_context(bot, chat_id=user_id, user_id=user_id)
+    await context.set_state(state)
+    await context.set_data({})
+
+    def stored() -> list[str]:
+        items = storage.storage[context.key].data.get(key, [])
+        return [item["file_id"] if isinstance(item, dict) else item for item in items]
+
+    first = [f"{label}-a{i}" for i in range(args.photos)]
+    replies, writes = api.calls["sendMessage"], storage.calls["set_data"]
+    await send_album(dp, bot, user_id, first, args.gap_ms / 1000)
+    replies, writes = api.calls["sendMessage"] - replies, storage.calls["set_data"] - writes
+
+    single, second = f"{label}-s", [f"{label}-b{i}" for i in range(args.photos)]
+    await dp.feed_raw_update(bot, photo(user_id, None, single))
+    await send_album(dp, bot, user_id, second, args.gap_ms / 1000)
+    if sorted(stored()) != sorted(first + [single] + second):
+        failures.append(f"{label}: сохранены не все фото: {len(stored())} из {2 * args.photos + 1}")
+    return replies, writes, stored()[:args.photos] == first
+
+
+async def run(args) -> int:
+    from main import create_bot, create_dispatcher
+
+    api = FakeSession()
+    bot = create_bot(session=api, rate_limit=False)
+    dp = create_dispatcher()
+    storage = CountingStorage()
+    dp.fsm.storage = storage
+    media_groups.window = args.window_ms / 1000
+
+    failures = []
+    scenarios = (
+        ("админ", ADMIN_ID, AddProductStates.waiting_for_photos, "photos"),
+        ("покупатель", USER_ID, OrderStates.images, "images"),
+    )
+    print(f"фото в альбоме: {args.photos}, пауза между частями {args.gap_ms} мс, "
+          f"окно {args.window_ms} мс\n")
+    print(f"{'':<14}{'ответов на альбом':>26}{'записей в FSM':>22}")
+    try:
+        for label, user_id, state, key in scenarios:
+            dp.message.middleware.unregister(media_groups)
+            # без middleware части альбома гоняются за одними данными FSM: часть фото теряется
+            old_replies, old_writes, _ = await scenario(
+                dp, bot, api, storage, user_id, state, key, args, [], f"{label}-old"
+            )
+            dp.message.middleware(media_groups)
+            replies, writes, ordered = await scenario(dp, bot, api, storage, user_id, state, key, args, failures, label)
+            print(f"{label:<14}{f'{old_replies} → {replies}':>26}{f'{old_writes} → {writes}':>22}")
+
+            if replies != 1 or writes != 1:
+                failures.append(f"{label}: альбом — {replies} ответов и {writes} записей в FSM")
+            if not ordered:
+                failures.append(f"{label}: фото альбома не в порядке сообщений")
+    finally:
+        await bot.session.close()
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("\nOK")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--gap-ms", type=float, default=5)
+    parser.add_argument("--window-ms", type=float, default=50)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
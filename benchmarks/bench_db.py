@@ -0,0 +1,82 @@
+"""
+Отдельная база для прогона: своя схема в PostgreSQL или временный файл SQLite.
+
+    async with bench_database(args.url, "scenario_load") as engine:
+        await migrate(engine, skip=["0002"])
+
+--url sqlite (или любой sqlite+aiosqlite://...) — файл во временном
+каталоге с теми же PRAGMA, что у бота (databases/engine.py); он удаляется
+после прогона, путь из URL не используется.
+"""
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from databases.engine import load_profile, make_engine
+
+
+def series(count: str, *more: str) -> str:
+    """
+    WITH RECURSIVE с рядом series(g) = 1..count (для следующих аргументов —
+    series2, series3, ...) вместо generate_series, которого нет в SQLite.
+    count — число или выражение от параметров запроса.
+    """
+    ctes = []
+    for number, limit in enumerate((count, *more), start=1):
+        name = "series" if number == 1 else f"series{number}"
+        ctes.append(f"{name}(g) AS (SELECT 1 UNION ALL SELECT g + 1 FROM {name} WHERE g < {limit})")
+    return f"WITH RECURSIVE {', '.join(ctes)} "
+
+
+# Ряд 1..:count
+SERIES = series(":count")
+
+
+def is_postgresql(url: str) -> bool:
+    return url.startswith("postgresql")
+
+
+def require_postgresql(url: str, reason: str) -> None:
+    """Выйти с понятным сообщением, если прогон возможен только на PostgreSQL"""
+    if not is_postgresql(url):
+        raise SystemExit(f"--url {url.split(':', 1)[0]}: этот прогон только для PostgreSQL ({reason})")
+
+
+def connect_args(url: str, search_path: str) -> dict:
+    """connect_args для ещё одного движка на ту же базу прогона (схема задаётся только в PostgreSQL)"""
+    return {"server_settings": {"search_path": search_path}} if is_postgresql(url) else {}
+
+
+@asynccontextmanager
+async def bench_database(
+    url: str, schema: str, search_path: str | None = None, keep: bool = False,
+) -> AsyncIterator[AsyncEngine]:
+    """
+    search_path — если кроме схемы прогона нужны другие (расширения в public);
+    keep — не удалять схему PostgreSQL после прогона (файл SQLite удаляется всегда).
+    """
+    if not is_postgresql(url):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f"{schema}.db"
+            engine = make_engine(f"sqlite+aiosqlite:///{path}", profile=load_profile("bench"))
+            try:
+                yield engine
+            finally:
+                await engine.dispose()
+        return
+
+    engine = create_async_engine(url, pool_size=20, connect_args=connect_args(url, search_path or schema))
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        yield engine
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await engine.dispose()
@@ -0,0 +1,216 @@
+"""
+Компактные callback_data (handlers/callback_codec.py) против aiogram
+CallbackData: длина, pack/unpack и фильтр хендлера.
+
+Прежние классы навигации воспроизведены здесь на CallbackData с теми же
+префиксами и полями. Замеры — на --samples случайных кнопках каждого класса.
+
+Проверки свойств (код выхода 1 при ошибке), на тех же случайных кнопках:
+  unpack(pack(x)) == x и pack(x) не длиннее 64 байт;
+  кнопку одного класса не принимает фильтр другого;
+  прежний текстовый формат разбирается в тот же объект (поля, которых в
+  нём не было, — значения по умолчанию);
+  случайные и испорченные строки не роняют unpack (он возвращает None).
+
+    python -m benchmarks.callback_codec_bench --samples 20000
+"""
+import argparse
+import asyncio
+import dataclasses
+import random
+import string
+import sys
+import time
+import typing
+from typing import Literal, Optional
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, User
+
+from handlers.callback_codec import CALLBACK_DATA_LIMIT
+from handlers.callbacks import (
+    AskCallback, BackCallback, CategoryCallback, PageCallback, ProductCallback, ProductDetailCallback,
+    SubcategoryCallback,
+)
+
+
+class OldCategory(CallbackData, prefix="category"):
+    category_id: int
+
+
+class OldSubcategory(CallbackData, prefix="subcat"):
+    subcategory_id: int
+
+
+class OldProduct(CallbackData, prefix="product"):
+    product_id: int
+
+
+class OldProductDetail(CallbackData, prefix="product_detail"):
+    product_detail_id: int
+    action: Literal["view", "add_to_cart", "ask_question"] = "view"
+
+
+class OldAsk(CallbackData, prefix="ask"):
+    pass
+
+
+class OldBack(CallbackData, prefix="back"):
+    to: Literal["categories", "subcategories", "products", "product_detail"]
+    parent_id: Optional[int] = None
+
+
+class OldPage(CallbackData, prefix="page"):
+    screen: Literal["catalog", "category", "subcategory", "admin_edit", "admin_delete"]
+    parent_id: int = 0
+    after: int = 0
+    before: int = 0
+
+
+PAIRS = [
+    (CategoryCallback, OldCategory), (SubcategoryCallback, OldSubcategory), (ProductCallback, OldProduct),
+    (ProductDetailCallback, OldProductDetail), (AskCallback, OldAsk), (BackCallback, OldBack),
+    (PageCallback, OldPage),
+]
+
+USER = User(id=1, is_bot=False, first_name="Bench")
+
+
+def random_int(rng: random.Random) -> int:
+    # id из БД обычно небольшие, но кодек обязан выдерживать любые до int64
+    return rng.choice((0, 1, rng.randrange(128), rng.randrange(100_000), rng.randrange(2**31), rng.randrange(2**63)))
+
+
+def random_value(rng: random.Random, field) -> object:
+    if field.optional and rng.random() < 0.3:
+        return None
+    if field.choices is not None:
+        return rng.choice(field.choices)
+    return random_int(rng)
+
+
+def random_button(rng: random.Random, cls):
+    return cls(**{field.name: random_value(rng, field) for field in cls.__fields__})
+
+
+def fields_of(button) -> dict:
+    return {field.name: getattr(button, field.name) for field in button.__fields__}
+
+
+def garbage(rng: random.Random, packed: str) -> str:
+    """Случайная строка или испорченная кнопка"""
+    alphabet = string.ascii_letters + string.digits + "-_:=+/ "
+    kind = rng.randrange(3)
+    if kind == 0:
+        return "".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 65)))
+    if kind == 1:
+        return packed[:rng.randrange(1, len(packed) + 1)] + "".join(rng.choice(alphabet) for _ in range(rng.randrange(4)))
+    position = rng.randrange(len(packed))
+    return packed[:position] + rng.choice(alphabet) + packed[position + 1:]
+
+
+def as_legacy(button, old_cls):
+    """Объект, который должен получиться из кнопки прежнего формата"""
+    added = {field.name: field.default for field in button.__fields__ if field.name not in old_cls.model_fields}
+    return dataclasses.replace(button, **added)
+
+
+def old_pack(button: CallbackData) -> str | None:
+    """Прежний формат; None — не влезает в 64 байта"""
+    try:
+        return button.pack()
+    except ValueError:
+        return None
+
+
+def per_call(fn, items, rounds: int = 3) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - started) / (rounds * len(items))
+
+
+async def per_filter_call(flt, events, rounds: int = 3) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            await flt(event)
+    return (time.perf_counter() - started) / (rounds * len(events))
+
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    failures: list[str] = []
+
+    def fail(message: str) -> None:
+        if len(failures) < 20:
+            failures.append(message)
+
+    print(f"{'класс':<24}{'длина было/стало':>18}{'pack, мкс':>16}{'unpack, мкс':>16}{'фильтр, мкс':>16}")
+    for cls, old_cls in PAIRS:
+        buttons = [random_button(rng, cls) for _ in range(args.samples)]
+        old_buttons = [old_cls(**{k: v for k, v in fields_of(button).items() if k in old_cls.model_fields})
+                       for button in buttons]
+        packed = [button.pack() for button in buttons]
+        old_packed = [old_pack(button) for button in old_buttons]
+        too_long = sum(data is None for data in old_packed)
+
+        # свойства
+        for button, data, legacy in zip(buttons, packed, old_packed):
+            if cls.unpack(data) != button:
+                fail(f"{cls.__name__}: {button} → {data!r} → {cls.unpack(data)}")
+            if len(data.encode()) > CALLBACK_DATA_LIMIT:
+                fail(f"{cls.__name__}: {data!r} длиннее {CALLBACK_DATA_LIMIT} байт")
+            if legacy is not None and cls.unpack(legacy) != as_legacy(button, old_cls):
+                fail(f"{cls.__name__}: прежний формат {legacy!r} → {cls.unpack(legacy)}")
+            for other, _ in PAIRS:
+                if other is not cls and (other.unpack(data) is not None or other.unpack(legacy) is not None):
+                    fail(f"{other.__name__} принял кнопку {cls.__name__} {data!r}")
+            try:
+                cls.unpack(garbage(rng, data))
+            except Exception as e:
+                fail(f"{cls.__name__}: unpack упал на испорченной строке: {e!r}")
+
+        # замеры
+        fits = [i for i, data in enumerate(old_packed) if data is not None]
+        buttons, old_buttons = [buttons[i] for i in fits], [old_buttons[i] for i in fits]
+        packed, old_packed = [packed[i] for i in fits], [old_packed[i] for i in fits]
+        events = [CallbackQuery(id="1", from_user=USER, chat_instance="1", data=data) for data in packed]
+        old_events = [CallbackQuery(id="1", from_user=USER, chat_instance="1", data=data) for data in old_packed]
+        old_len = max(len(data) for data in old_packed)
+        new_len = max(len(data) for data in packed)
+        if too_long:
+            print(f"  {cls.__name__}: {too_long} из {args.samples} кнопок в прежнем формате длиннее 64 байт")
+        timings = [
+            (per_call(old_cls.pack, old_buttons), per_call(cls.pack, buttons)),
+            (per_call(old_cls.unpack, old_packed), per_call(cls.unpack, packed)),
+            (await per_filter_call(old_cls.filter(), old_events), await per_filter_call(cls.filter(), events)),
+        ]
+        cells = "".join(f"{old * 1e6:>8.2f} → {new * 1e6:<5.2f}" for old, new in timings)
+        print(f"{cls.__name__:<24}{f'{old_len} → {new_len}':>18}{cells}")
+
+    # PageCallback с курсорами на пределе int64 — прежний формат не влезал
+    widest = PageCallback(screen="subcategory", parent_id=2**63 - 1, after=2**63 - 1, before=2**63 - 1)
+    old_widest = f"page:{widest.screen}:{widest.parent_id}:{widest.after}:{widest.before}"
+    print(f"\nPageCallback с курсорами int64: было {len(old_widest)}, "
+          f"стало {len(widest.pack())} символов (предел {CALLBACK_DATA_LIMIT})")
+    if typing.get_args(PageCallback.__annotations__["screen"]) != typing.get_args(OldPage.__annotations__["screen"]):
+        fail("порядок значений screen изменился: старые кнопки разберутся неверно")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("\nOK")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Выбор хендлера колбэка: перебор фильтров aiogram и индекс IndexedRouter
+(handlers/callback_index.py).
+
+Микробенчмарк: --handlers хендлеров на одном роутере (три четверти —
+F.data == "action_N", остальные — F.data.startswith("item_N_")), колбэки
+на каждый из них по кругу; печатает среднее время выбора хендлера и время
+для последнего зарегистрированного. Синхронные фильтры (F.data ...) aiogram
+вызывает через asyncio.to_thread, так что перебор — это переход в поток
+на каждый хендлер выше нужного.
+
+Проверка (код выхода 1 при ошибке): в синтетическом роутере и в настоящих
+admin_router / user_router индекс выбирает тот же хендлер, что перебор, —
+для всех зарегистрированных строк и префиксов во всех состояниях FSM.
+
+    python -m benchmarks.callback_dispatch_bench --handlers 200
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from aiogram import F, Router
+from aiogram.fsm.state import StatesGroup
+from aiogram.types import CallbackQuery, User
+
+import fsm
+from handlers.callback_index import IndexedRouter, callback_keys
+
+
+USER = User(id=1, is_bot=False, first_name="Bench")
+
+
+def callback(data: str) -> CallbackQuery:
+    return CallbackQuery(id="1", from_user=USER, chat_instance="1", data=data)
+
+
+def build(router: Router, handlers: int) -> list[str]:
+    """Зарегистрировать хендлеры и вернуть data, на которые они отвечают"""
+    samples = []
+    for i in range(handlers):
+        async def handler(callback_query: CallbackQuery, i=i) -> int:
+            return i
+
+        if i % 4 == 3:
+            router.callback_query.register(handler, F.data.startswith(f"item_{i:03d}_"))
+            samples.append(f"item_{i:03d}_42")
+        else:
+            router.callback_query.register(handler, F.data == f"action_{i:03d}")
+            samples.append(f"action_{i:03d}")
+    return samples
+
+
+async def per_dispatch(observer, events: list[CallbackQuery], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            await observer.trigger(event)
+    return (time.perf_counter() - started) / (rounds * len(events))
+
+
+async def first_match(handlers, event, **kwargs):
+    for handler in handlers:
+        result, _ = await handler.check(event, **kwargs)
+        if result:
+            return handler
+    return None
+
+
+def fsm_states() -> list[str | None]:
+    states: list[str | None] = [None]
+    for value in vars(fsm).values():
+        if isinstance(value, type) and issubclass(value, StatesGroup) and value is not StatesGroup:
+            states.extend(state.state for state in value.__all_states__)
+    return states
+
+
+def router_samples(router: Router) -> list[str]:
+    samples = set()
+    for handler in router.callback_query.handlers:
+        keys = callback_keys(handler)
+        if keys is None:
+            continue
+        kind, values = keys
+        for value in values:
+            samples.add(value if kind == "exact" else f"{value}1")
+            samples.add(f"{value}x")
+    return sorted(samples)
+
+
+async def compare(router: Router, samples: list[str], states: list[str | None], failures: list) -> int:
+    """Индекс против перебора: тот же хендлер для каждой пары data и состояние"""
+    index = router.callback_query.compile()
+    checked = 0
+    for data in samples:
+        event = callback(data)
+        for state in states:
+            linear = await first_match(router.callback_query.handlers, event, raw_state=state)
+            indexed = await first_match(index.candidates(data), event, raw_state=state)
+            checked += 1
+            if linear is not indexed:
+                names = [getattr(h, "callback", None).__name__ if h else None for h in (linear, indexed)]
+                failures.append(f"{router.name}: {data!r} в {state}: перебор {names[0]}, индекс {names[1]}")
+    return checked
+
+
+async def run(args) -> int:
+    failures = []
+
+    plain, indexed = Router(name="plain"), IndexedRouter(name="indexed")
+    samples = build(plain, args.handlers)
+    build(indexed, args.handlers)
+    events = [callback(data) for data in samples]
+
+    for event in events:
+        if await plain.callback_query.trigger(event) != await indexed.callback_query.trigger(event):
+            failures.append(f"синтетический роутер: разные хендлеры для {event.data!r}")
+
+    print(f"хендлеров на роутере: {args.handlers}\n")
+    print(f"{'':<22}{'в среднем, мкс':>16}{'последний, мкс':>16}")
+    for name, router in (("перебор aiogram", plain), ("индекс", indexed)):
+        average = await per_dispatch(router.callback_query, events, args.rounds)
+        last = await per_dispatch(router.callback_query, events[-1:], args.rounds * 20)
+        print(f"{name:<22}{average * 1e6:>16.1f}{last * 1e6:>16.1f}")
+
+    from handlers.for_admin_handlers import admin_router
+    from handlers.for_users_handler import user_router
+
+    states = fsm_states()
+    print()
+    for name, router in (("admin_router", admin_router), ("user_router", user_router)):
+        checked = await compare(router, router_samples(router), states, failures)
+        print(f"{name}: {len(router.callback_query.handlers)} хендлеров, "
+              f"сверено {checked} пар data × состояние")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("\nOK")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
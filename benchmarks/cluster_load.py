@@ -0,0 +1,87 @@
+"""
+Масштабирование режима кластера по числу воркеров.
+
+Каждый воркер — настоящий Dispatcher с роутерами бота и FakeSession вместо
+Bot API; на каждый вызов API сессия тратит --cpu-ms миллисекунд CPU, изображая
+тяжёлый обработчик (например, форматирование списка всех товаров).
+
+    python -m benchmarks.cluster_load --workers 1 2 4 --updates 4000
+"""
+import argparse
+import functools
+import os
+import time
+
+from benchmarks.fake_telegram import FakeSession
+from benchmarks.webhook_load import make_update
+from cluster import Supervisor
+
+
+class BurnSession(FakeSession):
+    def __init__(self, cpu_ms: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.cpu_ms = cpu_ms
+
+    async def make_request(self, bot, method, timeout=None):
+        deadline = time.process_time() + self.cpu_ms / 1000
+        while time.process_time() < deadline:
+            pass
+        return await super().make_request(bot, method, timeout)
+
+
+def wait_processed(supervisor: Supervisor, target: int, timeout: float) -> tuple[float, int]:
+    """Ждать, пока воркеры обработают target апдейтов; вернуть время и макс. глубину очереди"""
+    started = time.perf_counter()
+    max_depth = 0
+    while supervisor.processed < target:
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"обработано {supervisor.processed} из {target}")
+        max_depth = max(max_depth, *(m["queue_depth"] for m in supervisor.metrics()))
+        time.sleep(0.005)
+    return time.perf_counter() - started, max_depth
+
+
+def run(workers: int, args) -> float:
+    # воркеры стартуют через spawn и читают окружение заново; меряется сам бот, а не лимиты Telegram
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    supervisor = Supervisor(workers, session_factory=functools.partial(BurnSession, cpu_ms=args.cpu_ms))
+    supervisor.start()
+    try:
+        # прогрев: импорт модулей и старт диспетчеров в каждом воркере
+        for update_id in range(workers * 20):
+            supervisor.submit(make_update(update_id, "consultation"))
+        wait_processed(supervisor, workers * 20, timeout=120)
+        warmup = supervisor.processed
+
+        started = time.perf_counter()
+        for update_id in range(args.updates):
+            supervisor.submit(make_update(100_000 + update_id, "consultation"))
+        elapsed, max_depth = wait_processed(supervisor, warmup + args.updates, timeout=args.timeout)
+        elapsed = max(elapsed, time.perf_counter() - started)
+
+        per_worker = [m["processed"] for m in supervisor.metrics()]
+        print(f"воркеров={workers:<3} {args.updates / elapsed:>9,.0f} апд/с  "
+              f"макс. очередь={max_depth:<6} по воркерам={per_worker}")
+        return args.updates / elapsed
+    finally:
+        supervisor.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--cpu-ms", type=float, default=1.0, help="CPU на вызов Bot API в воркере, мс")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"CPU: {os.cpu_count()}, апдейтов: {args.updates}, cpu-ms: {args.cpu_ms}")
+    baseline = None
+    for workers in args.workers:
+        throughput = run(workers, args)
+        baseline = baseline or throughput
+        print(f"    ускорение x{throughput / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Минимальный RESP2-сервер в процессе — замена Redis для бенчмарков.
+
+Понимает ровно то, что нужно RedisStorage: GET, SET [EX|PX], DEL, PING,
+SELECT и служебные HELLO/CLIENT-команды клиента redis-py.
+"""
+import asyncio
+import time
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.commands = 0
+        self._data: dict[bytes, tuple[bytes, float | None]] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def _get(self, key: bytes) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _execute(self, args: list[bytes], resp3: bool = False) -> bytes:
+        command = args[0].upper()
+
+        if command == b"GET":
+            value = self._get(args[1])
+            if value is None:
+                return b"_\r\n" if resp3 else b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+
+        if command == b"SET":
+            expires = None
+            options = [a.upper() for a in args[3:]]
+            if b"EX" in options:
+                expires = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+            elif b"PX" in options:
+                expires = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            self._data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+
+        if command == b"DEL":
+            removed = sum(self._data.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+
+        if command == b"PING":
+            return b"+PONG\r\n"
+
+        if command in (b"SELECT", b"CLIENT"):
+            return b"+OK\r\n"
+
+        if command == b"HELLO":
+            proto = args[1] if len(args) > 1 else b"2"
+            fields = [b"server", b"redis", b"version", b"7.0.0", b"proto", proto, b"mode", b"standalone"]
+            body = b"".join(b"$%d\r\n%s\r\n" % (len(f), f) for f in fields)
+            if proto == b"3":
+                return b"%%%d\r\n" % (len(fields) // 2) + body
+            return b"*%d\r\n" % len(fields) + body
+
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        resp3 = False
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                self.commands += 1
+                if args[0].upper() == b"HELLO":
+                    resp3 = len(args) > 1 and args[1] == b"3"
+                writer.write(self._execute(args, resp3))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
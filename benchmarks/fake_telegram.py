@@ -0,0 +1,215 @@
+"""
+Локальная заглушка Bot API для нагрузочных прогонов.
+
+Отвечает на любые методы правдоподобными объектами (Message, список Message
+для sendMediaGroup, True для остальных), умеет добавлять задержку и
+отвечать 429, как настоящий Telegram под нагрузкой.
+
+FakeTelegramServer — настоящий HTTP-сервер (для вебхука и AiohttpSession),
+FakeSession — сессия aiogram, отвечающая прямо в процессе, без сети.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any
+
+from aiogram.client.session.base import BaseSession
+from aiohttp import web
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Ansar", "username": "ansar_bot"}
+
+_message_ids = itertools.count(1)
+
+MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "senddocument", "editmessagetext",
+    "editmessagecaption", "editmessagereplymarkup", "copymessage", "forwardmessage",
+}
+
+
+def _chat(chat_id: Any) -> dict:
+    try:
+        chat_id = int(chat_id)
+    except (TypeError, ValueError):
+        chat_id = 0
+    return {"id": chat_id, "type": "private" if chat_id > 0 else "group", "title": "chat"}
+
+
+def _photo(seed: str) -> list[dict]:
+    unique = f"fake{abs(hash(seed)) % 10**12}"
+    return [
+        {"file_id": f"AgAC{unique}s", "file_unique_id": f"{unique}s", "width": 90, "height": 90},
+        {"file_id": f"AgAC{unique}m", "file_unique_id": f"{unique}m", "width": 800, "height": 800},
+    ]
+
+
+def fake_message(chat_id: Any, params: dict | None = None) -> dict:
+    params = params or {}
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": BOT_USER,
+    }
+    if "text" in params:
+        message["text"] = params["text"]
+    if "photo" in params:
+        message["photo"] = _photo(str(params["photo"]))
+    if "caption" in params:
+        message["caption"] = params["caption"]
+    return message
+
+
+def fake_result(method: str, params: dict) -> Any:
+    """Ответ Bot API на вызов метода"""
+    method = method.lower()
+    chat_id = params.get("chat_id")
+
+    if method in MESSAGE_METHODS:
+        return fake_message(chat_id, params)
+
+    if method == "sendmediagroup":
+        media = params.get("media") or []
+        if isinstance(media, str):
+            media = json.loads(media)
+        return [
+            fake_message(chat_id, {"photo": item.get("media") if isinstance(item, dict) else item})
+            for item in media
+        ]
+
+    if method == "getme":
+        return BOT_USER
+
+    if method == "getupdates":
+        return []
+
+    return True
+
+
+class FakeTelegramServer:
+    """aiohttp-сервер, изображающий api.telegram.org"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.host = host
+        self.port = port
+        self.calls: Counter[str] = Counter()
+        self.total_calls = 0
+        self.errors = 0
+        self._runner: web.AppRunner | None = None
+        self._waiters: list[tuple[int, asyncio.Future]] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        self.calls[method] += 1
+        self.total_calls += 1
+        self._wake_waiters()
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response(_error_payload(self.retry_after), status=429)
+
+        return web.json_response({"ok": True, "result": fake_result(method, params)})
+
+    def _wake_waiters(self) -> None:
+        for target, future in list(self._waiters):
+            if self.total_calls >= target and not future.done():
+                future.set_result(None)
+                self._waiters.remove((target, future))
+
+    async def wait_for_calls(self, target: int, timeout: float | None = None) -> None:
+        """Дождаться, пока сервер получит target вызовов"""
+        if self.total_calls >= target:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((target, future))
+        await asyncio.wait_for(future, timeout)
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def _error_payload(retry_after: int) -> dict:
+    return {
+        "ok": False,
+        "error_code": 429,
+        "description": f"Too Many Requests: retry after {retry_after}",
+        "parameters": {"retry_after": retry_after},
+    }
+
+
+class FakeSession(BaseSession):
+    """Сессия Bot API, которая отвечает локально через fake_result()"""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, retry_after: int = 1):
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.calls: Counter[str] = Counter()
+        self.errors = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        api_method = method.__api_method__
+        self.calls[api_method] += 1
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            payload, status = _error_payload(self.retry_after), 429
+        else:
+            # те же строковые поля, что AiohttpSession отправил бы формой
+            params = {}
+            for key, value in method.model_dump(warnings=False).items():
+                value = self.prepare_value(value, bot=bot, files={})
+                if value:
+                    params[key] = value
+            payload, status = {"ok": True, "result": fake_result(api_method, params)}, 200
+
+        response = self.check_response(
+            bot=bot, method=method, status_code=status, content=json.dumps(payload),
+        )
+        return response.result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,106 @@
+"""
+Накладные расходы хранилищ FSM на один апдейт.
+
+Каждый «апдейт» повторяет то, что делает шаг оформления заказа:
+get_state (фильтр состояния) → update_data → set_state. Redis заменён
+локальным RESP-сервером, SQL по умолчанию — файл SQLite.
+
+    python -m benchmarks.fsm_storage_bench --users 200 --steps 20
+    python -m benchmarks.fsm_storage_bench --sql-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from benchmarks.fake_redis import FakeRedisServer
+from databases.fsm_storage import BufferedStorage, SQLStorage, create_redis_storage
+from databases.models import FSMRecord
+from fsm import OrderStates
+
+
+STEPS = [
+    OrderStates.name, OrderStates.short_description, OrderStates.category,
+    OrderStates.subcategory, OrderStates.additional_info, OrderStates.images,
+]
+
+
+async def simulate(storage, users: int, steps: int) -> float:
+    """Прогнать users параллельных диалогов по steps шагов, вернуть секунды"""
+
+    async def dialog(user_id: int) -> None:
+        key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+        for step in range(steps):
+            await storage.get_state(key)
+            await storage.update_data(key, {f"field_{step % 6}": "Диван угловой, 220×95 см", "step": step})
+            await storage.set_state(key, STEPS[step % len(STEPS)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(dialog(10_000 + i) for i in range(users)))
+    if isinstance(storage, BufferedStorage):
+        await storage.flush()
+    return time.perf_counter() - started
+
+
+async def run(args) -> None:
+    redis_server = FakeRedisServer()
+    await redis_server.start()
+
+    tmp = tempfile.mkdtemp()
+    sql_url = args.sql_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'fsm.db')}"
+    engine = create_async_engine(sql_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(FSMRecord.__table__.create, checkfirst=True)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    backends = {
+        "memory": lambda: MemoryStorage(),
+        "redis": lambda: create_redis_storage(redis_server.url),
+        "redis+buffer": lambda: BufferedStorage(create_redis_storage(redis_server.url), args.flush_interval),
+        "sql": lambda: SQLStorage(sessions),
+        "sql+buffer": lambda: BufferedStorage(SQLStorage(sessions), args.flush_interval),
+    }
+
+    updates = args.users * args.steps
+    print(f"{'хранилище':<14}{'мкс/апдейт':>12}{'апд/с':>12}  записей в backend")
+
+    try:
+        for name, factory in backends.items():
+            if args.only and name not in args.only:
+                continue
+
+            storage = factory()
+            commands_before = redis_server.commands
+            elapsed = await simulate(storage, args.users, args.steps)
+
+            if isinstance(storage, BufferedStorage):
+                writes = f"{storage.flushed_writes} из {storage.writes} за {storage.flushes} сбросов"
+            elif name == "redis":
+                writes = f"{redis_server.commands - commands_before} команд"
+            else:
+                writes = "-"
+
+            print(f"{name:<14}{elapsed / updates * 1e6:>12.1f}{updates / elapsed:>12,.0f}  {writes}")
+            await storage.close()
+    finally:
+        await engine.dispose()
+        await redis_server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    parser.add_argument("--sql-url", default="", help="URL базы для SQL-хранилища (по умолчанию SQLite)")
+    parser.add_argument("--only", nargs="*", help="прогнать только эти хранилища")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Пиковая нагрузка на исходящие сообщения: с планировщиком и без.
+
+Заглушка Bot API отвечает 429 (retry_after), как Telegram, если бот
+превышает лимиты: больше --api-global сообщений за любую секунду, больше
+1 сообщения в секунду в личный чат (подряд можно 3) или 20 в минуту в группу.
+
+Сценарий пика: --users пользователей одновременно открывают товар
+(альбом + текст, как product_selected), а параллельно приходят --orders
+заказов — уведомление и альбом в чат менеджера (как order_images).
+
+Прогоны:
+  без планировщика — сколько запросов получили 429;
+  планировщик      — 429 быть не должно, иначе код выхода 1;
+  планировщик, Telegram строже (--api-global 20) — 429 случаются,
+                     но запросы повторяются после retry_after и доходят.
+
+    python -m benchmarks.rate_limit_bench --users 200 --orders 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InputMediaPhoto
+
+from benchmarks.fake_telegram import FakeSession, _error_payload
+from middlewares.rate_limit import OutgoingScheduler
+
+
+MANAGER_CHAT_ID = 5129105635
+USER_ID_BASE = 10_000_000
+LIMITED_PREFIXES = ("send", "copy", "forward")
+
+
+class TelegramLimitsSession(FakeSession):
+    """Заглушка Bot API с лимитами отправки Telegram"""
+
+    def __init__(self, global_per_second: int = 30, chat_rate: float = 1, chat_burst: int = 3,
+                 group_per_minute: int = 20, retry_after: int = 1):
+        super().__init__(retry_after=retry_after)
+        self.global_per_second = global_per_second
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_per_minute = group_per_minute
+        self.rejected = 0
+        self._sent: deque[float] = deque()
+        self._chat_allowed_at: dict[int, float] = {}  # GCRA: когда чат снова может без нарушения
+        self._group_sent: dict[int, deque[float]] = {}
+
+    def _allow(self, chat_id: int, now: float) -> bool:
+        while self._sent and self._sent[0] <= now - 1:
+            self._sent.popleft()
+        if len(self._sent) >= self.global_per_second:
+            return False
+
+        if chat_id < 0:
+            sent = self._group_sent.setdefault(chat_id, deque())
+            while sent and sent[0] <= now - 60:
+                sent.popleft()
+            if len(sent) >= self.group_per_minute:
+                return False
+            sent.append(now)
+        else:
+            interval = 1 / self.chat_rate
+            allowed_at = self._chat_allowed_at.get(chat_id, now)
+            if allowed_at - now > interval * (self.chat_burst - 1):
+                return False
+            self._chat_allowed_at[chat_id] = max(allowed_at, now) + interval
+
+        self._sent.append(now)
+        return True
+
+    async def make_request(self, bot, method, timeout=None):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and method.__api_method__.startswith(LIMITED_PREFIXES):
+            if not self._allow(int(chat_id), time.monotonic()):
+                self.rejected += 1
+                self.check_response(
+                    bot=bot, method=method, status_code=429,
+                    content=json.dumps(_error_payload(self.retry_after)),
+                )
+        return await super().make_request(bot, method, timeout)
+
+
+def photos(count: int) -> list[InputMediaPhoto]:
+    return [InputMediaPhoto(media=f"AgACfile{i}") for i in range(count)]
+
+
+async def peak(bot: Bot, args) -> tuple[list[float], list[float], int]:
+    """Задержки (с) ответов пользователям и уведомлений менеджеру, число ошибок 429"""
+    interactive, notifications = [], []
+    failed = 0
+
+    async def view_product(user_id: int) -> None:
+        nonlocal failed
+        started = time.monotonic()
+        try:
+            await bot.send_media_group(user_id, photos(3))
+            await bot.send_message(user_id, "📦 <b>Товар</b>\n\nОписание")
+            interactive.append(time.monotonic() - started)
+        except TelegramRetryAfter:
+            failed += 1
+
+    async def notify_manager(order: int) -> None:
+        nonlocal failed
+        started = time.monotonic()
+        try:
+            await bot.send_message(MANAGER_CHAT_ID, f"📦 Новый заказ №{order}")
+            await bot.send_media_group(MANAGER_CHAT_ID, photos(2))
+            notifications.append(time.monotonic() - started)
+        except TelegramRetryAfter:
+            failed += 1
+
+    await asyncio.gather(
+        *(view_product(USER_ID_BASE + i) for i in range(args.users)),
+        *(notify_manager(i) for i in range(args.orders)),
+    )
+    return interactive, notifications, failed
+
+
+def percentile(values: list[float], share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def run(args) -> int:
+    # предупреждения о каждом 429 здесь не нужны, их считает заглушка
+    logging.getLogger("middlewares.rate_limit").setLevel(logging.ERROR)
+    print(f"пользователей: {args.users}, заказов: {args.orders}\n")
+    print(f"{'прогон':<34}{'429':>6}{'не дошло':>10}{'польз. p50/p95, с':>20}{'менеджер p50/max, с':>22}{'время, с':>10}")
+
+    runs = [
+        ("без планировщика", None, 30),
+        ("планировщик", OutgoingScheduler(low_priority_chats={MANAGER_CHAT_ID}), 30),
+        (f"планировщик, Telegram {args.api_global}/с",
+         OutgoingScheduler(low_priority_chats={MANAGER_CHAT_ID}, max_retries=10), args.api_global),
+    ]
+    exit_code = 0
+    for name, scheduler, api_global in runs:
+        session = TelegramLimitsSession(global_per_second=api_global)
+        if scheduler is not None:
+            session.middleware(scheduler)
+        bot = Bot("123:abc", session=session)
+
+        started = time.monotonic()
+        interactive, notifications, failed = await peak(bot, args)
+        elapsed = time.monotonic() - started
+        await bot.session.close()
+
+        print(f"{name:<34}{session.rejected:>6}{failed:>10}"
+              f"{statistics.median(interactive) if interactive else 0:>11.2f} / {percentile(interactive, 0.95):<6.2f}"
+              f"{statistics.median(notifications) if notifications else 0:>13.2f} / {max(notifications, default=0):<6.2f}"
+              f"{elapsed:>10.1f}")
+        if scheduler is not None:
+            if api_global == 30 and session.rejected:
+                exit_code = 1
+            if failed:
+                exit_code = 1
+
+    print("\nOK" if not exit_code else "\nошибка: планировщик не уложился в лимиты")
+    return exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=10)
+    parser.add_argument("--api-global", type=int, default=20,
+                        help="общий лимит заглушки в третьем прогоне, сообщений/с")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Чтение с реплик (databases/replicas.py) на двух живых базах: primary
+(--url) и его streaming-реплике (--replica-url, можно несколько).
+
+В список реплик добавляется ещё недоступная (порт 1). Прогон:
+  1. --reads чтений через ReplicaRouter: все на реплики, по кругу,
+     недоступная пропущена после первой проверки;
+  2. правка каталога на primary и invalidate: снимок каталога сразу с
+     правкой — чтение закреплено за primary;
+  3. на реплике pg_wal_replay_pause() и запись на primary: реплика
+     отстаёт больше --max-lag, чтения уходят на primary, после
+     pg_wal_replay_resume() возвращаются на реплику;
+  4. недоступная реплика помечена здоровой (упала между проверками):
+     чтения проходят без ошибок через другие базы.
+
+Проверки (код выхода 1 при ошибке) — по каждому шагу.
+
+Реплика для прогона на локальном PostgreSQL:
+    pg_basebackup -h /tmp/pgdata -D /tmp/pgreplica -R -X stream
+    pg_ctl -D /tmp/pgreplica -o "-p 5433 -k /tmp/pgreplica" start
+
+    python -m benchmarks.replica_bench --url "postgresql+asyncpg://postgres@/postgres?host=/tmp/pgdata" \\
+        --replica-url "postgresql+asyncpg://postgres@:5433/postgres?host=/tmp/pgreplica"
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter
+
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.bench_db import bench_database, require_postgresql
+from databases.catalog_cache import CatalogCache
+from databases.migrate import migrate
+from databases.replicas import ReplicaRouter
+
+
+SCHEMA = "replica_bench"
+
+
+async def read(router: ReplicaRouter) -> tuple[bool, float]:
+    """(прочитано с реплики, время чтения)"""
+    started = time.perf_counter()
+    async with router.session() as session:
+        in_recovery = await session.scalar(text("SELECT pg_is_in_recovery()"))
+    return in_recovery, time.perf_counter() - started
+
+
+async def reads(router: ReplicaRouter, count: int) -> tuple[Counter, list[float]]:
+    targets, times = Counter(), []
+    for _ in range(count):
+        from_replica, seconds = await read(router)
+        targets["реплика" if from_replica else "primary"] += 1
+        times.append(seconds)
+    return targets, times
+
+
+async def wait_for(condition, timeout: float, interval: float = 0.05) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await condition():
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+
+def report(label: str, router: ReplicaRouter, targets: Counter, times: list[float]) -> None:
+    per_replica = ", ".join(f"{replica.name}: {replica.reads}" for replica in router.replicas)
+    print(f"{label:<34}{dict(targets)!s:<34}{statistics.median(times) * 1000:>6.2f} мс  ({per_replica})")
+
+
+async def run(args) -> int:
+    async with bench_database(args.url, SCHEMA) as primary:
+        return await run_on(primary, args)
+
+
+async def run_on(primary, args) -> int:
+    await migrate(primary, skip=["0002"])
+    async with primary.begin() as conn:
+        await conn.execute(text("INSERT INTO categories (name) VALUES ('Кухни'), ('Шкафы')"))
+
+    dead = make_url(args.replica_url[0]).set(port=1).render_as_string(hide_password=False)
+    router = ReplicaRouter(
+        urls=[*args.replica_url, dead],
+        primary=async_sessionmaker(bind=primary, expire_on_commit=False),
+        max_lag=args.max_lag,
+        check_interval=args.check_interval,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    *live, down = router.replicas
+    cache = CatalogCache(session_factory=router.session, ttl=0)
+    cache.subscribe(lambda product_id: router.pin_primary())
+
+    failures = []
+    print(f"реплик: {len(live)} + недоступная, max_lag {args.max_lag} с, проверка раз в {args.check_interval} с\n")
+    print(f"{'шаг':<34}{'куда ушли чтения':<34}{'p50':>6}")
+    try:
+        # схема и сид приходят на реплику не мгновенно
+        async def replicated() -> bool:
+            await router.check()
+            return all(replica.healthy for replica in live)
+
+        if not await wait_for(replicated, timeout=10):
+            print("❌ реплика не догнала primary за 10 с")
+            return 1
+        await router.start()
+
+        # 1. чтения по кругу по репликам, недоступная пропущена
+        targets, times = await reads(router, args.reads)
+        report("1. реплики", router, targets, times)
+        if targets["primary"]:
+            failures.append(f"1: {targets['primary']} чтений ушли на primary при здоровых репликах")
+        if down.reads or down.healthy:
+            failures.append("1: недоступная реплика получила чтения")
+        spread = [replica.reads for replica in live]
+        if max(spread) - min(spread) > 1:
+            failures.append(f"1: чтения распределены неравномерно: {spread}")
+
+        # 2. правка админа: каталог перечитывается с primary, правка видна сразу
+        await cache.get()
+        async with primary.begin() as conn:
+            await conn.execute(text("INSERT INTO categories (name) VALUES ('Прихожие')"))
+        cache.invalidate()
+        pinned = router.pinned_reads
+        snapshot = await cache.get()
+        names = [category.name for category in snapshot.categories]
+        targets, times = await reads(router, args.reads)
+        report("2. после правки каталога", router, targets, times)
+        if "Прихожие" not in names:
+            failures.append(f"2: снимок после правки без новой категории: {names}")
+        if router.pinned_reads == pinned or targets["реплика"]:
+            failures.append("2: чтение после правки не закреплено за primary")
+
+        await asyncio.sleep(args.max_lag + args.check_interval)
+        targets, _ = await reads(router, len(live))
+        if targets["primary"]:
+            failures.append("2: чтение не вернулось на реплики после закрепления")
+
+        # 3. отставание: реплика не применяет WAL, primary пишет
+        lagging = live[0]
+        async with lagging.engine.connect() as conn:
+            await conn.execute(text("SELECT pg_wal_replay_pause()"))
+        try:
+            async with primary.begin() as conn:
+                await conn.execute(text("INSERT INTO categories (name) VALUES ('Спальни')"))
+            behind = await wait_for(
+                lambda: asyncio.sleep(0, result=not lagging.healthy), timeout=args.max_lag + 5 * args.check_interval + 2
+            )
+            before = lagging.reads
+            targets, times = await reads(router, args.reads)
+            report(f"3. {lagging.name} отстаёт на {lagging.lag or 0:.1f} с", router, targets, times)
+            if not behind:
+                failures.append(f"3: отставание {lagging.lag} с не замечено")
+            if lagging.reads != before:
+                failures.append("3: отстающая реплика получила чтения")
+        finally:
+            async with lagging.engine.connect() as conn:
+                await conn.execute(text("SELECT pg_wal_replay_resume()"))
+
+        caught_up = await wait_for(lambda: asyncio.sleep(0, result=lagging.healthy), timeout=5 * args.check_interval + 2)
+        if not caught_up:
+            failures.append("3: реплика не вернулась после pg_wal_replay_resume()")
+
+        # 4. реплика упала между проверками: чтение уходит на следующую базу без ошибки
+        down.healthy = True
+        failovers = router.failovers
+        try:
+            targets, times = await reads(router, args.reads)
+        except Exception as e:
+            failures.append(f"4: чтение упало вместе с репликой: {type(e).__name__}: {e}")
+        else:
+            report("4. реплика упала между проверками", router, targets, times)
+        if down.healthy or router.failovers == failovers or down.reads:
+            failures.append("4: упавшая реплика не выведена из работы")
+
+        print(f"\n{router.stats()}")
+    finally:
+        await router.stop()
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("\nOK")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="primary: postgresql+asyncpg://...")
+    parser.add_argument("--replica-url", action="append", required=True, help="streaming-реплика primary")
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--max-lag", type=float, default=0.5)
+    parser.add_argument("--check-interval", type=float, default=0.2)
+    args = parser.parse_args()
+    require_postgresql(args.url, "реплики — streaming replication PostgreSQL")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
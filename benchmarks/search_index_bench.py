@@ -0,0 +1,83 @@
+"""
+Поисковый индекс в памяти (databases/search_index.py): время построения,
+память на 10 000 товаров, задержка поиска и точечного обновления.
+
+Каталог тот же, что в benchmarks/search_bench.py, база не нужна.
+
+    python -m benchmarks.search_index_bench --products 10000 50000 100000
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.search_bench import QUERIES, generate_products
+from databases.catalog_cache import CatalogProduct
+from databases.search_index import ProductSearchIndex
+
+
+def catalog_products(count: int) -> list[CatalogProduct]:
+    return [
+        CatalogProduct(index + 1, row["name"], row["short_description"], None, None)
+        for index, row in enumerate(generate_products(count))
+    ]
+
+
+def median_us(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def run(count: int, repeat: int) -> None:
+    products = catalog_products(count)
+    index = ProductSearchIndex()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index.build(products)
+    build_seconds = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_10k = traced / count * 10_000 / 2**20
+    print(f"\nтоваров: {count:,}  построение: {build_seconds:.2f} с  "
+          f"память: {traced / 2**20:.1f} МБ ({per_10k:.1f} МБ на 10k, "
+          f"оценка memory_usage(): {index.memory_usage() / 2**20:.1f} МБ)")
+
+    def cold_search(query):
+        index._results.clear()
+        return index.search(query)
+
+    print(f"  {'запрос':<22}{'без кэша':>12}{'из кэша':>12}  первый результат")
+    for query, description in QUERIES:
+        found = index.search(query)
+        cold = median_us(lambda: cold_search(query), repeat)
+        cached = median_us(lambda: index.search(query), repeat)
+        top = products[found[0] - 1].name if found else "-"
+        print(f"  {query:<22}{cold:>8.0f} мкс{cached:>8.0f} мкс  {top}  ({description})")
+
+    # точечное обновление, как после правки товара админом
+    product = products[count // 2]
+    renamed = CatalogProduct(product.id, "Пуф круглый «Новинка»", product.short_description, None, None)
+    update_us = median_us(lambda: index.add(renamed), repeat)
+    assert index.search("пуф новинка", limit=1) == [product.id]
+    index.remove(product.id)
+    assert product.id not in index.search("пуф новинка")
+    print(f"  обновление товара: {update_us:.0f} мкс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    for count in args.products:
+        run(count, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Прогон вебхука на синтетических апдейтах.
+
+Поднимает заглушку Bot API и aiohttp-приложение вебхука, отправляет N апдейтов
+с заголовком секрета и меряет апдейты/сек от POST до последнего ответа бота.
+
+    python -m benchmarks.webhook_load --updates 5000 --clients 50 --concurrency 100
+
+Сценарий consultation не ходит в БД; сценарий start читает каталог
+(нужна настроенная база).
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import ClientSession, web
+
+from benchmarks.fake_telegram import FakeTelegramServer
+
+
+SECRET = "bench-secret"
+USER_ID_BASE = 10_000_000
+
+# сколько вызовов Bot API порождает один апдейт сценария
+SCENARIOS = {
+    "consultation": 2,  # sendMessage + answerCallbackQuery
+    "start": 1,         # sendMessage
+}
+
+
+def make_update(update_id: int, scenario: str) -> dict:
+    user = {"id": USER_ID_BASE + update_id % 1000, "is_bot": False, "first_name": "Load"}
+    chat = {"id": user["id"], "type": "private"}
+
+    if scenario == "start":
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": chat, "from": user, "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": "1",
+            "data": "request_consultation",
+            "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "menu"},
+        },
+    }
+
+
+async def run(args) -> None:
+    from main import create_bot, create_dispatcher
+    from databases.engine import engine
+    from webhook import create_webhook_app
+
+    api = FakeTelegramServer(latency=args.api_latency)
+    await api.start()
+
+    # меряется сам бот, а не лимиты Telegram
+    bot = create_bot(session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)), rate_limit=False)
+    dp = create_dispatcher()
+    app = create_webhook_app(bot, dp, path="/webhook", secret_token=SECRET,
+                             max_concurrency=args.concurrency)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+
+        async with ClientSession() as client:
+            async with client.post(url, json=make_update(0, args.scenario)) as resp:
+                assert resp.status == 401, f"вебхук без секрета вернул {resp.status}"
+
+            ids = itertools.count(1)
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+            async def worker():
+                for update_id in iter(lambda: next(ids), None):
+                    if update_id > args.updates:
+                        return
+                    async with client.post(url, json=make_update(update_id, args.scenario),
+                                           headers=headers) as resp:
+                        resp.raise_for_status()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.clients)))
+            accepted = time.perf_counter() - started
+
+            await api.wait_for_calls(args.updates * SCENARIOS[args.scenario], timeout=args.timeout)
+            finished = time.perf_counter() - started
+
+        print(f"сценарий:           {args.scenario}")
+        print(f"апдейтов:           {args.updates}")
+        print(f"приём (POST):       {args.updates / accepted:,.0f} апд/с")
+        print(f"end-to-end:         {args.updates / finished:,.0f} апд/с ({finished:.2f} с)")
+        print(f"вызовов Bot API:    {api.total_calls} {dict(api.calls)}")
+    finally:
+        # runner.cleanup() вызывает shutdown диспетчера, а он закрывает движок БД;
+        # повторный dispose ничего не стоит, а без него процесс на SQLite не завершится
+        await runner.cleanup()
+        await bot.session.close()
+        await api.stop()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=50, help="параллельных POST-клиентов")
+    parser.add_argument("--concurrency", type=int, default=100, help="WEBHOOK_MAX_CONCURRENCY")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка заглушки Bot API, с")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="consultation")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Режим кластера: супервизор + N рабочих процессов.
+
+Супервизор получает апдейты (long polling) и раскладывает их по очередям
+воркеров по consistent hash от chat_id, поэтому все апдейты одного чата
+обрабатывает один и тот же процесс в исходном порядке, а его FSM остаётся
+локальным. Каждый воркер поднимает свой Bot и тот же набор роутеров
+(create_dispatcher), так что тяжёлый админский сценарий тормозит только свой шард.
+"""
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue as queue_module
+import threading
+from typing import Any, Callable
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.utils.backoff import Backoff, BackoffConfig
+from environs import Env
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_WORKERS = env.int("CLUSTER_WORKERS", os.cpu_count() or 2)
+# Как часто супервизор пишет в лог глубину очередей воркеров, сек. 0 — не писать.
+CLUSTER_METRICS_INTERVAL = env.float("CLUSTER_METRICS_INTERVAL", 30.0)
+# Максимум апдейтов в очереди одного воркера (дальше супервизор ждёт)
+CLUSTER_QUEUE_SIZE = env.int("CLUSTER_QUEUE_SIZE", 10_000)
+# Сколько апдейтов воркер обрабатывает одновременно. Остальные ждут в его
+# очереди: там их видно в queue_depth, а полная очередь тормозит супервизор.
+CLUSTER_WORKER_CONCURRENCY = env.int("CLUSTER_WORKER_CONCURRENCY", 100)
+
+# Паузы между повторами getUpdates после сбоя сети или Bot API — как у start_polling
+POLLING_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1)
+
+# Служебное сообщение в очереди воркера: изменился каталог у другого воркера
+CATALOG_INVALIDATE = "catalog_invalidate"
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping, Veach): при смене числа воркеров переезжает ~1/N чатов"""
+    key &= 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+def update_chat_id(update: dict[str, Any]) -> int:
+    """chat_id апдейта (или id пользователя, если чата нет)"""
+    for kind in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if kind in update:
+            return update[kind]["chat"]["id"]
+
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        if message:
+            return message["chat"]["id"]
+        return callback["from"]["id"]
+
+    for value in update.values():
+        if isinstance(value, dict) and "from" in value:
+            return value["from"]["id"]
+
+    return update.get("update_id", 0)
+
+
+async def _run_worker(index, workers, updates, events, processed, session_factory) -> None:
+    from databases.catalog_cache import catalog_cache
+    from main import create_bot, create_dispatcher
+    from middlewares.media_group import media_group_key
+    from middlewares.rate_limit import RATE_LIMIT_GLOBAL
+
+    # общий лимит Telegram делится между воркерами, лимиты чатов — нет:
+    # каждый чат обслуживает один воркер
+    bot = create_bot(
+        session=session_factory() if session_factory else None,
+        global_rate=RATE_LIMIT_GLOBAL / workers,
+    )
+    dp = create_dispatcher()
+    loop = asyncio.get_running_loop()
+
+    applying_remote = False
+
+    def publish_invalidation(product_id: int | None) -> None:
+        # Изменения, пришедшие от других воркеров, обратно не рассылаем
+        if not applying_remote:
+            events.put((index, product_id))
+
+    catalog_cache.subscribe(publish_invalidation)
+
+    locks: dict[int, asyncio.Lock] = {}
+    pending: dict[int, int] = {}
+    # альбомы, первая часть которых в обработке: событие — она заняла очередь чата
+    albums: dict[tuple[int, str], asyncio.Event] = {}
+    tasks: set[asyncio.Task] = set()
+    slots = asyncio.Semaphore(CLUSTER_WORKER_CONCURRENCY)
+
+    def finished(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        slots.release()
+
+    async def handle(update: dict) -> None:
+        chat_id = update_chat_id(update)
+        lock = locks.setdefault(chat_id, asyncio.Lock())
+        pending[chat_id] = pending.get(chat_id, 0) + 1
+        album = media_group_key(update)
+        first_part = album is not None and album not in albums
+        if first_part:
+            albums[album] = asyncio.Event()
+        try:
+            if album is not None and not first_part:
+                # Первая часть альбома держит очередь чата и ждёт остальные
+                # в MediaGroupMiddleware: эта часть идёт к ней без очереди
+                await albums[album].wait()
+                await dp.feed_raw_update(bot, update)
+                return
+            # Апдейты одного чата — строго по очереди, разные чаты — параллельно
+            async with lock:
+                if first_part:
+                    albums[album].set()
+                await dp.feed_raw_update(bot, update)
+        except Exception:
+            logger.exception("Воркер %s: ошибка обработки апдейта", index)
+        finally:
+            if first_part:
+                albums.pop(album).set()
+            pending[chat_id] -= 1
+            if not pending[chat_id]:
+                del pending[chat_id]
+                del locks[chat_id]
+            with processed.get_lock():
+                processed.value += 1
+
+    await dp.emit_startup(bot=bot)
+    try:
+        while True:
+            # свободный слот — до чтения из очереди: лишние апдейты остаются в ней
+            await slots.acquire()
+            item = await loop.run_in_executor(None, updates.get)
+            if item is None:
+                break
+
+            if isinstance(item, tuple) and item[0] == CATALOG_INVALIDATE:
+                slots.release()
+                applying_remote = True
+                try:
+                    catalog_cache.invalidate(item[1])
+                finally:
+                    applying_remote = False
+                continue
+
+            task = asyncio.create_task(handle(item))
+            tasks.add(task)
+            task.add_done_callback(finished)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
+def _worker_main(index, workers, updates, events, processed, session_factory) -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_worker(index, workers, updates, events, processed, session_factory))
+
+
+class Supervisor:
+    """Пул воркеров с маршрутизацией апдейтов по chat_id"""
+
+    def __init__(
+        self,
+        workers: int = CLUSTER_WORKERS,
+        session_factory: Callable | None = None,
+        queue_size: int = CLUSTER_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self._ctx = mp.get_context("spawn")
+        self._queues: list = []
+        self._processed: list = []
+        self._routed: list[int] = [0] * workers
+        self._processes: list = []
+        self._events = None
+        self._events_thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._events = self._ctx.Queue()
+        for index in range(self.workers):
+            updates = self._ctx.Queue(self.queue_size)
+            processed = self._ctx.Value("q", 0)
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(index, self.workers, updates, self._events, processed, self.session_factory),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._queues.append(updates)
+            self._processed.append(processed)
+            self._processes.append(process)
+
+        self._events_thread = threading.Thread(target=self._broadcast_events, daemon=True)
+        self._events_thread.start()
+        logger.info("Запущено воркеров: %s", self.workers)
+
+    def _broadcast_events(self) -> None:
+        """Разослать инвалидацию каталога от одного воркера всем остальным"""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            source, product_id = event
+            for index, updates in enumerate(self._queues):
+                if index != source:
+                    updates.put((CATALOG_INVALIDATE, product_id))
+
+    def shard_for(self, update: dict) -> int:
+        return jump_hash(update_chat_id(update), self.workers)
+
+    def submit(self, update: dict, block: bool = True) -> int:
+        """Отправить сырой апдейт (dict из Bot API) в очередь его воркера"""
+        shard = self.shard_for(update)
+        self._queues[shard].put(update, block=block)
+        self._routed[shard] += 1
+        return shard
+
+    @property
+    def processed(self) -> int:
+        return sum(value.value for value in self._processed)
+
+    def metrics(self) -> list[dict[str, int]]:
+        result = []
+        for index, updates in enumerate(self._queues):
+            try:
+                depth = updates.qsize()
+            except NotImplementedError:  # macOS
+                depth = -1
+            result.append({
+                "worker": index,
+                "queue_depth": depth,
+                "routed": self._routed[index],
+                "processed": self._processed[index].value,
+                "alive": int(self._processes[index].is_alive()),
+            })
+        return result
+
+    def log_metrics(self) -> None:
+        for item in self.metrics():
+            logger.info(
+                "Воркер %(worker)s: очередь=%(queue_depth)s маршрутизировано=%(routed)s "
+                "обработано=%(processed)s жив=%(alive)s", item,
+            )
+
+    def stop(self, timeout: float = 30.0) -> None:
+        for updates in self._queues:
+            updates.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._events is not None:
+            self._events.put(None)
+
+
+async def run_cluster(bot, workers: int = CLUSTER_WORKERS) -> None:
+    """Long polling в супервизоре, обработка — в воркерах"""
+    supervisor = Supervisor(workers)
+    supervisor.start()
+    loop = asyncio.get_running_loop()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(CLUSTER_METRICS_INTERVAL)
+            supervisor.log_metrics()
+
+    reporter = asyncio.create_task(report()) if CLUSTER_METRICS_INTERVAL > 0 else None
+
+    offset = None
+    backoff = Backoff(config=POLLING_BACKOFF)
+    try:
+        await bot.delete_webhook()
+        while True:
+            # сбой сети или Bot API не останавливает бота: повторяем, воркеры работают дальше
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30)
+            except TelegramRetryAfter as e:
+                logger.warning("getUpdates: flood control, повтор через %s с", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.error(
+                    "getUpdates: %s: %s, повтор через %.1f с (попытка %d)",
+                    type(e).__name__, e, backoff.next_delay, backoff.counter + 1,
+                )
+                await backoff.asleep()
+                continue
+            if backoff.counter:
+                logger.info("getUpdates: связь с Bot API восстановлена")
+                backoff.reset()
+
+            for update in updates:
+                offset = update.update_id + 1
+                raw = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                try:
+                    supervisor.submit(raw, block=False)
+                except queue_module.Full:
+                    await loop.run_in_executor(None, supervisor.submit, raw)
+    finally:
+        if reporter:
+            reporter.cancel()
+        await loop.run_in_executor(None, supervisor.stop)
+        await bot.session.close()
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from environs import Env
+from sqlalchemy import select
+
+from databases.replicas import ReadSessionLocal, replica_router
+from databases.models import Category, Product, Subcategory
+from databases.pagination import PAGE_SIZE, Page, page_of
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд снимок перечитывается из БД, даже если админ ничего не менял
+# (на случай ручных правок в базе). 0 — не перечитывать.
+CATALOG_CACHE_TTL = env.float("CATALOG_CACHE_TTL", 300.0)
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogCategory:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSubcategory:
+    id: int
+    name: str
+    category_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogProduct:
+    id: int
+    name: str
+    short_description: str | None
+    category_id: int | None
+    subcategory_id: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryScreen:
+    """Всё для экрана категории: страница её подкатегорий и товаров без подкатегории"""
+    version: int
+    category: CatalogCategory
+    subcategories: Page[CatalogSubcategory]
+    products: Page[CatalogProduct]
+
+
+@dataclass(frozen=True, slots=True)
+class SubcategoryScreen:
+    """Всё для экрана подкатегории: её категория и страница товаров"""
+    version: int
+    subcategory: CatalogSubcategory
+    category: CatalogCategory | None
+    products: Page[CatalogProduct]
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок дерева Категория → Подкатегория → Товар"""
+
+    def __init__(
+        self,
+        version: int,
+        categories: list[CatalogCategory],
+        subcategories: list[CatalogSubcategory],
+        products: list[CatalogProduct],
+    ):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.categories: tuple[CatalogCategory, ...] = tuple(categories)
+
+        self._categories = {c.id: c for c in categories}
+        self._subcategories = {s.id: s for s in subcategories}
+        self._products = {p.id: p for p in products}
+
+        by_category: dict[int, list[CatalogSubcategory]] = {}
+        for sub in subcategories:
+            by_category.setdefault(sub.category_id, []).append(sub)
+
+        by_subcategory: dict[int, list[CatalogProduct]] = {}
+        root_products: dict[int, list[CatalogProduct]] = {}
+        for product in products:
+            if product.subcategory_id is not None:
+                by_subcategory.setdefault(product.subcategory_id, []).append(product)
+            elif product.category_id is not None:
+                root_products.setdefault(product.category_id, []).append(product)
+
+        self._subcategories_by_category = {k: tuple(v) for k, v in by_category.items()}
+        self._products_by_subcategory = {k: tuple(v) for k, v in by_subcategory.items()}
+        self._root_products = {k: tuple(v) for k, v in root_products.items()}
+
+    def category(self, category_id: int | None) -> CatalogCategory | None:
+        return self._categories.get(category_id)
+
+    def subcategory(self, subcategory_id: int | None) -> CatalogSubcategory | None:
+        return self._subcategories.get(subcategory_id)
+
+    def product(self, product_id: int | None) -> CatalogProduct | None:
+        return self._products.get(product_id)
+
+    def subcategories(self, category_id: int | None) -> tuple[CatalogSubcategory, ...]:
+        """Подкатегории категории"""
+        return self._subcategories_by_category.get(category_id, ())
+
+    def products(self, subcategory_id: int | None) -> tuple[CatalogProduct, ...]:
+        """Товары подкатегории"""
+        return self._products_by_subcategory.get(subcategory_id, ())
+
+    def root_products(self, category_id: int | None) -> tuple[CatalogProduct, ...]:
+        """Товары категории без подкатегории"""
+        return self._root_products.get(category_id, ())
+
+    def all_products(self) -> tuple[CatalogProduct, ...]:
+        return tuple(self._products.values())
+
+    def category_screen(
+        self, category_id: int | None, after: int = 0, before: int = 0, size: int = PAGE_SIZE, around: int = 0
+    ) -> CategoryScreen | None:
+        """
+        Экран категории; after / before — курсор страницы, around — id записи,
+        страницу с которой показать (см. databases/pagination.py)
+        """
+        category = self.category(category_id)
+        if category is None:
+            return None
+        subcategories = self.subcategories(category_id)
+        products = self.root_products(category_id)
+        # курсор — id из списка, который показывает экран: подкатегорий, если они есть, иначе товаров
+        if subcategories:
+            return CategoryScreen(
+                self.version, category,
+                page_of(subcategories, after, before, size, around), page_of(products, size=size),
+            )
+        return CategoryScreen(self.version, category, Page(()), page_of(products, after, before, size, around))
+
+    def subcategory_screen(
+        self, subcategory_id: int | None, after: int = 0, before: int = 0, size: int = PAGE_SIZE, around: int = 0
+    ) -> SubcategoryScreen | None:
+        subcategory = self.subcategory(subcategory_id)
+        if subcategory is None:
+            return None
+        return SubcategoryScreen(
+            self.version, subcategory, self.category(subcategory.category_id),
+            page_of(self.products(subcategory_id), after, before, size, around),
+        )
+
+
+async def load_catalog_snapshot(session, version: int = 0) -> CatalogSnapshot:
+    """Прочитать весь каталог из БД и собрать снимок"""
+    categories = (
+        await session.execute(select(Category.id, Category.name).order_by(Category.id))
+    ).all()
+    subcategories = (
+        await session.execute(
+            select(Subcategory.id, Subcategory.name, Subcategory.category_id)
+            .order_by(Subcategory.id)
+        )
+    ).all()
+    products = (
+        await session.execute(
+            select(
+                Product.id,
+                Product.name,
+                Product.short_description,
+                Product.category_id,
+                Product.subcategory_id,
+            ).order_by(Product.id)
+        )
+    ).all()
+
+    return CatalogSnapshot(
+        version=version,
+        categories=[CatalogCategory(*row) for row in categories],
+        subcategories=[CatalogSubcategory(*row) for row in subcategories],
+        products=[CatalogProduct(*row) for row in products],
+    )
+
+
+class CatalogCache:
+    """
+    Кэш снимка каталога в памяти процесса.
+
+    Пользовательская навигация читает только снимок. Любая запись админа
+    вызывает invalidate(): версия увеличивается, снимок сбрасывается и при
+    следующем обращении перечитывается из БД одним проходом. Пока снимок
+    перечитывается, экраны категорий и подкатегорий читаются из БД одним
+    запросом на экран (category_screen / subcategory_screen).
+    """
+
+    def __init__(self, session_factory=ReadSessionLocal, ttl: float = CATALOG_CACHE_TTL):
+        self._session_factory = session_factory
+        self._ttl = ttl
+        self._snapshot: CatalogSnapshot | None = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._listeners: list[Callable[[int | None], None]] = []
+        self._reload_task: asyncio.Task | None = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def _is_fresh(self, snapshot: CatalogSnapshot | None) -> bool:
+        if snapshot is None or snapshot.version != self._version:
+            return False
+        return not self._ttl or time.monotonic() - snapshot.loaded_at < self._ttl
+
+    async def get(self) -> CatalogSnapshot:
+        """Текущий снимок каталога (при необходимости читается из БД)"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+
+            version = self._version
+            async with self._session_factory() as session:
+                snapshot = await load_catalog_snapshot(session, version)
+
+            # Если во время загрузки админ что-то изменил — не сохраняем устаревший снимок
+            if version == self._version:
+                self._snapshot = snapshot
+            else:
+                logger.info("Снимок каталога v%s устарел во время загрузки", version)
+
+            return snapshot
+
+    def _reload_in_background(self) -> None:
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self.get())
+            self._reload_task.add_done_callback(self._log_reload_error)
+
+    @staticmethod
+    def _log_reload_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error("Не удалось перечитать каталог", exc_info=task.exception())
+
+    async def category_screen(
+        self, category_id: int, after: int = 0, before: int = 0, around: int = 0
+    ) -> CategoryScreen | None:
+        """
+        Экран категории. Пока снимка нет или он устарел (старт, правка
+        админа), экран читается из БД одним запросом, а весь каталог
+        перечитывается в фоне — пользователь не ждёт полной загрузки.
+        """
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot.category_screen(category_id, after, before, around=around)
+
+        from databases.crud import load_category_screen
+
+        self._reload_in_background()
+        version = self._version
+        if around:
+            # без снимка номер страницы не узнать: страница, которая начинается с записи
+            after, before = around - 1, 0
+        async with self._session_factory() as session:
+            return await load_category_screen(session, category_id, version, after, before)
+
+    async def subcategory_screen(
+        self, subcategory_id: int, after: int = 0, before: int = 0, around: int = 0
+    ) -> SubcategoryScreen | None:
+        """Экран подкатегории (см. category_screen)"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot.subcategory_screen(subcategory_id, after, before, around=around)
+
+        from databases.crud import load_subcategory_screen
+
+        self._reload_in_background()
+        version = self._version
+        if around:
+            after, before = around - 1, 0
+        async with self._session_factory() as session:
+            return await load_subcategory_screen(session, subcategory_id, version, after, before)
+
+    def invalidate(self, product_id: int | None = None) -> None:
+        """Сбросить снимок после изменения каталога"""
+        self._version += 1
+        self._snapshot = None
+
+        for listener in self._listeners:
+            try:
+                listener(product_id)
+            except Exception:
+                logger.exception("Ошибка в обработчике инвалидации каталога")
+
+    def subscribe(self, listener: Callable[[int | None], None]) -> None:
+        """Подписаться на изменения каталога (product_id или None — весь каталог)"""
+        self._listeners.append(listener)
+
+
+catalog_cache = CatalogCache()
+# после правки админа каталог перечитывается с primary, пока реплики её не получат
+catalog_cache.subscribe(lambda product_id: replica_router.pin_primary())
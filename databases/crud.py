@@ -1,7 +1,9 @@
 from typing import List
 from aiogram import Bot
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import Integer, Text, cast, literal, null, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from aiogram.utils.keyboard import InlineKeyboardBuilder, InlineKeyboardMarkup
@@ -11,11 +13,16 @@ from aiogram.exceptions import TelegramBadRequest
 from aiogram.enums.parse_mode import ParseMode
 
 
+from databases.catalog_cache import (
+    CatalogCategory, CatalogProduct, CatalogSubcategory, CategoryScreen, SubcategoryScreen
+)
 from databases.engine import AsyncSessionLocal
+from databases.pagination import PAGE_SIZE, Page, keyset, keyset_page
 from fsm import EditProductStates
 from keyboards.admin_keyboards import get_admin_keyboard
 
-from .models import Category, Subcategory, Product
+from . import search
+from .models import Category, Order, Subcategory, Product
 
 
 
@@ -76,14 +83,10 @@ async def get_product(session: AsyncSession, product_id: int) -> Product | None:
 
 
 async def search_products(session: AsyncSession, search_term: str) -> list[Product]:
-    """Поиск товаров по названию"""
-    result = await session.execute(
-        select(Product)
-        .where(Product.name.ilike(f"%{search_term}%"))
-        .options(selectinload(Product.images))
-        .limit(20)  
+    """Поиск товаров по названию и описанию (см. databases/search.py)"""
+    return await search.search_products(
+        session, search_term, options=(selectinload(Product.images),)
     )
-    return result.scalars().all()
 
 
 async def get_products_by_category_id(
@@ -116,6 +119,141 @@ async def get_products_by_category(session: AsyncSession, category_id: int) -> l
     return result.scalars().all()
 
 
+def _category_rows(*where):
+    return select(
+        literal("category").label("kind"), Category.id, Category.name,
+        cast(null(), Text), cast(null(), Integer), cast(null(), Integer),
+    ).where(*where)
+
+
+def _subcategory_rows(*where):
+    return select(
+        literal("subcategory").label("kind"), Subcategory.id, Subcategory.name,
+        cast(null(), Text), Subcategory.category_id, cast(null(), Integer),
+    ).where(*where)
+
+
+def _product_rows(*where, kind: str = "product"):
+    return select(
+        literal(kind).label("kind"), Product.id, Product.name,
+        Product.short_description, Product.category_id, Product.subcategory_id,
+    ).where(*where)
+
+
+async def _load_screen_rows(session: AsyncSession, *parts) -> dict[str, list]:
+    """Выполнить UNION ALL из частей экрана одним запросом и разложить строки по видам"""
+    if session.get_bind().dialect.name == "sqlite":
+        # SQLite не принимает ORDER BY / LIMIT у частей UNION — только в подзапросе
+        parts = [select(part.subquery()) for part in parts]
+    statement = union_all(*parts)
+    statement = statement.order_by(statement.selected_columns.kind, statement.selected_columns.id)
+    rows: dict[str, list] = {"category": [], "subcategory": [], "product": [], "first_page_product": []}
+    for kind, *values in (await session.execute(statement)).all():
+        rows[kind].append(values)
+    return rows
+
+
+async def load_category_screen(
+    session: AsyncSession,
+    category_id: int,
+    version: int = 0,
+    after: int = 0,
+    before: int = 0,
+    size: int = PAGE_SIZE
+) -> CategoryScreen | None:
+    """
+    Категория, страница её подкатегорий и товаров без подкатегории — за один запрос.
+    Курсор — id из списка, который показывает экран: подкатегорий, если они
+    есть, иначе товаров; второй список — с первой страницы.
+    """
+    root = (Product.category_id == category_id, Product.subcategory_id.is_(None))
+    # первая подкатегория — по индексу (category_id, id), как и страница подкатегорий
+    first_subcategory = (
+        select(Subcategory.id).where(Subcategory.category_id == category_id)
+        .order_by(Subcategory.id).limit(1).scalar_subquery()
+    )
+    rows = await _load_screen_rows(
+        session,
+        _category_rows(Category.id == category_id),
+        keyset(_subcategory_rows(Subcategory.category_id == category_id), Subcategory.id, after, before, size),
+        keyset(_product_rows(*root, first_subcategory.is_(None)), Product.id, after, before, size),
+        keyset(_product_rows(*root, first_subcategory.is_not(None), kind="first_page_product"), Product.id, size=size),
+    )
+    if not rows["category"]:
+        return None
+
+    category_id, name, *_ = rows["category"][0]
+    subcategories = [CatalogSubcategory(id_, name, cid) for id_, name, _, cid, _ in rows["subcategory"]]
+    if rows["first_page_product"]:
+        products = keyset_page([CatalogProduct(*values) for values in rows["first_page_product"]], size=size)
+    else:
+        products = keyset_page([CatalogProduct(*values) for values in rows["product"]], after, before, size)
+    return CategoryScreen(
+        version=version,
+        category=CatalogCategory(category_id, name),
+        subcategories=keyset_page(subcategories, after, before, size),
+        products=products,
+    )
+
+
+async def load_subcategory_screen(
+    session: AsyncSession,
+    subcategory_id: int,
+    version: int = 0,
+    after: int = 0,
+    before: int = 0,
+    size: int = PAGE_SIZE
+) -> SubcategoryScreen | None:
+    """Подкатегория, её категория и страница товаров — за один запрос"""
+    parent_id = select(Subcategory.category_id).where(Subcategory.id == subcategory_id).scalar_subquery()
+    rows = await _load_screen_rows(
+        session,
+        _subcategory_rows(Subcategory.id == subcategory_id),
+        _category_rows(Category.id == parent_id),
+        keyset(_product_rows(Product.subcategory_id == subcategory_id), Product.id, after, before, size),
+    )
+    if not rows["subcategory"]:
+        return None
+
+    id_, name, _, category_id, _ = rows["subcategory"][0]
+    category = rows["category"][0][:2] if rows["category"] else None
+    return SubcategoryScreen(
+        version=version,
+        subcategory=CatalogSubcategory(id_, name, category_id),
+        category=CatalogCategory(*category) if category else None,
+        products=keyset_page([CatalogProduct(*values) for values in rows["product"]], after, before, size),
+    )
+
+
+async def get_products_page(
+    session: AsyncSession,
+    after: int = 0,
+    before: int = 0,
+    size: int = PAGE_SIZE
+) -> Page:
+    """Страница всех товаров по id (списки в админке): строки с id и name"""
+    result = await session.execute(keyset(select(Product.id, Product.name), Product.id, after, before, size))
+    return keyset_page(result.all(), after, before, size)
+
+
+async def create_order(session: AsyncSession, idempotency_key: str, **values) -> int:
+    """
+    Записать заказ одной вставкой и вернуть его id. Заказ с тем же
+    idempotency_key (повтор апдейта) второй раз не создаётся.
+    """
+    insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else pg_insert
+    order_id = await session.scalar(
+        insert(Order)
+        .values(idempotency_key=idempotency_key, **values)
+        .on_conflict_do_nothing(index_elements=[Order.idempotency_key])
+        .returning(Order.id)
+    )
+    await session.commit()
+    if order_id is None:
+        order_id = await session.scalar(select(Order.id).where(Order.idempotency_key == idempotency_key))
+    return order_id
+
+
 async def show_product_list_by_name(message: Message, state: FSMContext, products, search_query):
     """Показ списка найденных товаров"""
     builder = InlineKeyboardBuilder()
@@ -1,13 +1,23 @@
+import logging
+import logging.handlers
+import queue
+from dataclasses import dataclass, replace
+
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from environs import Env
 
-from sqlalchemy import text
+from sqlalchemy import event, make_url, text
+
+from databases.pool_stats import PoolStats, instrumented_pool
 
 env = Env()
 env.read_env()
 
 
-DATABASE_URL = (
+# База целиком одной строкой: postgresql+asyncpg://... или
+# sqlite+aiosqlite:///path/to/bot.db (один процесс бота, без PostgreSQL).
+# Пустая — PostgreSQL из DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME.
+DATABASE_URL = env.str("DATABASE_URL", "") or (
     "postgresql+asyncpg://"
     f"{env.str('DB_USER')}:"
     f"{env.str('DB_PASS')}@"
@@ -16,10 +26,152 @@ DATABASE_URL = (
     f"{env.str('DB_NAME')}"
 )
 
-engine: AsyncEngine = create_async_engine(
-    DATABASE_URL,
-    echo=True,  
-)
+# PRAGMA для SQLite на каждое соединение. WAL: читатели не ждут писателя.
+# synchronous=NORMAL в WAL не портит базу при сбое, но последние
+# транзакции до сбоя питания могут пропасть (FULL — fsync на каждый commit).
+SQLITE_SYNCHRONOUS = env.str("SQLITE_SYNCHRONOUS", "NORMAL")
+# Сколько файла читать через mmap, байт
+SQLITE_MMAP_SIZE = env.int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+# Кэш страниц на соединение: отрицательное — в КиБ (-65536 = 64 МиБ)
+SQLITE_CACHE_SIZE = env.int("SQLITE_CACHE_SIZE", -65536)
+# Сколько ждать, пока другое соединение допишет транзакцию, мс
+SQLITE_BUSY_TIMEOUT = env.int("SQLITE_BUSY_TIMEOUT", 5000)
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float  # сколько ждать свободное соединение, сек
+    pool_recycle: int  # переоткрывать соединения старше, сек (-1 — никогда)
+    pool_pre_ping: bool  # проверять соединение перед выдачей (+1 round trip)
+    statement_cache_size: int  # кэш подготовленных запросов asyncpg на соединение
+    echo: bool  # писать SQL в лог
+
+
+PROFILES = {
+    # локальная разработка: видно весь SQL, маленький пул
+    "dev": EngineProfile(
+        pool_size=5, max_overflow=5, pool_timeout=30, pool_recycle=-1,
+        pool_pre_ping=True, statement_cache_size=100, echo=True,
+    ),
+    # бот в проде: пул под WEBHOOK_MAX_CONCURRENCY, без лога SQL
+    "prod": EngineProfile(
+        pool_size=20, max_overflow=10, pool_timeout=10, pool_recycle=1800,
+        pool_pre_ping=True, statement_cache_size=500, echo=False,
+    ),
+    # нагрузочные прогоны: большой пул, без pre-ping, чтобы мерить сами запросы
+    "bench": EngineProfile(
+        pool_size=50, max_overflow=50, pool_timeout=30, pool_recycle=-1,
+        pool_pre_ping=False, statement_cache_size=1000, echo=False,
+    ),
+}
+
+# Профиль движка: dev (по умолчанию), prod или bench. Любое поле можно
+# переопределить: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+# DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, DB_ECHO.
+DB_PROFILE = env.str("DB_PROFILE", "dev")
+
+
+def load_profile(name: str = DB_PROFILE) -> EngineProfile:
+    """Профиль по имени с учётом переопределений из окружения"""
+    if name not in PROFILES:
+        raise ValueError(f"Неизвестный DB_PROFILE={name!r}, доступны: {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+    return replace(
+        profile,
+        pool_size=env.int("DB_POOL_SIZE", profile.pool_size),
+        max_overflow=env.int("DB_MAX_OVERFLOW", profile.max_overflow),
+        pool_timeout=env.float("DB_POOL_TIMEOUT", profile.pool_timeout),
+        pool_recycle=env.int("DB_POOL_RECYCLE", profile.pool_recycle),
+        pool_pre_ping=env.bool("DB_POOL_PRE_PING", profile.pool_pre_ping),
+        statement_cache_size=env.int("DB_STATEMENT_CACHE_SIZE", profile.statement_cache_size),
+        echo=env.bool("DB_ECHO", profile.echo),
+    )
+
+
+_sql_log_listener: logging.handlers.QueueListener | None = None
+
+
+def enable_sql_logging() -> None:
+    """
+    Лог SQL через очередь: запись в поток вывода делает отдельный поток,
+    а не обработчик апдейта (вместо echo=True, который пишет синхронно).
+    """
+    global _sql_log_listener
+    if _sql_log_listener is not None:
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    _sql_log_listener = logging.handlers.QueueListener(records, output)
+    _sql_log_listener.start()
+
+    # Уровень не выставляем: пишут только движки с echo=True. Раз у логгера
+    # уже есть обработчик, SQLAlchemy не добавит свой синхронный StreamHandler.
+    sql_logger = logging.getLogger("sqlalchemy.engine.Engine")
+    sql_logger.addHandler(logging.handlers.QueueHandler(records))
+    sql_logger.propagate = False
+
+
+def make_engine(
+    url: str = DATABASE_URL,
+    profile: EngineProfile | None = None,
+    stats: PoolStats | None = None,
+    **kwargs,
+) -> AsyncEngine:
+    """Движок по профилю; метрики пула пишутся в stats"""
+    profile = profile or load_profile()
+    if profile.echo:
+        enable_sql_logging()
+
+    connect_args = kwargs.pop("connect_args", {})
+    if url.startswith("postgresql+asyncpg"):
+        connect_args.setdefault("prepared_statement_cache_size", profile.statement_cache_size)
+    if url.startswith("sqlite") and _is_sqlite_memory(url):
+        # у каждого соединения пула была бы своя пустая база
+        raise ValueError("SQLite в памяти не поддерживается, укажите файл: sqlite+aiosqlite:///bot.db")
+
+    engine = create_async_engine(
+        url,
+        poolclass=instrumented_pool(stats or PoolStats()),
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pool_pre_ping,
+        echo=profile.echo,
+        connect_args=connect_args,
+        **kwargs,
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+    return engine
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE:d}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE:d}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT:d}")
+        # внешние ключи проверяются, как в PostgreSQL
+        cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cursor.close()
+
+
+pool_stats = PoolStats()
+
+engine: AsyncEngine = make_engine(stats=pool_stats)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -33,4 +185,3 @@ async def test():
         print(result.scalar())
 
 # asyncio.run(test())
-
@@ -0,0 +1,113 @@
+"""
+Запоминание file_id фото товаров.
+
+Фото из сида хранятся ссылками на внешние CDN: при отправке по url Telegram
+каждый раз заново скачивает и обрабатывает картинку. После первой удачной
+отправки обработчик передаёт сюда file_id из ответа Telegram, а запись в
+product_images делается пачкой в фоне — обработчик её не ждёт. Следующие
+показы товара отправляют фото по file_id.
+
+    file_id_writer.remember(image.id, photo.file_id, photo.file_unique_id)
+    media = file_id_writer.file_id(image) or image.url
+"""
+import asyncio
+import logging
+
+from environs import Env
+from sqlalchemy import bindparam, update
+
+from databases.engine import AsyncSessionLocal
+from databases.models import ProductImage
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Окно, за которое file_id копятся в одну запись в БД, сек
+FILE_ID_FLUSH_INTERVAL = env.float("FILE_ID_FLUSH_INTERVAL", 1.0)
+
+_UPDATE = (
+    update(ProductImage.__table__)
+    .where(ProductImage.__table__.c.id == bindparam("image_id"))
+    .values(file_id=bindparam("new_file_id"), file_unique_id=bindparam("new_file_unique_id"))
+)
+
+
+class FileIdWriter:
+    """Буфер file_id, которые ещё не записаны в product_images"""
+
+    def __init__(self, session_factory=AsyncSessionLocal, flush_interval: float = FILE_ID_FLUSH_INTERVAL):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+
+        self._pending: dict[int, tuple[str, str | None]] = {}
+        self._writing: dict[int, tuple[str, str | None]] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Task | None = None
+
+        self.remembered = 0
+        self.written = 0
+        self.flushes = 0
+
+    def file_id(self, image: ProductImage) -> str | None:
+        """file_id фото: из БД или ещё не записанный"""
+        if image.file_id:
+            return image.file_id
+        pending = self._pending.get(image.id) or self._writing.get(image.id)
+        return pending[0] if pending else None
+
+    def remember(self, image_id: int, file_id: str, file_unique_id: str | None = None) -> None:
+        """Запомнить file_id после отправки фото по url (без ожидания БД)"""
+        self._pending[image_id] = (file_id, file_unique_id)
+        self.remembered += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self.flush())
+        else:
+            self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Записать накопленные file_id одним запросом"""
+        if not self._pending:
+            return
+
+        self._writing, self._pending = self._pending, {}
+        try:
+            async with self._session_factory() as session:
+                await session.execute(_UPDATE, [
+                    {"image_id": image_id, "new_file_id": file_id, "new_file_unique_id": unique_id}
+                    for image_id, (file_id, unique_id) in self._writing.items()
+                ])
+                await session.commit()
+        except Exception:
+            logger.exception("Не удалось записать file_id фото, повтор при следующем сбросе")
+            for image_id, value in self._writing.items():
+                self._pending.setdefault(image_id, value)
+            self._schedule_flush()
+            return
+        finally:
+            written, self._writing = len(self._writing), {}
+
+        self.flushes += 1
+        self.written += written
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+
+file_id_writer = FileIdWriter()
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from environs import Env
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from databases.engine import AsyncSessionLocal
+from databases.models import FSMRecord
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# memory | redis | sql
+FSM_STORAGE = env.str("FSM_STORAGE", "memory")
+REDIS_URL = env.str("REDIS_URL", "redis://localhost:6379/0")
+# Окно, за которое записи update_data/set_state склеиваются в одну пачку. 0 — писать сразу.
+FSM_FLUSH_INTERVAL = env.float("FSM_FLUSH_INTERVAL", 0.05)
+# Сколько последних ключей держать в памяти процесса, чтобы не читать их заново
+FSM_CACHE_SIZE = env.int("FSM_CACHE_SIZE", 10_000)
+
+
+def compact_dumps(data: Any) -> str:
+    """JSON без пробелов и \\u-экранирования кириллицы"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _state_name(state: StateType) -> str | None:
+    return state.state if isinstance(state, State) else state
+
+
+class SQLStorage(BaseStorage):
+    """Хранилище FSM в таблице fsm_states (PostgreSQL или SQLite)"""
+
+    def __init__(self, session_factory=AsyncSessionLocal, key_builder: KeyBuilder | None = None):
+        self._session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder()
+
+    def _insert(self, session):
+        if session.bind.dialect.name == "sqlite":
+            return sqlite_insert(FSMRecord)
+        return pg_insert(FSMRecord)
+
+    def _upsert(self, session, key: str, **values):
+        stmt = self._insert(session).values(key=key, **values)
+        return stmt.on_conflict_do_update(index_elements=[FSMRecord.key], set_=values)
+
+    async def _read(self, key: StorageKey) -> FSMRecord | None:
+        async with self._session_factory() as session:
+            return await session.get(FSMRecord, self.key_builder.build(key))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = await self._read(key)
+        return record.state if record else None
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._read(key)
+        return json.loads(record.data) if record and record.data else {}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self.write_batch({key: _state_name(state)}, {})
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self.write_batch({}, {key: data})
+
+    async def write_batch(
+        self,
+        states: Mapping[StorageKey, str | None],
+        data: Mapping[StorageKey, Mapping[str, Any]],
+    ) -> None:
+        """Записать пачку состояний и данных одной транзакцией"""
+        async with self._session_factory() as session:
+            for key, state in states.items():
+                await session.execute(self._upsert(session, self.key_builder.build(key), state=state))
+
+            for key, value in data.items():
+                await session.execute(
+                    self._upsert(session, self.key_builder.build(key), data=compact_dumps(value) if value else None)
+                )
+
+            # Пустые записи (после state.clear()) не храним
+            empty = [self.key_builder.build(k) for k in {*states, *data}]
+            await session.execute(
+                delete(FSMRecord).where(
+                    FSMRecord.key.in_(empty),
+                    FSMRecord.state.is_(None),
+                    FSMRecord.data.is_(None),
+                )
+            )
+            await session.commit()
+
+    async def close(self) -> None:
+        pass
+
+
+def create_redis_storage(url: str = REDIS_URL) -> BaseStorage:
+    try:
+        from aiogram.fsm.storage.redis import RedisStorage
+    except ImportError as e:
+        raise RuntimeError("Для FSM_STORAGE=redis установите пакет redis: pip install redis") from e
+
+    class CompactRedisStorage(RedisStorage):
+        async def write_batch(self, states, data) -> None:
+            """Записать пачку состояний и данных одним pipeline"""
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, state in states.items():
+                    redis_key = self.key_builder.build(key, "state")
+                    if state is None:
+                        pipe.delete(redis_key)
+                    else:
+                        pipe.set(redis_key, state, ex=self.state_ttl)
+
+                for key, value in data.items():
+                    redis_key = self.key_builder.build(key, "data")
+                    if not value:
+                        pipe.delete(redis_key)
+                    else:
+                        pipe.set(redis_key, self.json_dumps(value), ex=self.data_ttl)
+
+                await pipe.execute()
+
+    return CompactRedisStorage.from_url(url, json_dumps=compact_dumps)
+
+
+class BufferedStorage(BaseStorage):
+    """
+    Буфер записи поверх удалённого хранилища.
+
+    set_state/set_data/update_data попадают в память процесса и сбрасываются
+    в backend пачкой раз в flush_interval секунд; повторные записи одного
+    ключа внутри окна склеиваются. Чтения обслуживаются из LRU-кэша последних
+    ключей. Рассчитан на то, что один чат обслуживает один процесс
+    (так и есть при polling/webhook в одном процессе и при шардировании по chat_id).
+    """
+
+    def __init__(
+        self,
+        backend: BaseStorage,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        cache_size: int = FSM_CACHE_SIZE,
+    ):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+
+        self._states: OrderedDict[StorageKey, str | None] = OrderedDict()
+        self._data: OrderedDict[StorageKey, dict[str, Any]] = OrderedDict()
+        self._dirty_states: set[StorageKey] = set()
+        self._dirty_data: set[StorageKey] = set()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Task | None = None
+
+        self.writes = 0
+        self.flushed_writes = 0
+        self.flushes = 0
+
+    def _remember(self, cache: OrderedDict, key: StorageKey, value: Any) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+
+        dirty = self._dirty_states if cache is self._states else self._dirty_data
+        while len(cache) > self.cache_size:
+            oldest = next(iter(cache))
+            if oldest in dirty:
+                break
+            cache.popitem(last=False)
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self.flush())
+        else:
+            self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Сбросить накопленные записи в backend"""
+        if not self._dirty_states and not self._dirty_data:
+            return
+
+        states = {key: self._states.get(key) for key in self._dirty_states}
+        data = {key: self._data.get(key, {}) for key in self._dirty_data}
+        self._dirty_states.clear()
+        self._dirty_data.clear()
+
+        try:
+            if hasattr(self.backend, "write_batch"):
+                await self.backend.write_batch(states, data)
+            else:
+                for key, state in states.items():
+                    await self.backend.set_state(key, state)
+                for key, value in data.items():
+                    await self.backend.set_data(key, value)
+        except Exception:
+            logger.exception("Не удалось записать FSM в хранилище, повтор при следующем сбросе")
+            self._dirty_states.update(k for k in states if k not in self._dirty_states)
+            self._dirty_data.update(k for k in data if k not in self._dirty_data)
+            self._schedule_flush()
+            return
+
+        self.flushes += 1
+        self.flushed_writes += len(states) + len(data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        if key in self._states:
+            self._states.move_to_end(key)
+            return self._states[key]
+
+        state = await self.backend.get_state(key)
+        self._remember(self._states, key, state)
+        return state
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        if key in self._data:
+            self._data.move_to_end(key)
+            return self._data[key].copy()
+
+        data = await self.backend.get_data(key)
+        self._remember(self._data, key, data)
+        return data.copy()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._remember(self._states, key, _state_name(state))
+        self._dirty_states.add(key)
+        self.writes += 1
+        self._schedule_flush()
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        self._remember(self._data, key, dict(data))
+        self._dirty_data.add(key)
+        self.writes += 1
+        self._schedule_flush()
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+        await self.backend.close()
+
+
+def create_fsm_storage(kind: str = FSM_STORAGE) -> BaseStorage:
+    """Хранилище FSM по переменной окружения FSM_STORAGE"""
+    if kind == "memory":
+        return MemoryStorage()
+
+    if kind == "redis":
+        backend = create_redis_storage()
+    elif kind == "sql":
+        backend = SQLStorage()
+    else:
+        raise ValueError(f"Неизвестное FSM_STORAGE: {kind!r} (memory, redis или sql)")
+
+    if FSM_FLUSH_INTERVAL <= 0:
+        return backend
+    return BufferedStorage(backend)
@@ -0,0 +1,148 @@
+"""
+Миграции схемы БД (вместо create_all из бывшего databases/init_db.py).
+
+Миграция — SQL-файл databases/migrations/NNNN_описание.sql. Файл
+NNNN_описание.<postgresql|sqlite>.sql применяется только на своей СУБД и
+заменяет общий файл той же версии; если для СУБД файла нет, версия просто
+отмечается применённой. Применённые версии хранятся в schema_migrations,
+миграция и запись о ней выполняются одной транзакцией.
+
+    python -m databases.migrate            # применить новые миграции
+    python -m databases.migrate --status   # показать, что применено
+    python -m databases.migrate --skip 0002  # без поиска (нет расширения pg_trgm)
+"""
+import argparse
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+_FILE_NAME = re.compile(r"^(?P<version>\d{4})_(?P<name>\w+?)(?:\.(?P<dialect>postgresql|sqlite))?\.sql$")
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version varchar(4) PRIMARY KEY,
+    name varchar NOT NULL,
+    applied_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Migration:
+    version: str
+    name: str
+    path: Path | None  # None — для этой СУБД делать нечего
+
+    def record_sql(self) -> str:
+        # version и name проверены регулярным выражением имени файла
+        return f"INSERT INTO schema_migrations (version, name) VALUES ('{self.version}', '{self.name}');"
+
+
+def discover(dialect: str, directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Миграции для СУБД dialect по возрастанию версии"""
+    variants: dict[str, dict[str | None, Path]] = {}
+    names: dict[str, str] = {}
+
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILE_NAME.match(path.name)
+        if not match:
+            raise ValueError(f"Неверное имя файла миграции: {path.name}")
+        variants.setdefault(match["version"], {})[match["dialect"]] = path
+        names.setdefault(match["version"], match["name"])
+
+    return [
+        Migration(version, names[version], variants[version].get(dialect) or variants[version].get(None))
+        for version in sorted(variants)
+    ]
+
+
+async def applied_versions(conn: AsyncConnection) -> set[str]:
+    await conn.execute(text(_CREATE_TABLE))
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(result.scalars().all())
+
+
+async def _apply(conn: AsyncConnection, migration: Migration) -> None:
+    dialect = conn.dialect.name
+    if migration.path is None:
+        await conn.execute(text(migration.record_sql()))
+        await conn.commit()
+        return
+
+    script = migration.path.read_text(encoding="utf-8").rstrip().rstrip(";")
+    driver = (await conn.get_raw_connection()).driver_connection
+
+    if dialect == "postgresql":
+        # Несколько команд в одном запросе PostgreSQL выполняет одной неявной транзакцией
+        await driver.execute(f"{script};\n{migration.record_sql()}")
+    elif dialect == "sqlite":
+        try:
+            await driver.executescript(f"BEGIN;\n{script};\n{migration.record_sql()}\nCOMMIT;")
+        except Exception:
+            await driver.rollback()
+            raise
+    else:
+        raise RuntimeError(f"Миграции не поддерживают СУБД {dialect}")
+
+
+async def migrate(
+    engine: AsyncEngine,
+    directory: Path = MIGRATIONS_DIR,
+    skip: Iterable[str] = (),
+) -> list[str]:
+    """Применить недостающие миграции (кроме версий skip); вернуть их версии"""
+    skip = set(skip)
+    async with engine.connect() as conn:
+        applied = await applied_versions(conn)
+        await conn.commit()
+
+        done = []
+        for migration in discover(conn.dialect.name, directory):
+            if migration.version in applied or migration.version in skip:
+                continue
+            logger.info("Миграция %s_%s", migration.version, migration.name)
+            await _apply(conn, migration)
+            done.append(migration.version)
+        return done
+
+
+async def status(engine: AsyncEngine, directory: Path = MIGRATIONS_DIR) -> list[tuple[Migration, bool]]:
+    async with engine.connect() as conn:
+        applied = await applied_versions(conn)
+        await conn.commit()
+        return [(m, m.version in applied) for m in discover(conn.dialect.name, directory)]
+
+
+async def main(show_status: bool, skip: list[str]) -> None:
+    from databases.engine import engine
+
+    try:
+        if show_status:
+            for migration, done in await status(engine):
+                target = migration.path.name if migration.path else "(не для этой СУБД)"
+                print(f"{'✅' if done else '⏳'} {migration.version}_{migration.name}: {target}")
+        else:
+            done = await migrate(engine, skip=skip)
+            print(f"Применено миграций: {len(done)}" + (f" ({', '.join(done)})" if done else ""))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("--status", action="store_true", help="показать применённые миграции")
+    parser.add_argument("--skip", nargs="*", default=[], help="не применять эти версии (например, 0002)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.status, args.skip))
@@ -0,0 +1,56 @@
+-- Исходная схема (как в ansar_bot_db.sql и бывшем databases/init_db.py).
+-- IF NOT EXISTS: на уже существующей базе миграция ничего не меняет.
+
+DO $$
+BEGIN
+    CREATE TYPE orderstatus AS ENUM ('NEW', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS categories (
+    id serial PRIMARY KEY,
+    name varchar NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS subcategories (
+    id serial PRIMARY KEY,
+    name varchar NOT NULL,
+    category_id integer NOT NULL REFERENCES categories (id)
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id serial PRIMARY KEY,
+    name varchar NOT NULL,
+    short_description text,
+    additional_info text,
+    subcategory_id integer REFERENCES subcategories (id),
+    category_id integer REFERENCES categories (id)
+);
+
+CREATE TABLE IF NOT EXISTS product_images (
+    id serial PRIMARY KEY,
+    url varchar NOT NULL,
+    product_id integer NOT NULL REFERENCES products (id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id serial PRIMARY KEY,
+    product_name varchar(255) NOT NULL,
+    product_description text,
+    product_info text,
+    customer_name varchar(100) NOT NULL,
+    customer_phone varchar(20) NOT NULL,
+    created_at timestamp without time zone NOT NULL,
+    updated_at timestamp without time zone NOT NULL,
+    status orderstatus NOT NULL,
+    notes text,
+    product_images text
+);
+
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key varchar PRIMARY KEY,
+    state varchar,
+    data text
+);
@@ -0,0 +1,49 @@
+-- Исходная схема для SQLite: те же таблицы и колонки, что в
+-- 0001_initial.postgresql.sql. serial — INTEGER PRIMARY KEY (rowid),
+-- тип orderstatus — строка с CHECK, как Enum SQLAlchemy без native_enum.
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name varchar NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS subcategories (
+    id INTEGER PRIMARY KEY,
+    name varchar NOT NULL,
+    category_id integer NOT NULL REFERENCES categories (id)
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name varchar NOT NULL,
+    short_description text,
+    additional_info text,
+    subcategory_id integer REFERENCES subcategories (id),
+    category_id integer REFERENCES categories (id)
+);
+
+CREATE TABLE IF NOT EXISTS product_images (
+    id INTEGER PRIMARY KEY,
+    url varchar NOT NULL,
+    product_id integer NOT NULL REFERENCES products (id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    product_name varchar(255) NOT NULL,
+    product_description text,
+    product_info text,
+    customer_name varchar(100) NOT NULL,
+    customer_phone varchar(20) NOT NULL,
+    created_at timestamp NOT NULL,
+    updated_at timestamp NOT NULL,
+    status varchar(11) NOT NULL CHECK (status IN ('NEW', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED')),
+    notes text,
+    product_images text
+);
+
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key varchar PRIMARY KEY,
+    state varchar,
+    data text
+);
@@ -0,0 +1,25 @@
+-- Полнотекстовый и нечёткий поиск товаров (databases/search.py), только PostgreSQL
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Название важнее описания, описание важнее доп. информации
+ALTER TABLE products
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(short_description, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(additional_info, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_products_search_vector
+    ON products USING gin (search_vector);
+
+-- Опечатки и поиск по части слова (ILIKE '%...%' тоже идёт по этим индексам)
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm
+    ON products USING gin (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_products_short_description_trgm
+    ON products USING gin (short_description gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_products_additional_info_trgm
+    ON products USING gin (additional_info gin_trgm_ops);
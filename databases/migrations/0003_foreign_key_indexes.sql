@@ -0,0 +1,12 @@
+-- Индексы для навигации по каталогу: get_subcategories, get_products,
+-- get_products_by_category и selectinload(Product.images)
+
+CREATE INDEX IF NOT EXISTS ix_subcategories_category_id ON subcategories (category_id);
+
+CREATE INDEX IF NOT EXISTS ix_products_subcategory_id ON products (subcategory_id);
+
+-- category_id = ? AND subcategory_id IS NULL; отдельный индекс по category_id
+-- не нужен — его заменяет первая колонка этого
+CREATE INDEX IF NOT EXISTS ix_products_category_subcategory ON products (category_id, subcategory_id);
+
+CREATE INDEX IF NOT EXISTS ix_product_images_product_id ON product_images (product_id);
@@ -0,0 +1,5 @@
+-- file_id фото товара из ответа Telegram (см. databases/file_ids.py)
+
+ALTER TABLE product_images ADD COLUMN file_id varchar;
+
+ALTER TABLE product_images ADD COLUMN file_unique_id varchar;
@@ -0,0 +1,27 @@
+-- Заказы пользователей и доставка уведомлений менеджеру (handlers/order_outbox.py).
+-- Заказ записывается одной вставкой, а строки с notified_at IS NULL — очередь
+-- уведомлений: notify_after — когда пробовать следующий раз.
+
+ALTER TABLE orders ADD COLUMN idempotency_key varchar;
+
+ALTER TABLE orders ADD COLUMN customer_chat_id bigint;
+
+ALTER TABLE orders ADD COLUMN category_name varchar;
+
+ALTER TABLE orders ADD COLUMN subcategory_name varchar;
+
+ALTER TABLE orders ADD COLUMN notified_at timestamp;
+
+ALTER TABLE orders ADD COLUMN notify_after timestamp;
+
+ALTER TABLE orders ADD COLUMN notify_attempts integer NOT NULL DEFAULT 0;
+
+ALTER TABLE orders ADD COLUMN notify_error text;
+
+-- заказы, созданные до очереди, менеджеру уже не отправляем
+UPDATE orders SET notified_at = created_at;
+
+-- повторная доставка того же апдейта не создаёт второй заказ
+CREATE UNIQUE INDEX IF NOT EXISTS ix_orders_idempotency_key ON orders (idempotency_key);
+
+CREATE INDEX IF NOT EXISTS ix_orders_outbox ON orders (notify_after) WHERE notified_at IS NULL;
@@ -0,0 +1,7 @@
+-- Артикул поставщика: по нему массовая загрузка (databases/bulk_import.py)
+-- обновляет уже загруженные товары. У товаров, добавленных вручную, NULL —
+-- уникальный индекс NULL не сравнивает
+
+ALTER TABLE products ADD COLUMN sku varchar;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_products_sku ON products (sku);
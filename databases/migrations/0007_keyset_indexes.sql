@@ -0,0 +1,18 @@
+-- Постраничные списки (databases/pagination.py): parent = ? AND id > ? ORDER BY id LIMIT n.
+-- С id последней колонкой индекс отдаёт строки страницы уже по порядку —
+-- без чтения и сортировки всех товаров подкатегории. Прежние индексы
+-- по одной колонке из 0003 — префиксы новых, они больше не нужны
+
+CREATE INDEX IF NOT EXISTS ix_subcategories_category_id_id ON subcategories (category_id, id);
+
+DROP INDEX IF EXISTS ix_subcategories_category_id;
+
+CREATE INDEX IF NOT EXISTS ix_products_subcategory_id_id ON products (subcategory_id, id);
+
+DROP INDEX IF EXISTS ix_products_subcategory_id;
+
+-- Товары категории без подкатегории. По (category_id, subcategory_id, id)
+-- PostgreSQL не выдаёт строки по порядку id при subcategory_id IS NULL и
+-- идёт по первичному ключу, отбрасывая чужие товары, — частичный индекс
+-- отвечает ровно на этот запрос
+CREATE INDEX IF NOT EXISTS ix_products_root_category_id_id ON products (category_id, id) WHERE subcategory_id IS NULL;
@@ -1,6 +1,6 @@
 from datetime import datetime
 import enum
-from sqlalchemy import DateTime, Enum, Float, ForeignKey, String, Text
+from sqlalchemy import BigInteger, DateTime, Enum, Float, ForeignKey, Index, Integer, String, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.orm import DeclarativeBase
 
@@ -30,6 +30,10 @@ class Category(Base):
 
 class Subcategory(Base):
     __tablename__ = "subcategories"
+    __table_args__ = (
+        # Индекс создаётся миграцией 0007_keyset_indexes.sql
+        Index("ix_subcategories_category_id_id", "category_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -51,8 +55,17 @@ class Subcategory(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Индексы создаются миграциями 0003_foreign_key_indexes.sql и 0007_keyset_indexes.sql
+        Index("ix_products_category_subcategory", "category_id", "subcategory_id"),
+        Index("ix_products_subcategory_id_id", "subcategory_id", "id"),
+        Index("ix_products_root_category_id_id", "category_id", "id",
+              postgresql_where=text("subcategory_id IS NULL"), sqlite_where=text("subcategory_id IS NULL")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    # Артикул поставщика (массовая загрузка, databases/bulk_import.py); у товаров из бота — NULL
+    sku: Mapped[str | None] = mapped_column(String, nullable=True, unique=True, index=True)
     name: Mapped[str] = mapped_column(String, nullable=False)  # Название
     short_description: Mapped[str] = mapped_column(Text, nullable=True)  # Краткое описание
     additional_info: Mapped[str] = mapped_column(Text, nullable=True)  # Доп. информация (опционально)
@@ -81,7 +94,11 @@ class ProductImage(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     url: Mapped[str] = mapped_column(String, nullable=False)
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    # file_id из ответа Telegram на первую отправку: дальше фото шлётся по нему,
+    # без повторной загрузки по url
+    file_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    file_unique_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
 
     product: Mapped["Product"] = relationship(back_populates="images")
 
@@ -113,4 +130,29 @@ class Order(Base):
     notes: Mapped[str] = mapped_column(Text, nullable=True)  # Примечания менеджера
     
     # Фото товара (можем сохранить file_id или ссылки)
-    product_images: Mapped[str] = mapped_column(Text, nullable=True)
\ No newline at end of file
+    product_images: Mapped[str] = mapped_column(Text, nullable=True)
+
+    # Заказ из бота: ключ апдейта, чтобы повтор не создал второй заказ
+    idempotency_key: Mapped[str] = mapped_column(String, nullable=True, unique=True, index=True)
+    customer_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    category_name: Mapped[str] = mapped_column(String, nullable=True)
+    subcategory_name: Mapped[str] = mapped_column(String, nullable=True)
+
+    # Очередь уведомлений менеджеру (см. handlers/order_outbox.py)
+    notified_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    notify_after: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    notify_attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    notify_error: Mapped[str] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_orders_outbox", "notify_after", postgresql_where=text("notified_at IS NULL"),
+              sqlite_where=text("notified_at IS NULL")),
+    )
+
+class FSMRecord(Base):
+    """Состояние FSM пользователя (для хранилища FSM_STORAGE=sql)"""
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # fsm:<chat_id>:<user_id>...
+    state: Mapped[str] = mapped_column(String, nullable=True)
+    data: Mapped[str] = mapped_column(Text, nullable=True)  # компактный JSON
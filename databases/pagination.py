@@ -0,0 +1,99 @@
+"""
+Постраничные списки по ключу (keyset): страница — это «PAGE_SIZE записей
+после id X» или «перед id Y», а не OFFSET. Курсор — один id, он влезает
+в callback_data кнопок ◀️ / ▶️ (см. handlers.callbacks.PageCallback), а
+запрос страницы — WHERE id > X ORDER BY id LIMIT n по первичному ключу,
+сколько бы записей ни было в списке.
+
+page_of режет так же уже загруженный список (снимок каталога), упорядоченный
+по id, — бинарным поиском. around — «страница, на которой запись с этим id»:
+так кнопка «Назад» возвращает на ту страницу списка, с которой ушли, не
+храня курсор (страницы снимка выровнены по PAGE_SIZE от начала списка).
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Generic, Sequence, TypeVar
+
+from environs import Env
+from sqlalchemy import Select
+
+
+env = Env()
+env.read_env()
+
+# Сколько записей на странице списка (кнопок в клавиатуре, строк в сообщении)
+PAGE_SIZE = env.int("PAGE_SIZE", 20)
+
+T = TypeVar("T")
+
+_id = attrgetter("id")
+
+
+@dataclass(frozen=True, slots=True)
+class Page(Generic[T]):
+    items: tuple[T, ...]
+    before: int | None = None  # курсор для ◀️: id первой записи; None — это первая страница
+    after: int | None = None  # курсор для ▶️: id последней записи; None — это последняя страница
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def page_of(
+    items: Sequence[T], after: int = 0, before: int = 0, size: int = PAGE_SIZE, around: int = 0
+) -> Page[T]:
+    """Страница списка items, упорядоченного по id"""
+    if around:
+        # запись могли удалить: тогда страница, где она стояла бы
+        index = min(bisect_left(items, around, key=_id), max(len(items) - 1, 0))
+        start = index - index % size
+        end = min(len(items), start + size)
+    elif before:
+        end = bisect_left(items, before, key=_id)
+        start = max(0, end - size)
+    else:
+        start = bisect_right(items, after, key=_id)
+        end = min(len(items), start + size)
+
+    page = tuple(items[start:end])
+    if not page:
+        return Page(page)
+    return Page(
+        page,
+        before=page[0].id if start > 0 else None,
+        after=page[-1].id if end < len(items) else None,
+    )
+
+
+def keyset(statement: Select, id_column, after: int = 0, before: int = 0, size: int = PAGE_SIZE) -> Select:
+    """
+    Запрос страницы: на одну строку больше size, чтобы узнать, есть ли
+    следующая (или предыдущая) страница. Строки разбирает keyset_page.
+    """
+    if before:
+        return statement.where(id_column < before).order_by(id_column.desc()).limit(size + 1)
+    return statement.where(id_column > after).order_by(id_column).limit(size + 1)
+
+
+def keyset_page(rows: Sequence[T], after: int = 0, before: int = 0, size: int = PAGE_SIZE) -> Page[T]:
+    """Страница из строк запроса keyset (в любом порядке: сортируются по id)"""
+    rows = sorted(rows, key=_id)
+    if before:
+        more = len(rows) > size
+        page = tuple(rows[-size:]) if rows else ()
+        if not page:
+            return Page(page)
+        return Page(page, before=page[0].id if more else None, after=page[-1].id)
+
+    more = len(rows) > size
+    page = tuple(rows[:size])
+    if not page:
+        return Page(page)
+    return Page(page, before=page[0].id if after else None, after=page[-1].id if more else None)
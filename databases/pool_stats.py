@@ -0,0 +1,89 @@
+"""
+Метрики пула соединений SQLAlchemy: ожидание при выдаче соединения,
+занятые соединения, выход за pool_size (overflow) и таймауты пула.
+
+    from databases.engine import pool_stats
+    pool_stats.snapshot()  # {'checked_out': 3, 'wait_p99_ms': 0.4, ...}
+"""
+import logging
+import time
+from collections import deque
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    def __init__(self, window: int = 1000):
+        self.pool = None
+        self._recent_waits: deque[float] = deque(maxlen=window)
+        self.reset()
+
+    def reset(self) -> None:
+        """Обнулить счётчики (сам пул не трогается)"""
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits.clear()
+
+    def record_checkout(self, wait: float, overflow: bool) -> None:
+        self.checkouts += 1
+        self.overflow_events += overflow
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self._recent_waits.append(wait)
+
+    def snapshot(self) -> dict[str, float]:
+        """Текущее состояние пула и накопленные счётчики"""
+        waits = sorted(self._recent_waits)
+        p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+        pool = self.pool
+        return {
+            "pool_size": pool.size() if pool else 0,
+            "checked_out": pool.checkedout() if pool else 0,
+            "overflow": max(pool.overflow(), 0) if pool else 0,
+            "checkouts": self.checkouts,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_p99_ms": p99 * 1000,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+    def log(self) -> None:
+        logger.info(
+            "Пул БД: занято %(checked_out)s из %(pool_size)s (+%(overflow)s overflow), "
+            "выдач %(checkouts)s, overflow %(overflow_events)s, таймаутов %(timeouts)s, "
+            "ожидание avg %(wait_avg_ms).2f / p99 %(wait_p99_ms).2f / max %(wait_max_ms).2f мс",
+            self.snapshot(),
+        )
+
+
+def instrumented_pool(stats: PoolStats) -> type[AsyncAdaptedQueuePool]:
+    """Класс пула (для poolclass=), который пишет метрики в stats"""
+
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stats.pool = self  # после engine.dispose() пул пересоздаётся
+
+        def _do_get(self):
+            overflow_before = self._overflow
+            started = time.perf_counter()
+            try:
+                record = super()._do_get()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            stats.record_checkout(
+                time.perf_counter() - started,
+                overflow=self._overflow > max(overflow_before, 0),
+            )
+            return record
+
+    return InstrumentedPool
@@ -0,0 +1,226 @@
+"""
+Чтение каталога с реплик PostgreSQL.
+
+DATABASE_REPLICA_URLS — реплики (streaming replication) основной базы.
+ReadSessionLocal выдаёт сессию только для чтения: по кругу по здоровым
+репликам. Реплика здорова, если отвечает на проверку и отстаёт не больше
+REPLICA_MAX_LAG; проверка идёт в фоне раз в REPLICA_CHECK_INTERVAL, а
+реплика, к которой не удалось подключиться, выбывает сразу — сессия
+уходит на следующую или на primary. Подходящих реплик нет (или список
+пуст) — сессия на primary, как AsyncSessionLocal.
+
+Запись и всё, что читает свою запись (админка, заказы, FSM), остаются на
+AsyncSessionLocal. После правки каталога (CatalogCache.invalidate) чтение
+закрепляется за primary на REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL: за это
+время здоровая реплика успевает получить правку.
+
+    async with ReadSessionLocal() as session:
+        categories = await get_categories(session)
+"""
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from environs import Env
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from databases.engine import AsyncSessionLocal, make_engine
+from databases.pool_stats import PoolStats
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Реплики через запятую: postgresql+asyncpg://...,postgresql+asyncpg://...
+# Пусто — всё читается с primary.
+DATABASE_REPLICA_URLS = env.list("DATABASE_REPLICA_URLS", [])
+# Реплика, отставшая больше чем на столько секунд, не получает чтения
+REPLICA_MAX_LAG = env.float("REPLICA_MAX_LAG", 5.0)
+# Как часто проверять доступность и отставание реплик, сек
+REPLICA_CHECK_INTERVAL = env.float("REPLICA_CHECK_INTERVAL", 2.0)
+# Сколько ждать подключения к реплике, сек: дальше чтение уходит на другую базу
+REPLICA_CONNECT_TIMEOUT = env.float("REPLICA_CONNECT_TIMEOUT", 2.0)
+
+# Отставание в секундах. Реплика, которая применила всё полученное, не отстаёт,
+# даже если давно не было записей; база не в режиме восстановления — не реплика
+# streaming replication (например, подписчик логической), отставания нет.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_numbers = itertools.count(1)
+
+
+class Replica:
+    """Движок реплики и её последнее известное состояние"""
+
+    def __init__(self, url: str, **engine_kwargs):
+        self.name = f"replica{next(_numbers)}"
+        self.host = make_url(url).render_as_string(hide_password=True)
+        connect_args = dict(engine_kwargs.pop("connect_args", {}))
+        connect_args.setdefault("timeout", REPLICA_CONNECT_TIMEOUT)
+        self.pool_stats = PoolStats()
+        self.engine = make_engine(url, stats=self.pool_stats, connect_args=connect_args, **engine_kwargs)
+        self.sessions = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+        self.healthy = False  # до первой проверки читаем с primary
+        self.lag: float | None = None
+        self.reads = 0
+        self.failures = 0
+
+    def mark_down(self, error: BaseException) -> None:
+        if self.healthy:
+            logger.warning("Реплика %s недоступна: %s", self.host, error)
+        self.healthy = False
+        self.failures += 1
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error.orig, OSError)
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class ReplicaRouter:
+    """Сессии для чтения: по кругу по здоровым репликам, иначе primary"""
+
+    def __init__(
+        self,
+        urls: list[str] = DATABASE_REPLICA_URLS,
+        primary: async_sessionmaker = AsyncSessionLocal,
+        max_lag: float = REPLICA_MAX_LAG,
+        check_interval: float = REPLICA_CHECK_INTERVAL,
+        **engine_kwargs,
+    ):
+        self._primary = primary
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.replicas = [Replica(url, **engine_kwargs) for url in urls]
+        self._next = 0
+        self._pinned_until = 0.0
+        self._task: asyncio.Task | None = None
+
+        self.primary_reads = 0
+        self.pinned_reads = 0
+        self.failovers = 0
+
+    def pin_primary(self, seconds: float | None = None) -> None:
+        """Читать с primary ближайшие seconds (по умолчанию — пока реплики догоняют запись)"""
+        if not self.replicas:
+            return
+        if seconds is None:
+            seconds = self.max_lag + self.check_interval
+        self._pinned_until = max(self._pinned_until, time.monotonic() + seconds)
+
+    def _candidates(self) -> list[Replica]:
+        """Здоровые реплики, начиная со следующей по кругу"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        start = self._next % len(healthy)
+        self._next += 1
+        return healthy[start:] + healthy[:start]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия только для чтения"""
+        if self.replicas and time.monotonic() < self._pinned_until:
+            self.pinned_reads += 1
+            candidates = []
+        else:
+            candidates = self._candidates()
+
+        for replica in candidates:
+            session = replica.sessions()
+            try:
+                # подключаемся сразу: упавшую реплику пропускаем до первого запроса хендлера
+                await session.connection()
+            except Exception as e:
+                await session.close()
+                if not _is_connection_error(e):
+                    raise
+                replica.mark_down(e)
+                self.failovers += 1
+                continue
+
+            replica.reads += 1
+            async with session:
+                try:
+                    yield session
+                except Exception as e:
+                    if _is_connection_error(e):
+                        replica.mark_down(e)
+                    raise
+            return
+
+        self.primary_reads += 1
+        async with self._primary() as session:
+            yield session
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float(await asyncio.wait_for(conn.scalar(LAG_QUERY), self.check_interval or None))
+        except Exception as e:
+            replica.lag = None
+            replica.mark_down(e)
+            return
+
+        replica.lag = lag
+        healthy = lag <= self.max_lag
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info("Реплика %s в работе, отставание %.1f с", replica.host, lag)
+            else:
+                logger.warning("Реплика %s отстаёт на %.1f с, чтение идёт мимо неё", replica.host, lag)
+        replica.healthy = healthy
+
+    async def check(self) -> None:
+        """Проверить все реплики сейчас"""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self) -> None:
+        """Первая проверка и фоновые проверки (при старте бота)"""
+        if not self.replicas or self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._check_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict[str, float]:
+        stats = {
+            "replicas": len(self.replicas),
+            "healthy": sum(replica.healthy for replica in self.replicas),
+            "replica_reads": sum(replica.reads for replica in self.replicas),
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "failovers": self.failovers,
+        }
+        for replica in self.replicas:
+            stats[f"{replica.name}_lag"] = replica.lag if replica.lag is not None else -1
+        return stats
+
+
+replica_router = ReplicaRouter()
+
+ReadSessionLocal = replica_router.session
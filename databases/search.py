@@ -0,0 +1,119 @@
+"""
+Поиск товаров.
+
+В PostgreSQL — полнотекстовый поиск по products.search_vector (русская
+морфология, префиксы, ранжирование ts_rank_cd), а если он ничего не нашёл —
+нечёткий поиск по триграммам (опечатки, часть слова). Колонка и индексы
+создаются миграцией databases/migrations/0002_product_search.postgresql.sql.
+На других СУБД — прежний ILIKE по названию.
+"""
+import re
+from typing import Sequence
+
+from environs import Env
+from sqlalchemy import func, literal, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Product
+
+
+env = Env()
+env.read_env()
+
+SEARCH_LIMIT = env.int("SEARCH_LIMIT", 20)
+# Порог pg_trgm.word_similarity_threshold для нечёткого поиска (0..1)
+SEARCH_FUZZY_THRESHOLD = env.float("SEARCH_FUZZY_THRESHOLD", 0.4)
+
+_WORD = re.compile(r"[^\W_]+")
+
+search_vector = literal_column("products.search_vector")
+
+
+def tokenize(query: str) -> list[str]:
+    """Слова запроса в нижнем регистре"""
+    return _WORD.findall(query.lower())
+
+
+def escape_like(value: str) -> str:
+    """Экранировать % и _ для LIKE/ILIKE с escape="\\": ищутся как обычные символы"""
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+def prefix_tsquery(query: str) -> str | None:
+    """'угловой див' -> 'угловой:* & див:*' (слова без спецсимволов, безопасно для to_tsquery)"""
+    words = tokenize(query)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+async def search_products(
+    session: AsyncSession,
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    options: Sequence = (),
+    fuzzy: bool = True,
+) -> list[Product]:
+    """Найти товары, самые релевантные — первыми"""
+    query = query.strip()
+    if not query:
+        return []
+
+    if session.get_bind().dialect.name != "postgresql":
+        return await _search_ilike(session, query, limit, options)
+
+    products = await _search_fulltext(session, query, limit, options)
+    if not products and fuzzy:
+        products = await _search_fuzzy(session, query, limit, options)
+    return products
+
+
+async def _search_fulltext(session, query, limit, options) -> list[Product]:
+    tsquery_text = prefix_tsquery(query)
+    if tsquery_text is None:
+        return []
+
+    tsquery = func.to_tsquery(literal_column("'russian'::regconfig"), tsquery_text)
+    result = await session.execute(
+        select(Product)
+        .where(search_vector.op("@@")(tsquery))
+        .order_by(func.ts_rank_cd(search_vector, tsquery).desc(), Product.id)
+        .options(*options)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def _search_fuzzy(session, query, limit, options) -> list[Product]:
+    # Порог действует до конца транзакции; оператор <% использует GIN-индекс
+    await session.execute(
+        select(func.set_config("pg_trgm.word_similarity_threshold", str(SEARCH_FUZZY_THRESHOLD), True))
+    )
+    term = literal(query.lower())
+    name_score = func.word_similarity(term, Product.name)
+    description_score = func.coalesce(func.word_similarity(term, Product.short_description), 0) * 0.5
+
+    result = await session.execute(
+        select(Product)
+        .where(or_(
+            Product.name.icontains(query, autoescape=True),
+            term.op("<%")(Product.name),
+            term.op("<%")(Product.short_description),
+        ))
+        .order_by(func.greatest(name_score, description_score).desc(), Product.id)
+        .options(*options)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def _search_ilike(session, query, limit, options) -> list[Product]:
+    result = await session.execute(
+        select(Product)
+        # autoescape: % и _ в запросе ищутся как обычные символы
+        .where(Product.name.icontains(query, autoescape=True))
+        .order_by(Product.name)
+        .options(*options)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
@@ -0,0 +1,259 @@
+"""
+Поисковый индекс товаров в памяти процесса для пользовательского «🔍 Поиск».
+
+Инвертированный индекс по названию и краткому описанию: слова приводятся
+к нижнему регистру и основе (databases/stemmer.py), для поиска по началу
+слова хранится словарь префиксов основ. Ранжирование — BM25, название
+весит больше описания.
+
+Индекс строится из снимка каталога (databases/catalog_cache.py) и
+обновляется по товарам, которые админ изменил: CatalogCache.invalidate()
+сообщает product_id, и при следующем поиске переиндексируются только они.
+"""
+import heapq
+import logging
+import math
+import re
+import sys
+from collections import Counter, OrderedDict
+from typing import Iterable
+
+from environs import Env
+
+from databases.catalog_cache import CatalogCache, CatalogProduct, CatalogSnapshot, catalog_cache
+from databases.stemmer import stem
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_LIMIT = env.int("SEARCH_INDEX_LIMIT", 10)
+
+# Слово названия считается столько раз, сколько указано (BM25F по-простому)
+NAME_WEIGHT = 3
+MIN_PREFIX = 2
+# Сколько основ максимум подставлять вместо префикса
+MAX_PREFIX_EXPANSIONS = 50
+# Совпадение по префиксу ценится меньше точного совпадения основы
+PREFIX_PENALTY = 0.6
+
+# Сколько последних результатов поиска помнить (сбрасываются при любом изменении индекса)
+RESULTS_CACHE_SIZE = 256
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Основы слов текста"""
+    if not text:
+        return []
+    return [stem(word) for word in _WORD.findall(text.lower())]
+
+
+class ProductSearchIndex:
+    """Инвертированный индекс с ранжированием BM25"""
+
+    def __init__(self):
+        self._postings: dict[str, dict[int, int]] = {}
+        self._prefixes: dict[str, set[str]] = {}
+        self._documents: dict[int, Counter] = {}
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+        self._results: OrderedDict[tuple, list[int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def build(self, products: Iterable[CatalogProduct]) -> None:
+        """Перестроить индекс целиком"""
+        self.__init__()
+        for product in products:
+            self.add(product)
+
+    def add(self, product: CatalogProduct) -> None:
+        """Добавить товар (или переиндексировать, если он уже есть)"""
+        if product.id in self._documents:
+            self.remove(product.id)
+        self._results.clear()
+
+        terms = Counter()
+        for term in tokenize(product.name):
+            terms[term] += NAME_WEIGHT
+        terms.update(tokenize(product.short_description))
+
+        self._documents[product.id] = terms
+        length = sum(terms.values())
+        self._lengths[product.id] = length
+        self._total_length += length
+
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for size in range(MIN_PREFIX, len(term)):
+                    self._prefixes.setdefault(term[:size], set()).add(term)
+            postings[product.id] = frequency
+
+    def remove(self, product_id: int) -> None:
+        terms = self._documents.pop(product_id, None)
+        if terms is None:
+            return
+        self._results.clear()
+
+        self._total_length -= self._lengths.pop(product_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+                for size in range(MIN_PREFIX, len(term)):
+                    prefix = term[:size]
+                    self._prefixes[prefix].discard(term)
+                    if not self._prefixes[prefix]:
+                        del self._prefixes[prefix]
+
+    def _expand(self, word: str) -> dict[str, float]:
+        """Основы индекса, подходящие под слово запроса, с весами"""
+        term = stem(word)
+        matches: dict[str, float] = {}
+        if term in self._postings:
+            matches[term] = 1.0
+
+        # «крес» → «кресл», «кровать» → «кроват»: префикс и слова, и его основы
+        for prefix in {word, term}:
+            if len(prefix) < MIN_PREFIX:
+                continue
+            for candidate in sorted(self._prefixes.get(prefix, ()))[:MAX_PREFIX_EXPANSIONS]:
+                matches.setdefault(candidate, PREFIX_PENALTY)
+        return matches
+
+    def search(self, query: str, limit: int = SEARCH_INDEX_LIMIT) -> list[int]:
+        """id товаров по убыванию релевантности; сначала те, где нашлись все слова запроса"""
+        words = tuple(dict.fromkeys(_WORD.findall(query.lower())))
+        if not words or not self._documents:
+            return []
+
+        key = (words, limit)
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        result = self._rank(words, limit)
+        self._results[key] = result
+        if len(self._results) > RESULTS_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
+
+    def _rank(self, words: tuple[str, ...], limit: int) -> list[int]:
+        expansions = [self._expand(word) for word in words]
+        found = [
+            set().union(*(self._postings[term].keys() for term in terms)) if terms else set()
+            for terms in expansions
+        ]
+
+        # Считаем BM25 только для товаров со всеми словами; если таких нет — с любым из слов
+        candidates = set.intersection(*found)
+        if not candidates:
+            candidates = set().union(*found)
+        if not candidates:
+            return []
+
+        documents = len(self._documents)
+        average_length = self._total_length / documents
+        norms = {
+            product_id: BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[product_id] / average_length)
+            for product_id in candidates
+        }
+        scores = dict.fromkeys(candidates, 0.0)
+        matched = dict.fromkeys(candidates, 0)
+
+        for terms in expansions:
+            best: dict[int, float] = {}
+            for term, weight in terms.items():
+                postings = self._postings[term]
+                idf = weight * math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id in candidates & postings.keys():
+                    frequency = postings[product_id]
+                    score = idf * frequency * (BM25_K1 + 1) / (frequency + norms[product_id])
+                    if score > best.get(product_id, 0.0):
+                        best[product_id] = score
+
+            for product_id, score in best.items():
+                scores[product_id] += score
+                matched[product_id] += 1
+
+        return heapq.nsmallest(limit, candidates, key=lambda pid: (-matched[pid], -scores[pid], pid))
+
+    def memory_usage(self) -> int:
+        """Примерный объём индекса в байтах"""
+        size = 0
+        for term, postings in self._postings.items():
+            size += sys.getsizeof(term) + sys.getsizeof(postings)
+        for prefix, terms in self._prefixes.items():
+            size += sys.getsizeof(prefix) + sys.getsizeof(terms)
+        for terms in self._documents.values():
+            size += sys.getsizeof(terms)
+        for container in (self._postings, self._prefixes, self._documents, self._lengths):
+            size += sys.getsizeof(container)
+        return size
+
+
+class CatalogSearchIndex:
+    """Индекс, синхронизированный со снимком каталога"""
+
+    def __init__(self, cache: CatalogCache = catalog_cache):
+        self._cache = cache
+        self._index = ProductSearchIndex()
+        self._snapshot: CatalogSnapshot | None = None
+        self._dirty: set[int] = set()
+        self._rebuild = True
+        cache.subscribe(self._on_catalog_change)
+
+    def _on_catalog_change(self, product_id: int | None) -> None:
+        if product_id is None:
+            self._rebuild = True
+        else:
+            self._dirty.add(product_id)
+
+    def _sync(self, catalog: CatalogSnapshot) -> None:
+        if catalog is self._snapshot:
+            return
+        # Снимок собран до последних правок админа — подождём свежего
+        stale = catalog.version != self._cache.version
+        if stale and self._snapshot is not None:
+            return
+
+        # Снимок той же версии перечитан по TTL (ручные правки в БД) — строим заново
+        if self._rebuild or self._snapshot is None or catalog.version == self._snapshot.version:
+            self._index.build(catalog.all_products())
+            logger.info("Поисковый индекс построен: %s товаров", len(self._index))
+        else:
+            for product_id in self._dirty:
+                product = catalog.product(product_id)
+                if product is None:
+                    self._index.remove(product_id)
+                else:
+                    self._index.add(product)
+
+        if not stale:
+            self._dirty.clear()
+            self._rebuild = False
+        self._snapshot = catalog
+
+    async def warm(self) -> None:
+        """Построить индекс заранее (при старте бота)"""
+        self._sync(await self._cache.get())
+
+    async def search(self, query: str, limit: int = SEARCH_INDEX_LIMIT) -> list[CatalogProduct]:
+        catalog = await self._cache.get()
+        self._sync(catalog)
+        products = (catalog.product(product_id) for product_id in self._index.search(query, limit))
+        return [product for product in products if product is not None]
+
+
+product_search_index = CatalogSearchIndex()
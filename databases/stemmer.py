@@ -0,0 +1,143 @@
+"""
+Стеммер русского языка (алгоритм Snowball, Портер) без внешних зависимостей.
+
+    stem("креслами") == stem("кресло") == "кресл"
+"""
+from functools import lru_cache
+
+
+VOWELS = set("аеиоуыэюя")
+
+PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")  # после а/я
+PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+
+REFLEXIVE = ("ся", "сь")
+
+ADJECTIVE = (
+    "ими", "ыми", "его", "ого", "ему", "ому",
+    "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+)
+PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")  # после а/я
+PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+
+VERB_1 = (  # после а/я
+    "ете", "йте", "ешь", "нно",
+    "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть",
+    "й", "л", "н",
+)
+VERB_2 = (
+    "ейте", "уйте",
+    "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует", "уют",
+    "ены", "ить", "ыть", "ишь",
+    "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую",
+    "ю",
+)
+
+NOUN = (
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях",
+    "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом",
+    "ах", "ях", "ию", "ью", "ия", "ья",
+    "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+)
+
+SUPERLATIVE = ("ейше", "ейш")
+DERIVATIONAL = ("ость", "ост")
+
+
+def _by_length(endings: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2 = _by_length(PERFECTIVE_GERUND_1), _by_length(PERFECTIVE_GERUND_2)
+ADJECTIVE, NOUN = _by_length(ADJECTIVE), _by_length(NOUN)
+PARTICIPLE_1, PARTICIPLE_2 = _by_length(PARTICIPLE_1), _by_length(PARTICIPLE_2)
+VERB_1, VERB_2 = _by_length(VERB_1), _by_length(VERB_2)
+
+
+def _regions(word: str) -> tuple[int, int]:
+    """Начала областей RV и R2"""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(0)
+    return rv, next_region(r1)
+
+
+def _strip(word: str, rv: int, endings: tuple[str, ...], after_a: bool = False) -> str | None:
+    """Отрезать самое длинное окончание внутри RV; after_a — только после «а»/«я»"""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= rv:
+            base = word[:-len(ending)]
+            if after_a:
+                if base and base[-1] in "ая" and len(base) - 1 >= rv:
+                    return base
+                continue
+            return base
+    return None
+
+
+def _strip_group(word: str, rv: int, group_1: tuple[str, ...], group_2: tuple[str, ...]) -> str | None:
+    candidates = [
+        base for base in (_strip(word, rv, group_1, after_a=True), _strip(word, rv, group_2))
+        if base is not None
+    ]
+    # при совпадении в обеих группах побеждает более длинное окончание
+    return min(candidates, key=len) if candidates else None
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    word = word.lower().replace("ё", "е")
+    if VOWELS.isdisjoint(word):  # числа, латиница, аббревиатуры
+        return word
+    rv, r2 = _regions(word)
+
+    # Шаг 1
+    base = _strip_group(word, rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if base is not None:
+        word = base
+    else:
+        word = _strip(word, rv, REFLEXIVE) or word
+
+        base = _strip(word, rv, ADJECTIVE)
+        if base is not None:
+            word = _strip_group(base, rv, PARTICIPLE_1, PARTICIPLE_2) or base
+        else:
+            base = _strip_group(word, rv, VERB_1, VERB_2)
+            if base is None:
+                base = _strip(word, rv, NOUN)
+            if base is not None:
+                word = base
+
+    # Шаг 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    for ending in DERIVATIONAL:
+        if word.endswith(ending) and len(word) - len(ending) >= r2:
+            word = word[:-len(ending)]
+            break
+
+    # Шаг 4
+    if word.endswith("нн") and len(word) - 1 >= rv:
+        return word[:-1]
+    base = _strip(word, rv, SUPERLATIVE)
+    if base is not None:
+        word = base
+        if word.endswith("нн") and len(word) - 1 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith("ь") and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
@@ -5,6 +5,10 @@ from aiogram.fsm.state import StatesGroup, State
 class QuestionStates(StatesGroup):
     waiting = State()
 
+
+class SearchStates(StatesGroup):
+    query = State()
+
 from aiogram.fsm.state import StatesGroup, State
 
 class OrderStates(StatesGroup):
@@ -41,3 +45,7 @@ class EditProductStates(StatesGroup):
     waiting_for_final_save = State()
 
 
+
+
+class ImportCatalogStates(StatesGroup):
+    waiting_for_file = State()
@@ -0,0 +1,224 @@
+"""
+Компактные callback_data для кнопок навигации.
+
+Вместо "product_detail:123:view" (aiogram CallbackData, pydantic) —
+один символ-тег класса и поля в base64url: "D" + varint'ы. Целые — varint
+(LEB128), Literal — номер значения, Optional — varint(x + 1), 0 = None.
+Хвостовые поля, равные значению по умолчанию, не пишутся.
+
+    class ProductCallback(CompactCallback, tag="P", legacy="product"):
+        product_id: int
+
+    ProductCallback(product_id=123).pack()     # "Pew"
+    ProductCallback.unpack("Pew")              # ProductCallback(product_id=123)
+    @router.callback_query(ProductCallback.filter())
+
+Фильтр разбирает data без pydantic и кладёт объект в callback_data, как
+CallbackData.filter(). legacy — префикс прежнего текстового формата:
+кнопки в уже отправленных сообщениях продолжают работать.
+"""
+import base64
+import binascii
+import dataclasses
+import types
+import typing
+from typing import Any, ClassVar, Literal
+
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
+from magic_filter import MagicFilter
+
+
+# Предел Telegram для callback_data, байт
+CALLBACK_DATA_LIMIT = 64
+
+# Теги — заглавные буквы: текстовые callback_data в проекте начинаются со строчных
+_TAGS: dict[str, type["CompactCallback"]] = {}
+
+
+def write_varint(value: int, out: bytearray) -> None:
+    if value < 0:
+        raise ValueError(f"varint не бывает отрицательным: {value}")
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]  # IndexError — данные оборваны
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+        if shift > 63:
+            raise ValueError("слишком длинный varint")
+
+
+class _Field:
+    """Как поле пишется в varint и читается обратно"""
+
+    __slots__ = ("name", "default", "choices", "optional")
+
+    def __init__(self, name: str, annotation: Any, default: Any):
+        self.name = name
+        self.default = default
+        self.optional = False
+        self.choices: tuple | None = None
+
+        origin = typing.get_origin(annotation)
+        if origin in (typing.Union, types.UnionType):
+            args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+            if len(args) != 1:
+                raise TypeError(f"{name}: поддерживается только Optional[X]")
+            self.optional = True
+            annotation = args[0]
+            origin = typing.get_origin(annotation)
+
+        if origin is Literal:
+            self.choices = typing.get_args(annotation)
+        elif annotation is not int:
+            raise TypeError(f"{name}: тип {annotation!r} не поддерживается (int, Literal, Optional)")
+
+    def encode(self, value: Any) -> int:
+        if value is None:
+            if not self.optional:
+                raise ValueError(f"{self.name} не может быть None")
+            return 0
+        number = self.choices.index(value) if self.choices is not None else int(value)
+        return number + 1 if self.optional else number
+
+    def decode(self, number: int) -> Any:
+        if self.optional:
+            if number == 0:
+                return None
+            number -= 1
+        if self.choices is not None:
+            return self.choices[number]  # IndexError — чужие данные
+        return number
+
+    def parse_text(self, text: str) -> Any:
+        """Значение из прежнего текстового формата aiogram"""
+        if text == "" and self.optional:
+            return None
+        if self.choices is not None:
+            if text not in self.choices:
+                raise ValueError(text)
+            return text
+        return int(text)
+
+
+class CompactCallback:
+    __tag__: ClassVar[str]
+    __legacy__: ClassVar[str | None]
+    __fields__: ClassVar[tuple[_Field, ...]]
+    __defaults__: ClassVar[tuple[int | None, ...]]
+
+    def __init_subclass__(cls, tag: str, legacy: str | None = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if len(tag) != 1 or not tag.isupper():
+            raise ValueError(f"тег {tag!r}: одна заглавная буква")
+        if tag in _TAGS:
+            raise ValueError(f"тег {tag!r} уже занят {_TAGS[tag].__name__}")
+        _TAGS[tag] = cls
+        cls.__tag__ = tag
+        cls.__legacy__ = legacy
+
+        dataclasses.dataclass(frozen=True)(cls)
+        hints = typing.get_type_hints(cls)
+        cls.__fields__ = tuple(
+            _Field(field.name, hints[field.name], field.default)
+            for field in dataclasses.fields(cls)
+        )
+        cls.__defaults__ = tuple(
+            field.encode(field.default) if field.default is not dataclasses.MISSING else None
+            for field in cls.__fields__
+        )
+
+    def pack(self) -> str:
+        numbers = [field.encode(getattr(self, field.name)) for field in self.__fields__]
+        while numbers and numbers[-1] == self.__defaults__[len(numbers) - 1]:
+            numbers.pop()
+
+        payload = bytearray()
+        for number in numbers:
+            write_varint(number, payload)
+        packed = self.__tag__ + base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+        if len(packed.encode()) > CALLBACK_DATA_LIMIT:
+            raise ValueError(f"callback_data длиннее {CALLBACK_DATA_LIMIT} байт: {packed!r}")
+        return packed
+
+    @classmethod
+    def unpack(cls, data: str | None):
+        """Объект из callback_data или None, если data не этого класса"""
+        if not data:
+            return None
+        try:
+            if data[0] == cls.__tag__:
+                return cls._unpack_compact(data)
+            if cls.__legacy__ and data.startswith(cls.__legacy__):
+                return cls._unpack_legacy(data)
+        except (ValueError, IndexError, binascii.Error):
+            return None
+        return None
+
+    @classmethod
+    def _unpack_compact(cls, data: str):
+        encoded = data[1:]
+        payload = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        values, position = {}, 0
+        for field in cls.__fields__:
+            if position >= len(payload):
+                if field.default is dataclasses.MISSING:
+                    return None
+                break
+            number, position = read_varint(payload, position)
+            values[field.name] = field.decode(number)
+        if position != len(payload):
+            return None
+        return cls(**values)
+
+    @classmethod
+    def _unpack_legacy(cls, data: str):
+        prefix, *parts = data.split(":")
+        if prefix != cls.__legacy__ or len(parts) > len(cls.__fields__):
+            return None
+        # поля, дописанные в класс позже, в старых кнопках отсутствуют
+        missing = cls.__fields__[len(parts):]
+        if any(field.default is dataclasses.MISSING for field in missing):
+            return None
+        return cls(**{field.name: field.parse_text(part) for field, part in zip(cls.__fields__, parts)})
+
+    @classmethod
+    def filter(cls, rule: MagicFilter | None = None) -> "CompactFilter":
+        return CompactFilter(cls, rule)
+
+
+class CompactFilter(Filter):
+    """Аналог CallbackData.filter(): кладёт разобранный объект в callback_data"""
+
+    __slots__ = ("callback_data", "rule")
+
+    def __init__(self, callback_data: type[CompactCallback], rule: MagicFilter | None = None):
+        self.callback_data = callback_data
+        self.rule = rule
+
+    async def __call__(self, query: CallbackQuery) -> bool | dict[str, Any]:
+        callback_data = self.callback_data.unpack(query.data)
+        if callback_data is None:
+            return False
+        if self.rule is not None and not self.rule.resolve(callback_data):
+            return False
+        return {"callback_data": callback_data}
+
+    def prefixes(self) -> tuple[str, ...]:
+        """С чего начинается data этого фильтра — для индекса колбэков"""
+        callback_data = self.callback_data
+        if not callback_data.__legacy__:
+            return (callback_data.__tag__,)
+        # у класса без полей прежний формат — просто префикс: "ask"
+        legacy = callback_data.__legacy__ + (":" if callback_data.__fields__ else "")
+        return callback_data.__tag__, legacy
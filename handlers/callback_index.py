@@ -0,0 +1,206 @@
+"""
+Выбор хендлера callback_query по индексу вместо перебора фильтров.
+
+aiogram проверяет хендлеры роутера по очереди, и на каждый колбэк
+вычисляются F.data == ... всех хендлеров, стоящих выше нужного. IndexedRouter
+собирает из уже зарегистрированных фильтров по data индекс:
+
+  точные строки  — F.data == "x", F.data.in_({...})    → словарь;
+  префиксы       — F.data.startswith("x"), CallbackData.filter() ("page:"),
+                   CompactCallback.filter() (тег), F.data.regexp(r"^x_(\\d+)$")
+                   → префиксное дерево.
+
+По data за O(len(data)) находятся кандидаты, и полная проверка фильтров
+(состояние FSM, остальные условия) идёт только по ним. Порядок кандидатов:
+точное совпадение, затем более длинный префикс, затем хендлеры без
+распознанного фильтра по data; при равенстве — порядок регистрации. Так
+"edit_cat_" не зависит от того, объявлен ли он выше "edit_".
+
+    admin_router = IndexedRouter()
+"""
+import re
+from typing import Any
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters.callback_data import CallbackQueryFilter
+from magic_filter import MagicFilter
+from magic_filter.operations import CallOperation, ComparatorOperation, FunctionOperation, GetAttributeOperation
+from magic_filter.util import in_op
+
+from handlers.callback_codec import CompactFilter
+
+# Символы, на которых кончается буквальное начало регулярного выражения
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+_REGEX_QUANTIFIERS = set("*+?{")
+
+
+def _regex_prefix(pattern: re.Pattern, anchored: bool) -> str | None:
+    """Буквальное начало шаблона: r"^delete_product_(\\d+)$" → "delete_product_" """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    source = pattern.pattern
+    if source.startswith("^"):
+        source, anchored = source[1:], True
+    if not anchored:
+        return None
+
+    prefix = []
+    for char in source:
+        if char in _REGEX_SPECIAL:
+            # у «x*» и «x?» последняя буква необязательна
+            if char in _REGEX_QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix) or None
+
+
+def _data_keys(magic: MagicFilter) -> tuple[str, tuple[str, ...]] | None:
+    """("exact" | "prefix", строки) для фильтра по F.data, иначе None"""
+    operations = magic._operations
+    if len(operations) < 2 or not isinstance(operations[0], GetAttributeOperation) or operations[0].name != "data":
+        return None
+    operation = operations[1]
+
+    if isinstance(operation, ComparatorOperation) and operation.comparator.__name__ == "eq" \
+            and isinstance(operation.right, str):
+        return "exact", (operation.right,)
+
+    if isinstance(operation, FunctionOperation):
+        if operation.function is in_op and operation.args and all(isinstance(v, str) for v in operation.args[0]):
+            return "exact", tuple(operation.args[0])
+        pattern = getattr(operation.function, "__self__", None)
+        if isinstance(pattern, re.Pattern):
+            prefix = _regex_prefix(pattern, anchored=operation.function.__name__ in ("match", "fullmatch"))
+            return ("prefix", (prefix,)) if prefix else None
+
+    if isinstance(operation, GetAttributeOperation) and operation.name == "startswith" and len(operations) > 2:
+        call = operations[2]
+        if isinstance(call, CallOperation) and not call.kwargs and len(call.args) == 1:
+            prefixes = call.args[0]
+            prefixes = (prefixes,) if isinstance(prefixes, str) else tuple(prefixes)
+            if all(isinstance(p, str) for p in prefixes):
+                return "prefix", prefixes
+    return None
+
+
+def callback_keys(handler: HandlerObject) -> tuple[str, tuple[str, ...]] | None:
+    """По какому ключу искать хендлер; None — проверять на каждом колбэке"""
+    for event_filter in handler.filters or ():
+        if event_filter.magic is not None:
+            keys = _data_keys(event_filter.magic)
+        elif isinstance(event_filter.callback, CompactFilter):
+            keys = "prefix", event_filter.callback.prefixes()
+        elif isinstance(event_filter.callback, CallbackQueryFilter):
+            callback_data = event_filter.callback.callback_data
+            keys = "prefix", (f"{callback_data.__prefix__}{callback_data.__separator__}",)
+        else:
+            keys = None
+        if keys is not None:
+            return keys
+    return None
+
+
+class _TrieNode:
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.handlers: list[HandlerObject] = []
+
+
+class CallbackIndex:
+    def __init__(self, handlers: list[HandlerObject]):
+        self.exact: dict[str, list[HandlerObject]] = {}
+        self.root = _TrieNode()
+        self.unindexed: list[HandlerObject] = []
+
+        for handler in handlers:
+            keys = callback_keys(handler)
+            if keys is None:
+                self.unindexed.append(handler)
+                continue
+            kind, values = keys
+            for value in dict.fromkeys(values):
+                if kind == "exact":
+                    self.exact.setdefault(value, []).append(handler)
+                else:
+                    node = self.root
+                    for char in value:
+                        node = node.children.setdefault(char, _TrieNode())
+                    node.handlers.append(handler)
+
+    def candidates(self, data: str | None) -> list[HandlerObject]:
+        """Хендлеры, чьи фильтры по data могут пройти, в порядке проверки"""
+        if data is None:
+            return self.unindexed
+
+        matched = []
+        node = self.root
+        for char in data:
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.handlers:
+                matched.append(node.handlers)
+
+        candidates = list(self.exact.get(data, ()))
+        for handlers in reversed(matched):
+            candidates.extend(handlers)
+        if len(matched) > 1:
+            # хендлер с несколькими вложенными префиксами попадает в список один раз
+            seen = set()
+            candidates = [h for h in candidates if not (id(h) in seen or seen.add(id(h)))]
+        candidates.extend(self.unindexed)
+        return candidates
+
+
+class IndexedCallbackObserver(TelegramEventObserver):
+    """callback_query роутера, который ищет хендлер по индексу data"""
+
+    def __init__(self, router: Router, event_name: str = "callback_query"):
+        super().__init__(router=router, event_name=event_name)
+        self._index: CallbackIndex | None = None
+
+    def register(self, *args: Any, **kwargs: Any):
+        self._index = None  # пересоберётся при следующем колбэке
+        return super().register(*args, **kwargs)
+
+    def compile(self) -> CallbackIndex:
+        if self._index is None:
+            self._index = CallbackIndex(self.handlers)
+        return self._index
+
+    async def trigger(self, event, **kwargs: Any) -> Any:
+        # тот же цикл, что в TelegramEventObserver.trigger, но по кандидатам
+        for handler in self.compile().candidates(getattr(event, "data", None)):
+            kwargs["handler"] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = self.outer_middleware.wrap_middlewares(
+                        self._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+class IndexedRouter(Router):
+    """Router, у которого callback_query выбирается по индексу (см. IndexedCallbackObserver)"""
+
+    def __init__(self, *, name: str | None = None):
+        super().__init__(name=name)
+        self.callback_query = IndexedCallbackObserver(router=self)
+        self.observers["callback_query"] = self.callback_query
+        self.startup.register(self._compile_callbacks)
+
+    async def _compile_callbacks(self) -> None:
+        self.callback_query.compile()
@@ -1,30 +1,53 @@
 from typing import Literal, Optional
-from aiogram.filters.callback_data import CallbackData
 
+from handlers.callback_codec import CompactCallback
 
-class CategoryCallback(CallbackData, prefix="category"):
+
+# Кнопки навигации упакованы компактно (handlers/callback_codec.py): тег и
+# varint'ы в base64url. legacy — прежний префикс aiogram CallbackData, чтобы
+# работали кнопки в уже отправленных сообщениях. Значения Literal хранятся
+# номером: новые дописывать только в конец.
+
+
+class CategoryCallback(CompactCallback, tag="C", legacy="category"):
     category_id: int
 
 
-class SubcategoryCallback(CallbackData, prefix="subcat"):
+class SubcategoryCallback(CompactCallback, tag="S", legacy="subcat"):
     subcategory_id: int
 
 
-class ProductCallback(CallbackData, prefix="product"):
+class ProductCallback(CompactCallback, tag="P", legacy="product"):
     product_id: int
 
 
-class ProductDetailCallback(CallbackData, prefix='product_detail'):
+class ProductDetailCallback(CompactCallback, tag="D", legacy="product_detail"):
     product_detail_id: int
     action: Literal["view", "add_to_cart", "ask_question"] = "view"
 
 
-class AskCallback(CallbackData, prefix="ask"):
+class AskCallback(CompactCallback, tag="A", legacy="ask"):
     pass
 
 
-class BackCallback(CallbackData, prefix="back"):
+class BackCallback(CompactCallback, tag="B", legacy="back"):
+    """
+    «Назад» на экран to: список категорий, экран категории parent_id или
+    подкатегории parent_id. item_id — откуда ушли (категория, подкатегория,
+    товар): открывается страница списка с ним, а не первая.
+    """
     to: Literal["categories", "subcategories", "products", "product_detail"]
     parent_id: Optional[int] = None
-
-
+    item_id: int = 0
+
+
+class PageCallback(CompactCallback, tag="L", legacy="page"):
+    """
+    ◀️ / ▶️ в списках: страница до before или после after (id, см. databases/pagination.py).
+    screen — чей список: каталог, экран категории (parent_id), экран подкатегории
+    (parent_id) или список товаров в админке.
+    """
+    screen: Literal["catalog", "category", "subcategory", "admin_edit", "admin_delete"]
+    parent_id: int = 0
+    after: int = 0
+    before: int = 0
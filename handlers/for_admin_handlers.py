@@ -1,6 +1,10 @@
-from aiogram import Bot, Router, F
+import html
+import io
+import time
+
+from aiogram import Bot, F
 from aiogram.types import Message, CallbackQuery, ContentType
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.enums.parse_mode import ParseMode
 from sqlalchemy import delete, func, select
@@ -9,17 +13,24 @@ from aiogram.exceptions import TelegramBadRequest
 
 
 
-from databases.crud import get_categories, get_subcategories, return_to_admin_panel, safe_edit_message, safe_send_media, show_product_list_by_name
-from databases.engine import AsyncSessionLocal
+from databases import bulk_import
+from databases.crud import get_categories, get_products_page, get_subcategories, return_to_admin_panel, safe_edit_message, safe_send_media, show_product_list_by_name
+from databases.engine import AsyncSessionLocal, engine
+from databases.catalog_cache import catalog_cache
+from databases.search import escape_like, search_products
 from databases.models import Category, Product, ProductImage, Subcategory
-from fsm import AddProductStates, EditProductStates
+from handlers.callback_index import IndexedRouter
+from handlers.callbacks import PageCallback
+from handlers.product_draft import ProductDraft
+from middlewares.metrics import metrics
+from fsm import AddProductStates, EditProductStates, ImportCatalogStates
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 
-from keyboards.admin_keyboards import back_to_edit_keyboard, get_admin_keyboard, get_cancel_edit_keyboard, get_cancel_keyboard, get_edit_product_keyboard, get_image_management_keyboard, photos_start_keyboard
+from keyboards.admin_keyboards import back_to_edit_keyboard, get_admin_keyboard, get_cancel_edit_keyboard, get_cancel_keyboard, get_edit_product_keyboard, get_image_management_keyboard, photos_added_keyboard, photos_start_keyboard, products_page_keyboard
 
 
-admin_router = Router()
+admin_router = IndexedRouter()
 
 
 # ========== СТАРТ КОМАННДЫ И ХЕНДЛЕРЫ ==========
@@ -53,6 +64,12 @@ async def admin_panel(message: Message):
     )
 
 
+@admin_router.message(Command("metrics"))
+async def metrics_handler(message: Message):
+    """Сводка метрик: медленные хендлеры, БД, Bot API, кэши"""
+    await message.answer(metrics.summary(), parse_mode="HTML")
+
+
 @admin_router.callback_query(F.data == "back_to_admin_menu")
 async def back_to_admin_menu_handler(callback: CallbackQuery):
     await callback.message.edit_text(
@@ -280,7 +297,7 @@ async def process_additional_info(message: Message, state: FSMContext):
     await message.answer(
         "📸 Теперь отправьте <b>фотографии товара</b> (можно несколько):\n\n"
         "📌 <b>Инструкция:</b>\n"
-        "1. Отправляйте фото по одному\n"
+        "1. Отправляйте фото по одному или альбомом\n"
         "2. Первое фото будет главным\n"
         "3. Когда все фото загружены, нажмите кнопку <b>'Готово'</b>\n\n"
         "Или кнопку /cancel_operation для отмены.",
@@ -358,11 +375,14 @@ async def save_product(callback: CallbackQuery, state: FSMContext, bot: Bot):
                 session.add(
                     ProductImage(
                         url=photo_info.get("file_id", ""),
+                        file_id=photo_info.get("file_id"),
+                        file_unique_id=photo_info.get("file_unique_id"),
                         product_id=product.id
                     )
                 )
 
             await session.commit()
+            catalog_cache.invalidate(product.id)
 
             success_message = (
                 f"✅ <b>Товар успешно сохранен!</b>\n\n"
@@ -408,6 +428,27 @@ async def save_product(callback: CallbackQuery, state: FSMContext, bot: Bot):
 
 
 
+@admin_router.message(AddProductStates.waiting_for_photos, F.photo, flags={"album": True})
+async def process_product_photos(message: Message, state: FSMContext, album: list[Message] | None = None):
+    """Фото товара; альбом приходит одним вызовом (middlewares/media_group.py)"""
+    album = album or [message]
+    data = await state.get_data()
+    photos = data.get("photos", [])
+    for part in album:
+        if part.photo:
+            photos.append({
+                "file_id": part.photo[-1].file_id,
+                "file_unique_id": part.photo[-1].file_unique_id,
+            })
+    await state.update_data(photos=photos)
+
+    await message.answer(
+        f"✅ Добавлено фото: {len(album)}, всего {len(photos)}.\n"
+        "Отправьте ещё или нажмите «Готово».",
+        reply_markup=photos_added_keyboard()
+    )
+
+
 @admin_router.message(
     AddProductStates.waiting_for_photos,
     F.content_type != ContentType.PHOTO
@@ -491,11 +532,14 @@ async def save_product(callback: CallbackQuery, state: FSMContext, bot: Bot):
                 file_id = photo_info.get("file_id", "")
                 product_image = ProductImage(
                     url=file_id,
+                    file_id=file_id or None,
+                    file_unique_id=photo_info.get("file_unique_id"),
                     product_id=product.id
                 )
                 session.add(product_image)
 
             await session.commit()
+            catalog_cache.invalidate(product.id)
 
             category_name = "Не указано"
             if product.category_id:
@@ -586,20 +630,17 @@ async def process_product_search_by_name(message: Message, state: FSMContext):
         return
     
     async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Product)
-            .options(
+        products = await search_products(
+            session,
+            search_name,
+            limit=15,
+            options=(
                 selectinload(Product.images),
                 selectinload(Product.category),
                 selectinload(Product.subcategory)
             )
-            .where(Product.name.ilike(f"%{search_name}%"))
-            .order_by(Product.name)
-            .limit(15)  
         )
         
-        products = result.scalars().all()
-        
         if not products:
             all_result = await session.execute(
                 select(Product)
@@ -632,8 +673,7 @@ async def process_product_search_by_name(message: Message, state: FSMContext):
             return
         
         if len(products) == 1:
-            product = products[0]
-            await show_product_for_edit(message, state, product)
+            await open_product_for_edit(message, state, products[0].id)
         else:
             await show_product_list_by_name(message, state, products, search_name)  
             
@@ -662,77 +702,75 @@ async def show_product_list(message: Message, state: FSMContext, products):
     )
     await state.set_state(EditProductStates.waiting_for_product_choice)
 
-async def show_product_for_edit(message: Message, state: FSMContext, product):
-    """Показ товара для редактирования (упрощенная версия)"""
+async def open_product_for_edit(message: Message, state: FSMContext, product_id: int) -> bool:
+    """Загрузить товар в черновик и показать экран редактирования"""
     async with AsyncSessionLocal() as session:
-        product = await session.get(
-            Product, 
-            product.id,
-            options=[
-                selectinload(Product.images),
-                selectinload(Product.category),
-                selectinload(Product.subcategory)
-            ]
-        )
-        
-        await state.update_data(product_id=product.id)
-        
-        category_name = product.category.name if product.category else "❌ Не указана"
-        subcategory_name = product.subcategory.name if product.subcategory else "❌ Не указана"
-        
-        short_desc = product.short_description
-        if short_desc and len(short_desc) > 80:
-            short_desc = short_desc[:77] + "..."
-        
-        add_info = product.additional_info
-        if add_info and len(add_info) > 50:
-            add_info = add_info[:47] + "..."
-        
-        product_info = (
-            f"🛒 <b>Товар для редактирования</b>\n\n"
-            f"📝 <b>Название:</b>\n{product.name}\n\n"
-            f"📋 <b>Краткое описание:</b>\n{short_desc or '❌ Не указано'}\n\n"
-            f"ℹ️ <b>Доп. информация:</b>\n{add_info or '❌ Не указана'}\n\n"
-            f"📁 <b>Категория:</b> {category_name}\n"
-            f"📂 <b>Подкатегория:</b> {subcategory_name}\n"
-            f"📷 <b>Изображений:</b> {len(product.images)}"
-        )
-        
-        builder = InlineKeyboardBuilder()
-        
-        builder.button(text="✏️ Название", callback_data="edit_name")
-        builder.button(text="📝 Описание", callback_data="edit_short_desc")
-        builder.button(text="ℹ️ Доп. инфо", callback_data="edit_add_info")
-        builder.button(text="📁 Категория", callback_data="edit_category")
-        builder.button(text="🖼️ Изображения", callback_data="edit_images")
-        builder.button(text="✅ Сохранить", callback_data="finish_edit")
-        builder.button(text="❌ Отменить", callback_data="cancel_edit")
-        
-        builder.adjust(2, 2, 2, 1, 1)
-        
-        if product.images:
-            first_image = product.images[0]
-            try:
-                await message.answer_photo(
-                    photo=first_image.url,
-                    caption=product_info,
-                    reply_markup=builder.as_markup(),
-                    parse_mode=ParseMode.HTML
-                )
-            except:
-                await message.answer(
-                    product_info + f"\n\n⚠️ <i>Не удалось загрузить изображение</i>",
-                    reply_markup=builder.as_markup(),
-                    parse_mode=ParseMode.HTML
-                )
-        else:
+        draft = await ProductDraft.load(session, product_id)
+    if draft is None:
+        return False
+
+    await state.update_data(product_id=product_id)
+    await draft.save(state)
+    await show_product_for_edit(message, state, draft)
+    return True
+
+async def show_product_for_edit(message: Message, state: FSMContext, draft: ProductDraft):
+    """Экран редактирования товара из черновика (без запросов к БД)"""
+    short_desc = draft.short_description
+    if short_desc and len(short_desc) > 80:
+        short_desc = short_desc[:77] + "..."
+
+    add_info = draft.additional_info
+    if add_info and len(add_info) > 50:
+        add_info = add_info[:47] + "..."
+
+    product_info = (
+        f"🛒 <b>Товар для редактирования</b>\n\n"
+        f"📝 <b>Название:</b>\n{draft.name}\n\n"
+        f"📋 <b>Краткое описание:</b>\n{short_desc or '❌ Не указано'}\n\n"
+        f"ℹ️ <b>Доп. информация:</b>\n{add_info or '❌ Не указана'}\n\n"
+        f"📁 <b>Категория:</b> {draft.category_name or '❌ Не указана'}\n"
+        f"📂 <b>Подкатегория:</b> {draft.subcategory_name or '❌ Не указана'}\n"
+        f"📷 <b>Изображений:</b> {len(draft.images)}"
+    )
+    if draft.has_changes:
+        product_info += "\n\n✏️ <i>Есть несохранённые изменения</i>"
+
+    builder = InlineKeyboardBuilder()
+
+    builder.button(text="✏️ Название", callback_data="edit_name")
+    builder.button(text="📝 Описание", callback_data="edit_short_desc")
+    builder.button(text="ℹ️ Доп. инфо", callback_data="edit_add_info")
+    builder.button(text="📁 Категория", callback_data="edit_category")
+    builder.button(text="🖼️ Изображения", callback_data="edit_images")
+    builder.button(text="✅ Сохранить", callback_data="finish_edit")
+    builder.button(text="❌ Отменить", callback_data="cancel_edit")
+
+    builder.adjust(2, 2, 2, 1, 1)
+
+    if draft.images:
+        first_image = draft.images[0]
+        try:
+            await message.answer_photo(
+                photo=first_image["file_id"] or first_image["url"],
+                caption=product_info,
+                reply_markup=builder.as_markup(),
+                parse_mode=ParseMode.HTML
+            )
+        except:
             await message.answer(
-                product_info + f"\n\n⚠️ <i>Нет изображений</i>",
+                product_info + f"\n\n⚠️ <i>Не удалось загрузить изображение</i>",
                 reply_markup=builder.as_markup(),
                 parse_mode=ParseMode.HTML
             )
-        
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    else:
+        await message.answer(
+            product_info + f"\n\n⚠️ <i>Нет изображений</i>",
+            reply_markup=builder.as_markup(),
+            parse_mode=ParseMode.HTML
+        )
+
+    await state.set_state(EditProductStates.waiting_for_edit_choice)
 
 @admin_router.callback_query(F.data.startswith("select_product_"), EditProductStates.waiting_for_product_choice)
 async def select_product_handler(callback: CallbackQuery, state: FSMContext):
@@ -745,21 +783,11 @@ async def select_product_handler(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Ошибка: неверный ID товара")
         return
     
-    async with AsyncSessionLocal() as session:
-        product = await session.get(
-            Product, 
-            product_id,
-            options=[selectinload(Product.images)]
+    if not await open_product_for_edit(callback.message, state, product_id):
+        await callback.message.edit_text(
+            "❌ Товар не найден. Попробуйте снова:",
+            reply_markup=get_cancel_edit_keyboard()
         )
-        
-        if not product:
-            await callback.message.edit_text(
-                "❌ Товар не найден. Попробуйте снова:",
-                reply_markup=get_cancel_edit_keyboard()
-            )
-            return
-        
-        await show_product_for_edit(callback.message, state, product)
     
     await callback.answer()
 
@@ -771,104 +799,94 @@ async def edit_field_choice(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора поля для редактирования"""
 
     action = callback.data
-    data = await state.get_data()
-    product_id = data.get('product_id')
+    draft = await ProductDraft.from_state(state)
 
-    if not product_id:
+    if draft is None:
         await callback.answer("❌ Ошибка: товар не найден в сессии", show_alert=True)
         return
 
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
+    # --------------------- Редактирование названия ---------------------
+    if action == "edit_name":
+        await state.set_state(EditProductStates.waiting_for_name_edit)
+        await safe_edit_message(
+            callback.message,
+            f"✏️ <b>Редактирование названия</b>\n\n"
+            f"Текущее название:\n<b>{draft.name}</b>\n\n"
+            "Введите новое название:",
+            get_cancel_edit_keyboard()
+        )
 
-        if not product:
-            text = "❌ Товар не найден в базе данных"
-            # Если можно редактировать текст — edit_text, иначе создаём новое сообщение
-            if callback.message.text is not None or callback.message.caption is not None:
-                await callback.message.edit_text(text, reply_markup=get_cancel_edit_keyboard())
-            else:
-                await callback.message.answer(text, reply_markup=get_cancel_edit_keyboard())
-            return
+    # --------------------- Редактирование короткого описания ---------------------
+    elif action == "edit_short_desc":
+        await state.set_state(EditProductStates.waiting_for_short_desc_edit)
+        await safe_edit_message(
+            callback.message,
+            f"📝 <b>Редактирование описания</b>\n\n"
+            f"{draft.short_description or '❌ Не указано'}\n\n"
+            "Введите новое описание:"
+        )
 
-        # --------------------- Редактирование названия ---------------------
-        if action == "edit_name":
-            await state.set_state(EditProductStates.waiting_for_name_edit)
-            await safe_edit_message(
-                callback.message,
-                f"✏️ <b>Редактирование названия</b>\n\n"
-                f"Текущее название:\n<b>{product.name}</b>\n\n"
-                "Введите новое название:",
-                get_cancel_edit_keyboard()
-            )
+    # --------------------- Редактирование дополнительной информации ---------------------
+    elif action == "edit_add_info":
+        await state.set_state(EditProductStates.waiting_for_additional_info_edit)
+        await safe_edit_message(
+            callback.message,
+            f"ℹ️ <b>Редактирование доп. информации</b>\n\n"
+            f"{draft.additional_info or '❌ Не указана'}\n\n"
+            "Введите новую информацию:",
+            get_cancel_edit_keyboard()
+        )
 
-        # --------------------- Редактирование короткого описания ---------------------
-        elif action == "edit_short_desc":
-            await state.set_state(EditProductStates.waiting_for_short_desc_edit)
-            await safe_edit_message(
-                callback.message,
-                f"📝 <b>Редактирование описания</b>\n\n"
-                f"{product.short_description or '❌ Не указано'}\n\n"
-                "Введите новое описание:"
-            )
+    # --------------------- Редактирование категории ---------------------
+    elif action == "edit_category":
+        catalog = await catalog_cache.get()
 
-        # --------------------- Редактирование дополнительной информации ---------------------
-        elif action == "edit_add_info":
-            await state.set_state(EditProductStates.waiting_for_additional_info_edit)
-            await safe_edit_message(
-                callback.message,
-                f"ℹ️ <b>Редактирование доп. информации</b>\n\n"
-                f"{product.additional_info or '❌ Не указана'}\n\n"
-                "Введите новую информацию:",
-                get_cancel_edit_keyboard()
+        builder = InlineKeyboardBuilder()
+        for category in catalog.categories:
+            builder.button(
+                text=category.name,
+                callback_data=f"edit_cat_{category.id}"
             )
+        builder.button(text="↩️ Назад", callback_data="back_to_edit")
+        builder.adjust(2)
 
-        # --------------------- Редактирование категории ---------------------
-        elif action == "edit_category":
-            categories = await get_categories(session)
-
-            builder = InlineKeyboardBuilder()
-            for category in categories:
-                builder.button(
-                    text=category.name,
-                    callback_data=f"edit_cat_{category.id}"
-                )
-            builder.button(text="↩️ Назад", callback_data="back_to_edit")
-            builder.adjust(2)
-
-            await callback.message.answer(
-                "📁 <b>Выбор категории</b>\n\nВыберите новую категорию:",
-                reply_markup=builder.as_markup(),
-                parse_mode=ParseMode.HTML
-            )
+        await callback.message.answer(
+            "📁 <b>Выбор категории</b>\n\nВыберите новую категорию:",
+            reply_markup=builder.as_markup(),
+            parse_mode=ParseMode.HTML
+        )
 
-            await state.set_state(EditProductStates.waiting_for_category_edit)
-            await callback.answer()
-            return
+        await state.set_state(EditProductStates.waiting_for_category_edit)
 
 
-        # --------------------- Управление изображениями ---------------------
-        elif action == "edit_images":
-            keyboard = get_image_management_keyboard()
-            text = "🖼️ <b>Управление изображениями</b>\n\nВыберите действие:"
+    # --------------------- Управление изображениями ---------------------
+    elif action == "edit_images":
+        keyboard = get_image_management_keyboard()
+        text = "🖼️ <b>Управление изображениями</b>\n\nВыберите действие:"
 
-            await safe_edit_message(callback.message, text, keyboard)
+        await safe_edit_message(callback.message, text, keyboard)
 
+        await state.set_state(EditProductStates.waiting_for_image_choice)
 
-            await state.set_state(EditProductStates.waiting_for_image_choice)
-            await callback.answer()
-            return
+    await callback.answer()
 
 
-        # --------------------- Просмотр товара ---------------------
-        elif action == "view_product":
-            await show_product_for_edit(callback.message, state, product)
-            await callback.answer()
-            return
+# ========== РЕДАКТИРОВАНИЕ ТЕКСТОВЫХ ПОЛЕЙ ==========
+# Правки копятся в черновике (handlers/product_draft.py), в БД — по «Сохранить»
 
-    await callback.answer()
+async def update_draft(message: Message, state: FSMContext, notice: str, **values) -> None:
+    """Записать значения в черновик и перерисовать экран товара"""
+    draft = await ProductDraft.from_state(state)
+    if draft is None:
+        await message.answer("❌ Ошибка: товар не найден в сессии", reply_markup=get_cancel_edit_keyboard())
+        return
 
+    for name, value in values.items():
+        setattr(draft, name, value)
+    await draft.save(state)
 
-# ========== РЕДАКТИРОВАНИЕ ТЕКСТОВЫХ ПОЛЕЙ ==========
+    await message.answer(notice, parse_mode=ParseMode.HTML)
+    await show_product_for_edit(message, state, draft)
 
 @admin_router.message(EditProductStates.waiting_for_name_edit)
 async def process_name_edit(message: Message, state: FSMContext):
@@ -882,22 +900,7 @@ async def process_name_edit(message: Message, state: FSMContext):
         )
         return
     
-    data = await state.get_data()
-    product_id = data.get('product_id')
-    
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            product.name = new_name
-            await session.commit()
-            
-            await message.answer(
-                f"✅ Название обновлено: <b>{new_name}</b>",
-                parse_mode=ParseMode.HTML
-            )
-            
-        await show_product_for_edit(message, state, product)
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    await update_draft(message, state, f"✅ Название изменено: <b>{new_name}</b>", name=new_name)
 
 @admin_router.message(EditProductStates.waiting_for_short_desc_edit)
 async def process_short_desc_edit(message: Message, state: FSMContext):
@@ -911,22 +914,7 @@ async def process_short_desc_edit(message: Message, state: FSMContext):
         )
         return
     
-    data = await state.get_data()
-    product_id = data.get('product_id')
-    
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            product.short_description = new_desc
-            await session.commit()
-            
-            await message.answer(
-                f"✅ Описание обновлено!",
-                parse_mode=ParseMode.HTML
-            )
-            
-        await show_product_for_edit(message, state, product)
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    await update_draft(message, state, "✅ Описание изменено!", short_description=new_desc)
 
 @admin_router.message(EditProductStates.waiting_for_additional_info_edit)
 async def process_additional_info_edit(message: Message, state: FSMContext):
@@ -942,22 +930,7 @@ async def process_additional_info_edit(message: Message, state: FSMContext):
         )
         return
     
-    data = await state.get_data()
-    product_id = data.get('product_id')
-    
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            product.additional_info = new_info
-            await session.commit()
-            
-            await message.answer(
-                f"✅ Дополнительная информация обновлена!",
-                parse_mode=ParseMode.HTML
-            )
-            
-        await show_product_for_edit(message, state, product)
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    await update_draft(message, state, "✅ Дополнительная информация изменена!", additional_info=new_info)
 
 
 # ========== РЕДАКТИРОВАНИЕ КАТЕГОРИЙ ==========
@@ -972,38 +945,38 @@ async def process_category_edit(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Ошибка: неверный ID категории")
         return
     
-    data = await state.get_data()
-    product_id = data.get('product_id')
+    catalog = await catalog_cache.get()
+    category = catalog.category(category_id)
+    if category is None:
+        await callback.answer("❌ Категория не найдена", show_alert=True)
+        return
+
+    subcategories = catalog.subcategories(category_id)
     
-    async with AsyncSessionLocal() as session:
-        subcategories = await get_subcategories(session, category_id)
-        
-        builder = InlineKeyboardBuilder()
-        
-        if subcategories:
-            for subcategory in subcategories:
-                builder.button(
-                    text=subcategory.name,
-                    callback_data=f"edit_sub_{subcategory.id}"
-                )
-            builder.button(text="⏭️ Без подкатегории", callback_data="edit_skip_sub")
-        else:
-            builder.button(text="⏭️ Нет подкатегорий", callback_data="edit_skip_sub")
-        
-        builder.button(text="↩️ Назад", callback_data="back_to_edit")
-        builder.adjust(2)
-        
-        category = await session.get(Category, category_id)
-        
-        await callback.message.edit_text(
-            f"📁 <b>Категория:</b> {category.name}\n\n"
-            "Выберите подкатегорию:",
-            reply_markup=builder.as_markup(),
-            parse_mode=ParseMode.HTML
-        )
-        
-        await state.update_data(temp_category_id=category_id)
-        await state.set_state(EditProductStates.waiting_for_subcategory_edit)
+    builder = InlineKeyboardBuilder()
+    
+    if subcategories:
+        for subcategory in subcategories:
+            builder.button(
+                text=subcategory.name,
+                callback_data=f"edit_sub_{subcategory.id}"
+            )
+        builder.button(text="⏭️ Без подкатегории", callback_data="edit_skip_sub")
+    else:
+        builder.button(text="⏭️ Нет подкатегорий", callback_data="edit_skip_sub")
+    
+    builder.button(text="↩️ Назад", callback_data="back_to_edit")
+    builder.adjust(2)
+    
+    await callback.message.edit_text(
+        f"📁 <b>Категория:</b> {category.name}\n\n"
+        "Выберите подкатегорию:",
+        reply_markup=builder.as_markup(),
+        parse_mode=ParseMode.HTML
+    )
+    
+    await state.update_data(temp_category_id=category_id)
+    await state.set_state(EditProductStates.waiting_for_subcategory_edit)
     
     await callback.answer()
 
@@ -1019,28 +992,26 @@ async def process_subcategory_edit(callback: CallbackQuery, state: FSMContext):
         return
     
     data = await state.get_data()
-    product_id = data.get('product_id')
     category_id = data.get('temp_category_id')
     
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            product.category_id = category_id
-            product.subcategory_id = subcategory_id
-            await session.commit()
-            
-            subcategory = await session.get(Subcategory, subcategory_id)
-            category = await session.get(Category, category_id)
-            
-            await callback.message.edit_text(
-                f"✅ Категория обновлена:\n"
-                f"<b>Категория:</b> {category.name}\n"
-                f"<b>Подкатегория:</b> {subcategory.name}",
-                parse_mode=ParseMode.HTML
-            )
-            
-        await show_product_for_edit(callback.message, state, product)
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    catalog = await catalog_cache.get()
+    category = catalog.category(category_id)
+    subcategory = catalog.subcategory(subcategory_id)
+    if category is None or subcategory is None:
+        await callback.answer("❌ Категория не найдена", show_alert=True)
+        return
+
+    await update_draft(
+        callback.message,
+        state,
+        f"✅ Категория изменена:\n"
+        f"<b>Категория:</b> {category.name}\n"
+        f"<b>Подкатегория:</b> {subcategory.name}",
+        category_id=category_id,
+        subcategory_id=subcategory_id,
+        category_name=category.name,
+        subcategory_name=subcategory.name,
+    )
     
     await callback.answer()
 
@@ -1048,27 +1019,25 @@ async def process_subcategory_edit(callback: CallbackQuery, state: FSMContext):
 async def skip_subcategory_edit(callback: CallbackQuery, state: FSMContext):
     """Пропуск подкатегории"""
     data = await state.get_data()
-    product_id = data.get('product_id')
     category_id = data.get('temp_category_id')
     
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            product.category_id = category_id
-            product.subcategory_id = None  
-            await session.commit()
-            
-            category = await session.get(Category, category_id)
-            
-            await callback.message.edit_text(
-                f"✅ Категория обновлена:\n"
-                f"<b>Категория:</b> {category.name}\n"
-                f"<b>Подкатегория:</b> Не указана",
-                parse_mode=ParseMode.HTML
-            )
-            
-        await show_product_for_edit(callback.message, state, product)
-        await state.set_state(EditProductStates.waiting_for_edit_choice)
+    catalog = await catalog_cache.get()
+    category = catalog.category(category_id)
+    if category is None:
+        await callback.answer("❌ Категория не найдена", show_alert=True)
+        return
+
+    await update_draft(
+        callback.message,
+        state,
+        f"✅ Категория изменена:\n"
+        f"<b>Категория:</b> {category.name}\n"
+        f"<b>Подкатегория:</b> Не указана",
+        category_id=category_id,
+        subcategory_id=None,
+        category_name=category.name,
+        subcategory_name=None,
+    )
     
     await callback.answer()
 
@@ -1108,71 +1077,201 @@ async def admin_stats_handler(callback: CallbackQuery):
     await callback.answer()
 
 
+# ========== ЗАГРУЗКА КАТАЛОГА ==========
+
+# Не чаще, сек: правка сообщения о ходе загрузки тоже запрос к Bot API
+IMPORT_PROGRESS_INTERVAL = 2.0
+
+
+@admin_router.callback_query(F.data == "admin_bulk_import")
+async def bulk_import_handler(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(ImportCatalogStates.waiting_for_file)
+    await callback.message.edit_text(
+        "📥 <b>Загрузка каталога</b>\n\n"
+        "Отправьте файл <b>.csv</b> или <b>.jsonl</b> (до 20 МБ).\n"
+        "Колонки: <code>sku, name, category</code> — обязательные, "
+        "<code>short_description, additional_info, subcategory, images</code> — по желанию. "
+        "Ссылки на фото в CSV — через «|».\n\n"
+        "Товар с тем же артикулом (sku) обновится, новые категории создадутся.",
+        reply_markup=get_cancel_keyboard(),
+        parse_mode=ParseMode.HTML
+    )
+    await callback.answer()
+
+
+@admin_router.message(ImportCatalogStates.waiting_for_file, F.document)
+async def bulk_import_file(message: Message, state: FSMContext, bot: Bot):
+    try:
+        file_format = bulk_import.detect_format(message.document.file_name or "")
+    except ValueError as e:
+        await message.answer(f"❌ {e}", reply_markup=get_cancel_keyboard())
+        return
+
+    status = await message.answer("⏳ Загружаю файл...")
+    last_edit = time.monotonic()
+
+    async def show_progress(progress: bulk_import.ImportProgress) -> None:
+        nonlocal last_edit
+        if time.monotonic() - last_edit < IMPORT_PROGRESS_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        try:
+            await status.edit_text(
+                f"⏳ {progress.stage}: {progress.rows} строк, {progress.rows_per_second:.0f} строк/с"
+            )
+        except TelegramBadRequest:
+            pass
+
+    try:
+        content = await bot.download(message.document, destination=io.BytesIO())
+        stream = io.TextIOWrapper(content, encoding="utf-8-sig", newline="")
+        progress = await bulk_import.import_catalog(engine, stream, file_format, show_progress)
+    except Exception as e:
+        await status.edit_text(f"❌ Каталог не загружен, изменений нет: {html.escape(str(e))}")
+        return
+
+    catalog_cache.invalidate()
+    await state.clear()
+    await status.edit_text(f"✅ <b>Каталог загружен</b>\n\n{html.escape(bulk_import.summary(progress))}", parse_mode=ParseMode.HTML)
+    await message.answer(
+        "👑 <b>Панель администратора</b>\n\nВыберите команду:",
+        reply_markup=get_admin_keyboard(),
+        parse_mode=ParseMode.HTML
+    )
+
+
+@admin_router.message(ImportCatalogStates.waiting_for_file)
+async def bulk_import_not_file(message: Message):
+    await message.answer("❌ Пришлите каталог файлом (.csv или .jsonl).", reply_markup=get_cancel_keyboard())
+
+
 # ========== УДАЛЕНИЕ ТОВАРА ==========
 
 @admin_router.callback_query(F.data == "admin_delete_product")
 async def show_product_list_for_delete(callback: CallbackQuery, state: FSMContext):
-    """Показ списка товаров для удаления"""
+    """Показ первой страницы товаров для удаления"""
+    await send_products_page(callback.message, "admin_delete")
+    await callback.answer()
+
+
+def products_page_text(page, screen: str) -> str:
+    products_text = "\n".join(f"{p.id}: {html.escape(p.name)}" for p in page)
+    action = (
+        "Выберите товар кнопкой или напишите его название для удаления:" if screen == "admin_delete"
+        else "Выберите товар для редактирования:"
+    )
+    return f"📋 <b>Товары</b>\n\n{products_text}\n\n{action}"
+
+
+async def send_products_page(message: Message, screen: str, after: int = 0, before: int = 0, edit: bool = False):
+    """Страница списка товаров в админке: новым сообщением или правкой текущего"""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Product))
-        products = result.scalars().all()
+        page = await get_products_page(session, after, before)
 
-    if not products:
-        await callback.message.answer("❌ Товаров для удаления нет")
-        return
+    if not page:
+        text = "❌ Товаров нет"
+        markup = None
+    else:
+        text = products_page_text(page, screen)
+        markup = products_page_keyboard(page, screen)
 
-    builder = InlineKeyboardBuilder()
+    if edit:
+        await safe_edit_message(message, text, reply_markup=markup, parse_mode=ParseMode.HTML)
+    else:
+        await message.answer(text, reply_markup=markup, parse_mode=ParseMode.HTML)
 
-    for product in products:
-        builder.button(
-            text=f"id({product.id}): {product.name[:30]}",
-            callback_data=f"delete_product_{product.id}"
-        )
 
-    builder.button(text="❌ Отменить", callback_data="cancel_operation")
-    builder.adjust(1)
+@admin_router.callback_query(PageCallback.filter(F.screen.in_({"admin_edit", "admin_delete"})))
+async def products_page_handler(callback: CallbackQuery, callback_data: PageCallback):
+    await send_products_page(
+        callback.message, callback_data.screen, callback_data.after, callback_data.before, edit=True
+    )
+    await callback.answer()
 
-    products_text = "\n".join([f"{p.id}: {p.name}" for p in products])
 
-    await callback.message.answer(
-        f"🔍 <b>Найдено товаров:</b> {len(products)}\n\n"
-        f"{products_text}\n\n"
-        "Выберите и напишите товар для удаления:",
+@admin_router.callback_query(F.data == "show_all_products")
+async def show_all_products_handler(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(EditProductStates.waiting_for_product_choice)
+    await send_products_page(callback.message, "admin_edit")
+    await callback.answer()
+
+
+async def ask_delete_confirmation(message: Message, state: FSMContext, product_id: int, product_name: str):
+    await state.update_data(product_id=product_id)
+    await state.set_state("waiting_for_delete_confirmation")  
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Да, удалить", callback_data="delete_product_confirmed")
+    builder.button(text="❌ Отмена", callback_data="cancel_operation")
+    builder.adjust(1)
+
+    await message.answer(
+        f"⚠️ Вы уверены, что хотите удалить товар <b>{html.escape(product_name)}</b>?\n"
+        "Это действие нельзя отменить.",
+        reply_markup=builder.as_markup(),
         parse_mode=ParseMode.HTML
     )
 
-@admin_router.message(F.text)
+
+@admin_router.callback_query(F.data.regexp(r"^delete_product_(\d+)$").as_("match"))
+async def delete_product_selected(callback: CallbackQuery, state: FSMContext, match):
+    async with AsyncSessionLocal() as session:
+        product = await session.get(Product, int(match.group(1)))
+
+    if product is None:
+        await callback.answer("❌ Товар не найден", show_alert=True)
+        return
+
+    await ask_delete_confirmation(callback.message, state, product.id, product.name)
+    await callback.answer()
+
+
+# Сколько похожих товаров предложить кнопками, если точного названия нет
+DELETE_CANDIDATES_LIMIT = 5
+
+
+# только вне сценариев: иначе перехватывает текст шагов, зарегистрированных ниже (URL фото)
+@admin_router.message(StateFilter(None), F.text)
 async def delete_product_by_name(message: Message, state: FSMContext):
     text = message.text.strip()
 
     async with AsyncSessionLocal() as session:
+        # точное название без учёта регистра; лучший нечёткий результат сам не удаляем
         result = await session.execute(
-            select(Product).where(Product.name.ilike(f"%{text}%"))
+            select(Product)
+            .where(Product.name.ilike(escape_like(text), escape="\\"))
+            .order_by(Product.id)
+            .limit(DELETE_CANDIDATES_LIMIT)
         )
-        products = result.scalars().all()
+        products = list(result.scalars().all())
+        exact = len(products) == 1
+        if not products:
+            products = await search_products(session, text, limit=DELETE_CANDIDATES_LIMIT)
+
+    if exact:
+        await ask_delete_confirmation(message, state, products[0].id, products[0].name)
+        return
 
     if not products:
         await message.answer("❌ Товар не найден. Попробуйте ещё раз или /cancel.")
         return
 
-    product = products[0]  
-    await state.update_data(product_id=product.id)
-    await state.set_state("waiting_for_delete_confirmation")  
-
     builder = InlineKeyboardBuilder()
-    builder.button(text="✅ Да, удалить", callback_data="delete_product_confirmed")
+    for product in products:
+        button_text = f"🗑️ {product.name}"
+        if len(button_text) > 35:
+            button_text = button_text[:32] + "..."
+        builder.button(text=button_text, callback_data=f"delete_product_{product.id}")
     builder.button(text="❌ Отмена", callback_data="cancel_operation")
     builder.adjust(1)
 
-    print("FSM state перед кнопкой:", await state.get_state())  
-
     await message.answer(
-        f"⚠️ Вы уверены, что хотите удалить товар <b>{product.name}</b>?\n"
-        "Это действие нельзя отменить.",
+        f"🔍 Товара с названием <b>{html.escape(text)}</b> нет. Выберите товар для удаления:",
         reply_markup=builder.as_markup(),
         parse_mode=ParseMode.HTML
     )
 
+
 @admin_router.callback_query(F.data == "delete_product_confirmed")
 async def delete_product_confirm(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
@@ -1187,6 +1286,8 @@ async def delete_product_confirm(callback: CallbackQuery, state: FSMContext):
         await session.execute(delete(Product).where(Product.id == product_id))
         await session.commit()
 
+    catalog_cache.invalidate(product_id)
+
     await callback.message.answer("🗑️ Товар успешно удалён")
     await callback.message.answer(
         "👑 Панель администратора",
@@ -1221,27 +1322,19 @@ async def add_image_handler(callback: CallbackQuery, state: FSMContext):
     F.content_type.in_({ContentType.PHOTO, ContentType.DOCUMENT})
 )
 async def process_image_photo(message: Message, state: FSMContext):
+    # file_id документа нельзя отправить как фото, поэтому для документа
+    # сохраняется только url, а file_id появится после первой отправки
+    photo_file_id = photo_unique_id = None
     if message.photo:
-        file_id = message.photo[-1].file_id
+        file_id = photo_file_id = message.photo[-1].file_id
+        photo_unique_id = message.photo[-1].file_unique_id
     else:
         if not message.document.mime_type.startswith("image/"):
             await message.answer("❌ Файл должен быть изображением")
             return
         file_id = message.document.file_id
 
-    data = await state.get_data()
-    product_id = data.get("product_id")
-
-    async with AsyncSessionLocal() as session:
-        session.add(ProductImage(url=file_id, product_id=product_id))
-        await session.commit()
-
-    await message.answer(
-        "✅ Изображение добавлено",
-        reply_markup=get_image_management_keyboard()
-    )
-
-    await state.set_state(EditProductStates.waiting_for_image_choice)
+    await add_draft_image(message, state, "✅ Изображение добавлено", file_id, photo_file_id, photo_unique_id)
 
 @admin_router.message(
     EditProductStates.waiting_for_image_upload,
@@ -1257,15 +1350,27 @@ async def process_image_url(message: Message, state: FSMContext):
         )
         return
 
-    data = await state.get_data()
-    product_id = data.get("product_id")
+    await add_draft_image(message, state, "✅ Изображение добавлено по URL", url)
+
+async def add_draft_image(
+    message: Message,
+    state: FSMContext,
+    notice: str,
+    url: str,
+    file_id: str | None = None,
+    file_unique_id: str | None = None,
+):
+    """Новое фото — в черновик, в БД оно попадёт по «Сохранить»"""
+    draft = await ProductDraft.from_state(state)
+    if draft is None:
+        await message.answer("❌ Ошибка: товар не найден в сессии", reply_markup=get_cancel_edit_keyboard())
+        return
 
-    async with AsyncSessionLocal() as session:
-        session.add(ProductImage(url=url, product_id=product_id))
-        await session.commit()
+    draft.add_image(url, file_id, file_unique_id)
+    await draft.save(state)
 
     await message.answer(
-        "✅ Изображение добавлено по URL",
+        notice,
         reply_markup=get_image_management_keyboard()
     )
 
@@ -1276,16 +1381,8 @@ async def process_image_url(message: Message, state: FSMContext):
     EditProductStates.waiting_for_image_choice
 )
 async def delete_image_handler(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    product_id = data.get("product_id")
-
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(ProductImage)
-            .where(ProductImage.product_id == product_id)
-            .order_by(ProductImage.id)
-        )
-        images = result.scalars().all()
+    draft = await ProductDraft.from_state(state)
+    images = draft.images if draft else []
 
     if not images:
         await callback.message.edit_text(
@@ -1298,9 +1395,10 @@ async def delete_image_handler(callback: CallbackQuery, state: FSMContext):
     builder = InlineKeyboardBuilder()
 
     for img in images:
+        label = f"ID {img['id']}" if img["id"] is not None else "новое"
         builder.button(
-            text=f"🗑️ ID {img.id}",
-            callback_data=f"delete_img_{img.id}"
+            text=f"🗑️ {label}",
+            callback_data=f"delete_img_{img['key']}"
         )
 
     builder.button(text="↩️ Назад", callback_data="back_to_images")
@@ -1322,32 +1420,17 @@ async def delete_image_handler(callback: CallbackQuery, state: FSMContext):
     EditProductStates.waiting_for_image_delete
 )
 async def process_image_delete(callback: CallbackQuery, state: FSMContext):
-    image_id_str = callback.data.removeprefix("delete_img_")
-
-    if not image_id_str.isdigit():
-        await callback.answer("❌ Неверный ID")
-        return
-
-    image_id = int(image_id_str)
-
-    data = await state.get_data()
-    product_id = data.get("product_id")
-
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            delete(ProductImage).where(
-                ProductImage.id == image_id,
-                ProductImage.product_id == product_id
-            )
-        )
-        await session.commit()
+    image_key = callback.data.removeprefix("delete_img_")
 
-    if result.rowcount == 0:
+    draft = await ProductDraft.from_state(state)
+    if draft is None or not draft.remove_image(image_key):
         await callback.answer("❌ Изображение не найдено")
         return
 
+    await draft.save(state)
+
     await callback.message.edit_text(
-        f"✅ Изображение #{image_id} удалено",
+        "✅ Изображение удалено",
         reply_markup=get_image_management_keyboard()
     )
 
@@ -1359,27 +1442,20 @@ async def process_image_delete(callback: CallbackQuery, state: FSMContext):
     EditProductStates.waiting_for_image_choice
 )
 async def view_images_handler(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    product_id = data.get("product_id")
-
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(ProductImage)
-            .where(ProductImage.product_id == product_id)
-            .order_by(ProductImage.id)
-        )
-        images = result.scalars().all()
+    draft = await ProductDraft.from_state(state)
+    images = draft.images if draft else []
 
     if not images:
         await callback.answer("❌ У товара нет изображений", show_alert=True)
         return
 
     for i, image in enumerate(images, start=1):
+        label = f"ID: {image['id']}" if image["id"] is not None else "новое, не сохранено"
         await safe_send_media(
             bot=callback.bot,
             chat_id=callback.message.chat.id,
-            media=image.url,
-            caption=f"📷 {i} из {len(images)}\nID: {image.id}",
+            media=image["file_id"] or image["url"],
+            caption=f"📷 {i} из {len(images)}\n{label}",
             reply_markup=None   # ✅ ВАЖНО
         )
 
@@ -1395,14 +1471,9 @@ async def view_images_handler(callback: CallbackQuery, state: FSMContext):
 @admin_router.callback_query(F.data == "back_to_edit")
 async def back_to_edit_handler(callback: CallbackQuery, state: FSMContext):
     """Возврат к меню редактирования"""
-    data = await state.get_data()
-    product_id = data.get('product_id')
-    
-    async with AsyncSessionLocal() as session:
-        product = await session.get(Product, product_id)
-        if product:
-            await show_product_for_edit(callback.message, state, product)
-            await state.set_state(EditProductStates.waiting_for_edit_choice)
+    draft = await ProductDraft.from_state(state)
+    if draft is not None:
+        await show_product_for_edit(callback.message, state, draft)
     
     await callback.answer()
 
@@ -1420,10 +1491,21 @@ async def back_to_images_handler(callback: CallbackQuery, state: FSMContext):
 
 @admin_router.callback_query(F.data == "finish_edit")
 async def finish_edit_handler(callback: CallbackQuery, state: FSMContext):
-    """Завершение редактирования"""
-    await state.clear()
+    """Завершение редактирования: все правки черновика одной транзакцией"""
+    draft = await ProductDraft.from_state(state)
 
-    text = "✅ <b>Редактирование завершено!</b>\n\nТовар успешно обновлен."
+    if draft is None or not draft.has_changes:
+        text = "✅ <b>Редактирование завершено!</b>\n\nИзменений нет."
+    else:
+        async with AsyncSessionLocal() as session:
+            changes = await draft.apply(session)
+        if changes is None:
+            text = "❌ <b>Товар не найден</b>\n\nПока шло редактирование, его удалили. Изменения не сохранены."
+        else:
+            catalog_cache.invalidate(draft.product_id)
+            text = f"✅ <b>Редактирование завершено!</b>\n\nСохранено: {', '.join(changes)}."
+
+    await state.clear()
     
     try:
         if callback.message.text:
@@ -1447,11 +1529,11 @@ async def finish_edit_handler(callback: CallbackQuery, state: FSMContext):
 
 @admin_router.callback_query(F.data == "cancel_edit")
 async def cancel_edit_handler(callback: CallbackQuery, state: FSMContext):
-    """Отмена редактирования"""
+    """Отмена редактирования: черновик сбрасывается вместе с FSM"""
     await state.clear()
     
     await callback.message.edit_text(
-        "❌ <b>Редактирование отменено</b>",
+        "❌ <b>Редактирование отменено</b>\n\nИзменения не сохранены.",
         parse_mode=ParseMode.HTML
     )
     
@@ -1,5 +1,8 @@
 from asyncio.log import logger
-from aiogram import Router, F
+import html
+import json
+from datetime import datetime
+from aiogram import F
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery, InputMediaPhoto, ReplyKeyboardRemove, KeyboardButton
 from aiogram.enums import ParseMode
@@ -11,34 +14,41 @@ from aiogram.exceptions import TelegramBadRequest
 
 
 from databases.models import Product
+from handlers.callback_index import IndexedRouter
 from handlers.callbacks import (
     AskCallback, CategoryCallback, SubcategoryCallback, 
-    ProductCallback, BackCallback
+    ProductCallback, BackCallback, PageCallback
 )
 from databases.engine import AsyncSessionLocal
+from databases.replicas import ReadSessionLocal
+from databases.crud import create_order
+from databases.catalog_cache import catalog_cache
+from databases.pagination import page_of
+from databases.file_ids import file_id_writer
+from handlers.order_outbox import OrderOutbox
+from handlers.product_cards import product_cards, render_product_card
+from databases.search_index import product_search_index
 from keyboards.user_keyboards import (
-    categories_keyboard, consultation_keyboard, products_keyboard, 
-    subcategories_keyboard, command_keyboard, 
-)
-from databases.crud import (
-    get_categories, get_products_by_category, get_subcategories, get_products, 
-    get_subcategory, get_category, get_product
+    back_to_catalog_keyboard, categories_keyboard, consultation_keyboard, products_keyboard, 
+    search_results_keyboard, subcategories_keyboard, command_keyboard, 
 )
 
-from fsm import (QuestionStates, OrderStates
+from fsm import (QuestionStates, OrderStates, SearchStates
 )
 
-user_router = Router()
+user_router = IndexedRouter()
 
 MANAGER_CHAT_ID = 5129105635
 
+order_outbox = OrderOutbox(MANAGER_CHAT_ID)
+
 @user_router.message(CommandStart())
 async def send_welcome(message: Message, state: FSMContext):
     """Обработчик команды /start"""
     await state.clear()
     
-    async with AsyncSessionLocal() as session:
-        markup = await categories_keyboard(session)
+    catalog = await catalog_cache.get()
+    markup = await categories_keyboard(page_of(catalog.categories), version=catalog.version)
 
     await message.answer(
         "🛋️ <b>Добро пожаловать в магазин мебели!</b>\n\n"
@@ -52,8 +62,8 @@ async def send_welcome(message: Message, state: FSMContext):
     """Обработчик команды /start"""
     await state.clear()
     
-    async with AsyncSessionLocal() as session:
-        markup = await categories_keyboard(session)
+    catalog = await catalog_cache.get()
+    markup = await categories_keyboard(page_of(catalog.categories), version=catalog.version)
 
     await message.answer(
         "🛋️ <b>Добро пожаловать в магазин мебели!</b>\n\n"
@@ -62,127 +72,129 @@ async def send_welcome(message: Message, state: FSMContext):
         reply_markup=markup
     )
 
-@user_router.callback_query(CategoryCallback.filter())
-async def category_selected(
-    callback: CallbackQuery,
-    callback_data: CategoryCallback,
-    state: FSMContext
-):
-    """Обработчик выбора категории"""
-    category_id = callback_data.category_id
-    
-    async with AsyncSessionLocal() as session:
-        category = await get_category(session, category_id)
-        if not category:
-            await callback.answer("❌ Категория не найдена", show_alert=True)
-            return
-        
-        subcategories = await get_subcategories(session, category_id)
-        
-        products = await get_products_by_category(session, category_id)
-        
-        await state.update_data(
-            selected_category_id=category_id,
-            selected_category_name=category.name
+# Экраны каталога собираются только из callback_data: где пользователь и
+# какая страница — в кнопке (CategoryCallback, PageCallback, BackCallback),
+# в FSM навигация ничего не пишет.
+
+async def _catalog_view(after: int = 0, before: int = 0, around: int = 0):
+    """Текст и клавиатура списка категорий"""
+    catalog = await catalog_cache.get()
+    page = page_of(catalog.categories, after, before, around=around)
+    return "🛋️ <b>Выберите категорию:</b>", await categories_keyboard(page, version=catalog.version)
+
+
+async def _category_view(category_id: int, after: int = 0, before: int = 0, around: int = 0):
+    """Текст и клавиатура экрана категории; None — категории нет"""
+    screen = await catalog_cache.category_screen(category_id, after, before, around)
+    if not screen:
+        return None
+
+    category = screen.category
+    if screen.subcategories:
+        markup = await subcategories_keyboard(
+            screen.subcategories,
+            category_id=category.id,
+            version=screen.version
         )
-        
-        print(f"[DEBUG] Категория: {category.name}")
-        print(f"[DEBUG] Подкатегорий: {len(subcategories)}")
-        print(f"[DEBUG] Товаров (без подкатегорий): {len(products)}")
-        
-        if subcategories:
-            markup = await subcategories_keyboard(
-                subcategories, 
-                category_id=category_id
-            )
-            await callback.message.edit_text(
-                f"📁 <b>Категория:</b> {category.name}\n\n"
-                "Выберите подкатегорию:",
-                parse_mode="HTML",
-                reply_markup=markup
-            )
+        return f"📁 <b>Категория:</b> {category.name}\n\nВыберите подкатегорию:", markup
+
+    if screen.products:
+        markup = await products_keyboard(
+            products=screen.products,
+            category_id=category.id,
+            subcategory_id=None,
+            version=screen.version
+        )
+        return f"📂 <b>Категория:</b> {category.name}\n\nВыберите товар:", markup
+
+    markup = await command_keyboard(category_id=category.id)
+    return (
+        f"📂 <b>{category.name}</b>\n\n"
+        "В этой категории пока нет подкатегорий и товаров.\n"
+        "Выберите действие:"
+    ), markup
+
+
+async def _subcategory_view(subcategory_id: int, after: int = 0, before: int = 0, around: int = 0):
+    """Текст и клавиатура экрана подкатегории; None — подкатегории нет"""
+    screen = await catalog_cache.subcategory_screen(subcategory_id, after, before, around)
+    if not screen:
+        return None
+
+    subcategory = screen.subcategory
+    if not screen.products:
+        markup = await command_keyboard(
+            category_id=subcategory.category_id,
+            subcategory_id=subcategory.id,
+            empty=True
+        )
+        return (
+            f"📦 <b>Подкатегория:</b> {subcategory.name}\n\n"
+            "В этой подкатегории пока нет товаров.\n"
+            "Выберите действие:"
+        ), markup
+
+    markup = await products_keyboard(
+        products=screen.products,
+        subcategory_id=subcategory.id,
+        category_id=subcategory.category_id,
+        version=screen.version
+    )
+    category_name = screen.category.name if screen.category else "Неизвестно"
+    return (
+        f"📦 <b>Категория:</b> {category_name}\n"
+        f"📁 <b>Подкатегория:</b> {subcategory.name}\n\n"
+        f"<b>Доступные товары:</b>"
+    ), markup
 
-        elif not subcategories and products:
-            markup = await products_keyboard(
-                products=products,
-                category_id=category_id,  
-                subcategory_id=None       
-            )
-            await callback.message.edit_text(
-                f"📂 <b>Категория:</b> {category.name}\n\n"
-                "Выберите товар:",
-                parse_mode="HTML",
-                reply_markup=markup
-            )
 
-        else:
-            markup = await command_keyboard(category_id=category_id)
-            await callback.message.edit_text(
-                f"📂 <b>{category.name}</b>\n\n"
-                "В этой категории пока нет подкатегорий и товаров.\n"
-                "Выберите действие:",
-                parse_mode="HTML",
-                reply_markup=markup
-            )
-    
+@user_router.callback_query(CategoryCallback.filter())
+async def category_selected(callback: CallbackQuery, callback_data: CategoryCallback):
+    """Обработчик выбора категории"""
+    view = await _category_view(callback_data.category_id)
+    if not view:
+        await callback.answer("❌ Категория не найдена", show_alert=True)
+        return
+
+    text, markup = view
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
     await callback.answer()
 
 
 @user_router.callback_query(SubcategoryCallback.filter())
-async def subcategory_selected(
-    callback: CallbackQuery, 
-    callback_data: SubcategoryCallback,
-    state: FSMContext,
-):
+async def subcategory_selected(callback: CallbackQuery, callback_data: SubcategoryCallback):
     """Обработчик выбора подкатегории"""
-    subcategory_id = callback_data.subcategory_id
-    
-    async with AsyncSessionLocal() as session:
-        subcategory = await get_subcategory(session, subcategory_id)
-        if not subcategory:
-            await callback.answer("❌ Подкатегория не найдена", show_alert=True)
-            return
-        
-        category = await get_category(session, subcategory.category_id)
-        products = await get_products(session, subcategory_id)
-        
-        await state.update_data(
-            selected_subcategory_id=subcategory_id,
-            selected_subcategory_name=subcategory.name,
-            selected_category_id=subcategory.category_id,
-            selected_category_name=category.name if category else "Неизвестно"
-        )
-        
-        if not products:
-            markup = await command_keyboard(
-                category_id=subcategory.category_id,
-                subcategory_id=subcategory_id,
-                empty=True
-            )
-            
-            await callback.message.edit_text(  
-                f"📦 <b>Подкатегория:</b> {subcategory.name}\n\n"
-                "В этой подкатегории пока нет товаров.\n"
-                "Выберите действие:",
-                parse_mode="HTML",
-                reply_markup=markup
-            )
-        else:
-            markup = await products_keyboard(
-                products=products,
-                subcategory_id=subcategory_id,
-                category_id=subcategory.category_id
-            )
-            
-            category_name = category.name if category else "Неизвестно"
-            await callback.message.edit_text(
-                f"📦 <b>Категория:</b> {category_name}\n"
-                f"📁 <b>Подкатегория:</b> {subcategory.name}\n\n"
-                f"<b>Доступные товары:</b>",
-                parse_mode="HTML",
-                reply_markup=markup
-            )
-    
+    view = await _subcategory_view(callback_data.subcategory_id)
+    if not view:
+        await callback.answer("❌ Подкатегория не найдена", show_alert=True)
+        return
+
+    text, markup = view
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
+
+
+@user_router.callback_query(PageCallback.filter(F.screen.in_({"catalog", "category", "subcategory"})))
+async def page_selected(callback: CallbackQuery, callback_data: PageCallback):
+    """◀️ / ▶️ в каталоге: меняется только клавиатура, заголовок экрана тот же"""
+    after, before = callback_data.after, callback_data.before
+
+    if callback_data.screen == "catalog":
+        view = await _catalog_view(after, before)
+    elif callback_data.screen == "category":
+        view = await _category_view(callback_data.parent_id, after, before)
+    else:
+        view = await _subcategory_view(callback_data.parent_id, after, before)
+    if not view:
+        await callback.answer("❌ Раздел не найден", show_alert=True)
+        return
+
+    _, markup = view
+    try:
+        await callback.message.edit_reply_markup(reply_markup=markup)
+    except TelegramBadRequest:
+        # двойное нажатие: клавиатура уже та же
+        pass
     await callback.answer()
 
 
@@ -194,44 +206,52 @@ async def product_selected(
 ):
     product_id = callback_data.product_id
     
-    async with AsyncSessionLocal() as session:
-        stmt = select(Product).where(Product.id == product_id).options(
-            selectinload(Product.images)  
-        )
+    card = product_cards.get(product_id)
+    if card is None:
+        version = catalog_cache.version
+        async with ReadSessionLocal() as session:
+            stmt = select(Product).where(Product.id == product_id).options(
+                selectinload(Product.images)  
+            )
+            
+            result = await session.execute(stmt)
+            product = result.scalar_one_or_none()
         
-        result = await session.execute(stmt)
-        product = result.scalar_one_or_none()
-    
-    if not product:
-        await callback.message.answer("❌ Товар не найден")
-        await callback.answer()
-        return
+        if not product:
+            await callback.message.answer("❌ Товар не найден")
+            await callback.answer()
+            return
+        
+        keyboard = await command_keyboard(
+            category_id=product.category_id,
+            subcategory_id=product.subcategory_id,
+            product_id=product.id
+        )
+        card = product_cards.put(render_product_card(product, version, keyboard))
     
-    if product.images:
-        for i in range(0, len(product.images), 10):
-            media_group = []
-            
-            for image in product.images[i:i + 10]:
-                if getattr(image, "file_id", None):
-                    media_group.append(InputMediaPhoto(media=image.file_id))
-                elif image.url and image.url.startswith(("http://", "https://")):
-                    media_group.append(InputMediaPhoto(media=image.url))
-            
-            if media_group:
-                try:
-                    await callback.message.answer_media_group(media=media_group)
-                except TelegramBadRequest as e:
-                    await callback.message.answer(
-                        "⚠️ Не удалось загрузить изображения товара.\n"
-                        "Показываю описание без фото."
-                    )
-
+    for group in card.media_groups:
+        try:
+            messages = await callback.message.answer_media_group(media=list(group.media))
+        except TelegramBadRequest as e:
+            await callback.message.answer(
+                "⚠️ Не удалось загрузить изображения товара.\n"
+                "Показываю описание без фото."
+            )
+            continue
+        
+        # фото, отправленные по url, дальше шлём по file_id из ответа
+        file_ids = {}
+        for image_id, sent in zip(group.url_image_ids, messages):
+            if image_id is not None and sent.photo:
+                file_id_writer.remember(image_id, sent.photo[-1].file_id, sent.photo[-1].file_unique_id)
+                file_ids[image_id] = sent.photo[-1].file_id
+        if file_ids:
+            product_cards.learn_file_ids(card, file_ids)
     
     await callback.message.answer(
-        f"📦 <b>{product.name}</b>\n\n"
-        f"{product.short_description or 'Описание отсутствует'}",
+        card.text,
         parse_mode="HTML",
-        reply_markup=await command_keyboard()
+        reply_markup=card.keyboard
     )
     
     await callback.answer()
@@ -297,8 +317,8 @@ async def order_short_description(message: Message, state: FSMContext):
     await state.update_data(short_description=message.text.strip())
     await state.set_state(OrderStates.category)
 
-    async with AsyncSessionLocal() as session:
-        categories = await get_categories(session)
+    catalog = await catalog_cache.get()
+    categories = catalog.categories
 
     if not categories:
         await message.answer("❌ Категории пока не добавлены.")
@@ -317,25 +337,25 @@ async def order_short_description(message: Message, state: FSMContext):
 async def order_choose_category(message: Message, state: FSMContext):
     text = message.text.strip()
 
-    async with AsyncSessionLocal() as session:
-        categories = await get_categories(session)
+    catalog = await catalog_cache.get()
+    categories = catalog.categories
 
-        if text.isdigit() and 1 <= int(text) <= len(categories):
-            category = categories[int(text) - 1]
-        else:
-            matches = [c for c in categories if c.name.lower() == text.lower()]
-            if not matches:
-                categories_text = "\n".join([f"{i+1}. {c.name}" for i, c in enumerate(categories)])
-                await message.answer(
-                    f"❌ Категория не найдена. Попробуйте снова:\n\n📁 Доступные категории:\n{categories_text}"
-                )
-                return
-            category = matches[0]
+    if text.isdigit() and 1 <= int(text) <= len(categories):
+        category = categories[int(text) - 1]
+    else:
+        matches = [c for c in categories if c.name.lower() == text.lower()]
+        if not matches:
+            categories_text = "\n".join([f"{i+1}. {c.name}" for i, c in enumerate(categories)])
+            await message.answer(
+                f"❌ Категория не найдена. Попробуйте снова:\n\n📁 Доступные категории:\n{categories_text}"
+            )
+            return
+        category = matches[0]
 
-        await state.update_data(category_id=category.id, category_name=category.name)
-        await state.set_state(OrderStates.subcategory)
+    await state.update_data(category_id=category.id, category_name=category.name)
+    await state.set_state(OrderStates.subcategory)
 
-        subcategories = await get_subcategories(session, category.id)
+    subcategories = catalog.subcategories(category.id)
 
     if subcategories:
         subcategories_text = "\n".join([f"{i+1}. {s.name}" for i, s in enumerate(subcategories)])
@@ -363,8 +383,8 @@ async def order_choose_subcategory(message: Message, state: FSMContext):
     data = await state.get_data()
     category_id = data.get("category_id")
 
-    async with AsyncSessionLocal() as session:
-        subcategories = await get_subcategories(session, category_id)
+    catalog = await catalog_cache.get()
+    subcategories = catalog.subcategories(category_id)
 
     if not subcategories:
         await state.update_data(subcategory_id=None, subcategory_name=None)
@@ -414,13 +434,15 @@ async def order_additional_info(message: Message, state: FSMContext):
 
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
-@user_router.message(OrderStates.images)
-async def order_images(message: Message, state: FSMContext):
+@user_router.message(OrderStates.images, flags={"album": True})
+async def order_images(message: Message, state: FSMContext, album: list[Message] | None = None):
+    album = album or [message]
     data = await state.get_data()
     images = data.get('images', [])
     
     if message.photo:
-        images.append(message.photo[-1].file_id)
+        # альбом — одно сообщение и одна запись в FSM (middlewares/media_group.py)
+        images.extend(part.photo[-1].file_id for part in album if part.photo)
         await state.update_data(images=images)
         
         keyboard = ReplyKeyboardMarkup(
@@ -428,8 +450,9 @@ async def order_images(message: Message, state: FSMContext):
             resize_keyboard=True
         )
         
+        added = f"Фото {len(images)} добавлено" if len(album) == 1 else f"Добавлено фото: {len(album)}, всего {len(images)}"
         await message.answer(
-            f"✅ Фото {len(images)} добавлено.\n"
+            f"✅ {added}.\n"
             f"Отправьте еще фото или нажмите 'Готово'.",
             reply_markup=keyboard
         )
@@ -438,31 +461,27 @@ async def order_images(message: Message, state: FSMContext):
     elif message.text and message.text.lower() in ["готово", "пропустить"]:
         remove_keyboard = ReplyKeyboardRemove()
         
-        category = data.get('category_name', 'Не указана')
-        subcategory = data.get('subcategory_name', 'Не указана')
-        
-        text_to_manager = (
-            f"📦 Новый заказ:\n"
-            f"├ Название: {data.get('name')}\n"
-            f"├ Описание: {data.get('short_description')}\n"
-            f"├ Дополнительно: {data.get('additional_info')}\n"
-            f"├ Категория: {category}\n"
-            f"└ Подкатегория: {subcategory}\n"
-            f"├ Фото: {len(images)} шт."
-        )
-
-        await message.bot.send_message(MANAGER_CHAT_ID, text_to_manager)
-
-
-            
-        if images:
-            for i in range(0, len(images), 10):
-                media_group = images[i:i+10]
-                media = [InputMediaPhoto(media=fid) for fid in media_group]
-                await message.bot.send_media_group(MANAGER_CHAT_ID, media)
+        # Заказ — одна вставка; менеджеру его отправит order_outbox в фоне
+        async with AsyncSessionLocal() as session:
+            order_id = await create_order(
+                session,
+                idempotency_key=f"{message.chat.id}:{message.message_id}",
+                product_name=(data.get('name') or 'Без названия')[:255],
+                product_description=data.get('short_description'),
+                product_info=data.get('additional_info'),
+                category_name=data.get('category_name'),
+                subcategory_name=data.get('subcategory_name'),
+                customer_name=(message.from_user.full_name if message.from_user else '')[:100],
+                # телефон бот не спрашивает, менеджер связывается через Telegram
+                customer_phone='',
+                customer_chat_id=message.chat.id,
+                product_images=json.dumps(images) if images else None,
+                notify_after=datetime.utcnow(),
+            )
+        order_outbox.wake()
         
         await message.answer(
-            "✅ Заказ оформлен! Менеджер свяжется с вами.",
+            f"✅ Заказ №{order_id} оформлен! Менеджер свяжется с вами.",
             reply_markup=remove_keyboard
         )
         
@@ -483,67 +502,34 @@ async def back_handler(
         return
 
     try:
-        async with AsyncSessionLocal() as session:
-            if callback_data.to == "categories":
-                markup = await categories_keyboard(session)
-                text = "🛋️ <b>Выберите категорию:</b>"
-
-            elif callback_data.to == "subcategories":
-                category = await get_category(session, callback_data.parent_id)
-                subcategories = await get_subcategories(session, callback_data.parent_id)
-
-                markup = await subcategories_keyboard(
-                    subcategories,
-                    category_id=callback_data.parent_id
-                )
-
-                text = (
-                    f"📂 <b>Категория:</b> "
-                    f"{category.name if category else 'Неизвестно'}\n\n"
-                    "Выберите подкатегорию:"
-                )
-
-            elif callback_data.to == "products":
-                subcategory = await get_subcategory(session, callback_data.parent_id)
-
-                if subcategory:
-                    products = await get_products(session, subcategory.id)
-                    category = await get_category(session, subcategory.category_id)
-                else:
-                    category = await get_category(session, callback_data.parent_id)
-                    products = await get_products(session, callback_data.parent_id)
-
-
-                markup = await products_keyboard(
-                    products,
-                    subcategory_id=callback_data.parent_id
-                )
-
-                text = (
-                    f"📦 <b>Категория:</b> {category.name if category else 'Неизвестно'}\n"
-                    f"<b>Подкатегория:</b> {subcategory.name}\n\n"
-                    "Выберите товар:"
-                )
-
-            elif callback_data.to == "product_detail":
-                product = await get_product(session, callback_data.parent_id)
-                products = await get_products(session, product.subcategory_id)
-
-                markup = await products_keyboard(
-                    products,
-                    subcategory_id=product.subcategory_id,
-                    category_id=product.subcategory.category_id
-                )
-
-                text = (
-                    f"📦 <b>Подкатегория:</b> "
-                    f"{product.subcategory.name if product.subcategory else 'Неизвестно'}\n\n"
-                    "Выберите товар:"
-                )
+        around = callback_data.item_id
+        if callback_data.to == "categories":
+            view = await _catalog_view(around=around)
+
+        elif callback_data.to == "subcategories":
+            view = await _category_view(callback_data.parent_id, around=around)
+
+        elif callback_data.to == "products":
+            view = await _subcategory_view(callback_data.parent_id, around=around)
+
+        elif callback_data.to == "product_detail":
+            catalog = await catalog_cache.get()
+            product = catalog.product(callback_data.parent_id)
+            if product is None:
+                view = None
+            elif product.subcategory_id:
+                view = await _subcategory_view(product.subcategory_id, around=product.id)
             else:
-                await callback.answer("Неизвестное действие", show_alert=True)
-                return
+                view = await _category_view(product.category_id, around=product.id)
+        else:
+            await callback.answer("Неизвестное действие", show_alert=True)
+            return
 
+        if not view:
+            await callback.answer("❌ Раздел не найден", show_alert=True)
+            return
+
+        text, markup = view
         await callback.message.edit_text(
             text=text,
             reply_markup=markup,
@@ -563,4 +549,38 @@ async def back_handler(
 async def back_to_catalog_handler(callback: CallbackQuery, state: FSMContext):
     """Обработчик возврата в каталог"""
     await send_welcome(callback.message, state)
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+
+@user_router.callback_query(F.data == "search_products")
+async def start_search(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(SearchStates.query)
+    await callback.message.answer(
+        "🔍 Введите название товара или его часть, например: <i>угловой диван</i>",
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@user_router.message(SearchStates.query, F.text)
+async def process_search(message: Message, state: FSMContext):
+    """Поиск по индексу в памяти, без запросов к БД"""
+    query = message.text.strip()
+    products = await product_search_index.search(query)
+    query = html.escape(query)
+
+    if not products:
+        await message.answer(
+            f"😔 По запросу <b>{query}</b> ничего не найдено.\n"
+            "Попробуйте другое название или вернитесь в каталог.",
+            parse_mode="HTML",
+            reply_markup=back_to_catalog_keyboard()
+        )
+        return
+
+    await state.clear()
+    await message.answer(
+        f"🔍 <b>Найдено по запросу</b> «{query}»:",
+        parse_mode="HTML",
+        reply_markup=search_results_keyboard(products)
+    )
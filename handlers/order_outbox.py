@@ -0,0 +1,177 @@
+"""
+Доставка заказов менеджеру.
+
+order_images записывает заказ одной вставкой (crud.create_order), сразу
+отвечает пользователю и будит OrderOutbox. Воркер забирает из orders строки
+с notified_at IS NULL и подошедшим notify_after, отправляет менеджеру текст
+и фото и отмечает notified_at. При ошибке — повтор с растущей паузой.
+
+Строка забирается продлением notify_after на время аренды, поэтому
+несколько процессов (режим кластера) не отправят один заказ одновременно.
+Доставка «хотя бы один раз»: если процесс упал между отправкой и отметкой,
+уведомление придёт повторно — с тем же номером заказа.
+"""
+import asyncio
+import html
+import json
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InputMediaPhoto
+from environs import Env
+from sqlalchemy import select, update
+
+from databases.engine import AsyncSessionLocal
+from databases.models import Order
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять очередь без явного пробуждения (повторы, заказы других процессов), сек
+ORDER_OUTBOX_POLL_INTERVAL = env.float("ORDER_OUTBOX_POLL_INTERVAL", 5.0)
+# Сколько заказов забирать за раз
+ORDER_OUTBOX_BATCH = env.int("ORDER_OUTBOX_BATCH", 20)
+# На сколько забранный заказ скрыт от других процессов, сек
+ORDER_OUTBOX_LEASE = env.float("ORDER_OUTBOX_LEASE", 60.0)
+# Пауза перед повтором: 2, 4, 8 ... сек, но не больше
+ORDER_OUTBOX_MAX_BACKOFF = env.float("ORDER_OUTBOX_MAX_BACKOFF", 600.0)
+
+
+def _field(value: str | None, default: str = "—") -> str:
+    return html.escape(value) if value else default
+
+
+def manager_text(order: Order) -> str:
+    images = json.loads(order.product_images) if order.product_images else []
+    return (
+        f"📦 Новый заказ №{order.id}:\n"
+        f"├ Название: {_field(order.product_name)}\n"
+        f"├ Описание: {_field(order.product_description)}\n"
+        f"├ Дополнительно: {_field(order.product_info)}\n"
+        f"├ Категория: {_field(order.category_name, 'Не указана')}\n"
+        f"├ Подкатегория: {_field(order.subcategory_name, 'Не указана')}\n"
+        f"├ Клиент: {_field(order.customer_name)} (chat_id {order.customer_chat_id})\n"
+        f"└ Фото: {len(images)} шт."
+    )
+
+
+class OrderOutbox:
+    def __init__(
+        self,
+        manager_chat_id: int,
+        session_factory=AsyncSessionLocal,
+        poll_interval: float = ORDER_OUTBOX_POLL_INTERVAL,
+        batch_size: int = ORDER_OUTBOX_BATCH,
+        lease: float = ORDER_OUTBOX_LEASE,
+        max_backoff: float = ORDER_OUTBOX_MAX_BACKOFF,
+    ):
+        self.manager_chat_id = manager_chat_id
+        self._session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_backoff = max_backoff
+
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self.delivered = 0
+        self.failures = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "delivered": self.delivered,
+            "failures": self.failures,
+            "running": int(self._task is not None and not self._task.done()),
+        }
+
+    def wake(self) -> None:
+        """Проверить очередь сейчас, не дожидаясь poll_interval"""
+        self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.deliver_due(bot)
+            except Exception:
+                logger.exception("Ошибка очереди заказов")
+                claimed = 0
+
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _claim(self) -> list[Order]:
+        now = datetime.utcnow()
+        due = (Order.notified_at.is_(None), Order.notify_after <= now)
+        async with self._session_factory() as session:
+            ids = select(Order.id).where(*due).order_by(Order.notify_after).limit(self.batch_size)
+            # условия повторены снаружи: строку, которую уже забрал другой
+            # процесс, PostgreSQL после блокировки перепроверит и пропустит
+            result = await session.execute(
+                update(Order)
+                .where(Order.id.in_(ids), *due)
+                .values(
+                    notify_after=now + timedelta(seconds=self.lease),
+                    notify_attempts=Order.notify_attempts + 1,
+                )
+                .returning(Order)
+                .execution_options(synchronize_session=False)
+            )
+            orders = list(result.scalars())
+            await session.commit()
+            return orders
+
+    async def deliver_due(self, bot: Bot) -> int:
+        """Отправить подошедшие заказы; вернуть, сколько забрано"""
+        orders = await self._claim()
+        for order in orders:
+            try:
+                await self._send(bot, order)
+            except Exception as e:
+                self.failures += 1
+                delay = min(self.max_backoff, 2 ** order.notify_attempts)
+                logger.warning("Заказ №%s не доставлен (попытка %s), повтор через %s с: %s",
+                               order.id, order.notify_attempts, delay, e)
+                values = {"notify_after": datetime.utcnow() + timedelta(seconds=delay), "notify_error": str(e)[:1000]}
+            else:
+                self.delivered += 1
+                values = {"notified_at": datetime.utcnow(), "notify_error": None}
+
+            async with self._session_factory() as session:
+                await session.execute(update(Order).where(Order.id == order.id).values(**values))
+                await session.commit()
+        return len(orders)
+
+    async def _send(self, bot: Bot, order: Order) -> None:
+        await bot.send_message(self.manager_chat_id, manager_text(order))
+
+        images = json.loads(order.product_images) if order.product_images else []
+        for i in range(0, len(images), 10):
+            media = [InputMediaPhoto(media=file_id) for file_id in images[i:i + 10]]
+            try:
+                await bot.send_media_group(self.manager_chat_id, media)
+            except TelegramBadRequest as e:
+                # битый file_id не починится повтором — текст заказа уже у менеджера
+                logger.warning("Фото заказа №%s не отправлены: %s", order.id, e)
@@ -0,0 +1,175 @@
+"""
+Готовые карточки товаров для product_selected.
+
+Карточка — неизменяемый набор всего, что уходит пользователю: группы фото
+по 10 (InputMediaPhoto), текст с экранированным HTML, обрезанный до лимита
+Telegram, и клавиатура. Карточки лежат в LRU по id товара; правка товара
+админом (catalog_cache.invalidate(product_id)) выбрасывает только его
+карточку, сброс всего каталога — все карточки.
+"""
+import html
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from aiogram.types import InlineKeyboardMarkup, InputMediaPhoto
+from environs import Env
+
+from databases.catalog_cache import CatalogCache, catalog_cache
+from databases.file_ids import file_id_writer
+from databases.models import Product
+
+
+env = Env()
+env.read_env()
+
+PRODUCT_CARD_CACHE_SIZE = env.int("PRODUCT_CARD_CACHE_SIZE", 1000)
+
+MEDIA_GROUP_SIZE = 10
+# Лимит текста сообщения — в UTF-16 символах после разбора HTML
+MESSAGE_LIMIT = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class CardMediaGroup:
+    media: tuple[InputMediaPhoto, ...]
+    # id фото, отправляемых по ссылке (None — уже по file_id)
+    url_image_ids: tuple[int | None, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class ProductCard:
+    product_id: int
+    version: int  # версия каталога, на которой карточка собрана
+    media_groups: tuple[CardMediaGroup, ...]
+    text: str
+    keyboard: InlineKeyboardMarkup
+
+    def with_file_ids(self, file_ids: dict[int, str]) -> "ProductCard":
+        """Та же карточка, где фото из file_ids отправляются по file_id"""
+        groups = []
+        for group in self.media_groups:
+            media, url_ids = [], []
+            for item, image_id in zip(group.media, group.url_image_ids):
+                if image_id in file_ids:
+                    item, image_id = InputMediaPhoto(media=file_ids[image_id]), None
+                media.append(item)
+                url_ids.append(image_id)
+            groups.append(CardMediaGroup(tuple(media), tuple(url_ids)))
+        return replace(self, media_groups=tuple(groups))
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _truncate(text: str, limit: int) -> str:
+    if _utf16_len(text) <= limit:
+        return text
+    text = text[:limit - 1]
+    while (excess := _utf16_len(text) - (limit - 1)) > 0:
+        # символы вне BMP занимают по две UTF-16 единицы
+        text = text[:-max(1, (excess + 1) // 2)]
+    return text.rstrip() + "…"
+
+
+def card_text(name: str, description: str | None) -> str:
+    """Текст карточки; лимит считается по видимому тексту, до экранирования"""
+    header = f"📦 {name}\n\n"
+    description = description or "Описание отсутствует"
+    if _utf16_len(header) >= MESSAGE_LIMIT:
+        return f"📦 <b>{html.escape(_truncate(name, MESSAGE_LIMIT - 4))}</b>"
+    description = _truncate(description, MESSAGE_LIMIT - _utf16_len(header))
+    return f"📦 <b>{html.escape(name)}</b>\n\n{html.escape(description)}"
+
+
+def render_product_card(product: Product, version: int, keyboard: InlineKeyboardMarkup) -> ProductCard:
+    """Собрать карточку товара (нужны загруженные product.images)"""
+    photos = []
+    for image in product.images:
+        file_id = file_id_writer.file_id(image)
+        if file_id:
+            photos.append((InputMediaPhoto(media=file_id), None))
+        elif image.url and image.url.startswith(("http://", "https://")):
+            photos.append((InputMediaPhoto(media=image.url), image.id))
+
+    groups = tuple(
+        CardMediaGroup(
+            tuple(item for item, _ in photos[i:i + MEDIA_GROUP_SIZE]),
+            tuple(image_id for _, image_id in photos[i:i + MEDIA_GROUP_SIZE]),
+        )
+        for i in range(0, len(photos), MEDIA_GROUP_SIZE)
+    )
+    return ProductCard(product.id, version, groups, card_text(product.name, product.short_description), keyboard)
+
+
+class ProductCardCache:
+    """
+    LRU-кэш карточек по id товара.
+
+    Карточка, собранная до инвалидации своего товара (по версии каталога),
+    возвращается вызвавшему, но в кэш не попадает.
+    """
+
+    def __init__(self, catalog: CatalogCache = catalog_cache, maxsize: int = PRODUCT_CARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._catalog = catalog
+        self._items: OrderedDict[int, ProductCard] = OrderedDict()
+        # версия каталога, на которой товар (или весь каталог) последний раз менялся
+        self._changed_at: dict[int, int] = {}
+        self._cleared_at = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        catalog.subscribe(self._on_catalog_change)
+
+    def _on_catalog_change(self, product_id: int | None) -> None:
+        self.invalidations += 1
+        if product_id is None:
+            self._items.clear()
+            self._changed_at.clear()
+            self._cleared_at = self._catalog.version
+        else:
+            self._items.pop(product_id, None)
+            self._changed_at[product_id] = self._catalog.version
+
+    def get(self, product_id: int) -> ProductCard | None:
+        card = self._items.get(product_id)
+        if card is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(product_id)
+        self.hits += 1
+        return card
+
+    def put(self, card: ProductCard) -> ProductCard:
+        if card.version < max(self._cleared_at, self._changed_at.get(card.product_id, 0)):
+            return card
+
+        self._items[card.product_id] = card
+        self._items.move_to_end(card.product_id)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.evictions += 1
+        return card
+
+    def learn_file_ids(self, card: ProductCard, file_ids: dict[int, str]) -> None:
+        """Заменить в закэшированной карточке ссылки на file_id после отправки"""
+        if self._items.get(card.product_id) is card:
+            self._items[card.product_id] = card.with_file_ids(file_ids)
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+product_cards = ProductCardCache()
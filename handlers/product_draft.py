@@ -0,0 +1,160 @@
+"""
+Черновик редактирования товара в данных FSM.
+
+Товар читается из БД один раз при выборе для редактирования. Правки полей,
+категории и фото копятся в черновике (data["draft"]), экран товара
+рисуется из него. В БД всё пишется одной транзакцией по кнопке
+«Сохранить» (finish_edit) с одной инвалидацией каталога; отмена — сброс
+FSM, в БД ничего не уходит.
+
+    draft = await ProductDraft.load(session, product_id)
+    draft.name = "Шкаф-купе"
+    await draft.save(state)
+    ...
+    draft = await ProductDraft.from_state(state)
+    changes = await draft.apply(session)
+"""
+from dataclasses import asdict, dataclass, field
+
+from aiogram.fsm.context import FSMContext
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from databases.models import Product, ProductImage
+
+
+# Поля товара, которые правит админ, и как они называются в отчёте о сохранении
+FIELDS = {
+    "name": "название",
+    "short_description": "описание",
+    "additional_info": "доп. информация",
+    "category_id": "категория",
+    "subcategory_id": "категория",
+}
+
+
+@dataclass
+class ProductDraft:
+    product_id: int
+    name: str
+    short_description: str | None
+    additional_info: str | None
+    category_id: int | None
+    subcategory_id: int | None
+    category_name: str | None
+    subcategory_name: str | None
+    # {"key", "id", "url", "file_id", "file_unique_id"}; у новых фото id = None, key = "n1", "n2", ...
+    images: list[dict]
+    # значения FIELDS на момент загрузки: сохраняются только изменённые поля
+    original: dict
+    deleted_image_ids: list[int] = field(default_factory=list)
+    next_key: int = 1
+
+    @classmethod
+    async def load(cls, session: AsyncSession, product_id: int) -> "ProductDraft | None":
+        """Черновик товара одним запросом (с фото и категориями)"""
+        product = await session.get(
+            Product,
+            product_id,
+            options=[
+                selectinload(Product.images),
+                selectinload(Product.category),
+                selectinload(Product.subcategory),
+            ],
+        )
+        if product is None:
+            return None
+
+        images = sorted(product.images, key=lambda image: image.id)
+        return cls(
+            product_id=product.id,
+            **{name: getattr(product, name) for name in FIELDS},
+            category_name=product.category.name if product.category else None,
+            subcategory_name=product.subcategory.name if product.subcategory else None,
+            images=[
+                {
+                    "key": str(image.id), "id": image.id, "url": image.url,
+                    "file_id": image.file_id, "file_unique_id": image.file_unique_id,
+                }
+                for image in images
+            ],
+            original={name: getattr(product, name) for name in FIELDS},
+        )
+
+    @classmethod
+    async def from_state(cls, state: FSMContext) -> "ProductDraft | None":
+        data = await state.get_data()
+        draft = data.get("draft")
+        return cls(**draft) if draft else None
+
+    async def save(self, state: FSMContext) -> None:
+        await state.update_data(draft=asdict(self))
+
+    def add_image(self, url: str, file_id: str | None = None, file_unique_id: str | None = None) -> None:
+        self.images.append({
+            "key": f"n{self.next_key}", "id": None, "url": url,
+            "file_id": file_id, "file_unique_id": file_unique_id,
+        })
+        self.next_key += 1
+
+    def remove_image(self, key: str) -> bool:
+        for index, image in enumerate(self.images):
+            if image["key"] == key:
+                del self.images[index]
+                if image["id"] is not None:
+                    self.deleted_image_ids.append(image["id"])
+                return True
+        return False
+
+    def changed_fields(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS if getattr(self, name) != self.original[name]}
+
+    @property
+    def new_images(self) -> list[dict]:
+        return [image for image in self.images if image["id"] is None]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed_fields() or self.new_images or self.deleted_image_ids)
+
+    async def apply(self, session: AsyncSession) -> list[str] | None:
+        """
+        Записать правки одной транзакцией. Возвращает список изменений
+        или None, если товар успели удалить.
+        """
+        fields = self.changed_fields()
+        if fields:
+            result = await session.execute(
+                update(Product).where(Product.id == self.product_id).values(**fields)
+            )
+            found = result.rowcount > 0
+        else:
+            found = await session.scalar(select(Product.id).where(Product.id == self.product_id)) is not None
+        if not found:
+            await session.rollback()
+            return None
+
+        if self.deleted_image_ids:
+            await session.execute(
+                delete(ProductImage).where(
+                    ProductImage.id.in_(self.deleted_image_ids),
+                    ProductImage.product_id == self.product_id,
+                )
+            )
+        new_images = self.new_images
+        session.add_all(
+            ProductImage(
+                url=image["url"], file_id=image["file_id"],
+                file_unique_id=image["file_unique_id"], product_id=self.product_id,
+            )
+            for image in new_images
+        )
+        await session.commit()
+
+        changes = list(dict.fromkeys(FIELDS[name] for name in fields))
+        if new_images:
+            changes.append(f"+{len(new_images)} фото")
+        if self.deleted_image_ids:
+            changes.append(f"−{len(self.deleted_image_ids)} фото")
+        return changes
@@ -1,6 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from databases.pagination import Page
+from keyboards.pagination import page_buttons
+
 def get_admin_keyboard():
     builder = InlineKeyboardBuilder()
     
@@ -8,12 +11,28 @@ def get_admin_keyboard():
     builder.button(text="➕ Добавить товар", callback_data="admin_add_product")
     builder.button(text="✏️ Редактировать товар", callback_data="admin_edit_product")  # Добавлено
     builder.button(text="🗑️ Удалить товар", callback_data="admin_delete_product")
+    builder.button(text="📥 Загрузить каталог", callback_data="admin_bulk_import")
     
-    builder.adjust(2, 2)  # Размещаем по 2 кнопки в ряду
+    builder.adjust(2, 2, 1)  # Размещаем по 2 кнопки в ряду
     return builder.as_markup()
 
 
 
+def products_page_keyboard(page: Page, screen: str):
+    """Страница списка товаров: выбор для правки (admin_edit) или удаления (admin_delete)"""
+    prefix = "delete_product_" if screen == "admin_delete" else "select_product_"
+    cancel = "cancel_operation" if screen == "admin_delete" else "cancel_edit"
+
+    builder = InlineKeyboardBuilder()
+    for product in page:
+        builder.button(text=f"id({product.id}): {product.name[:30]}", callback_data=f"{prefix}{product.id}")
+    builder.adjust(1)
+
+    page_buttons(builder, page, screen)
+    builder.row(InlineKeyboardButton(text="❌ Отменить", callback_data=cancel))
+    return builder.as_markup()
+
+
 def get_edit_product_keyboard():
     """Клавиатура для выбора поля редактирования"""
     builder = InlineKeyboardBuilder()
@@ -97,4 +116,12 @@ def photos_start_keyboard():
     builder.button(text="⏭️ Пропустить", callback_data="skip_photos")
     builder.button(text="❌ Отмена", callback_data="cancel_operation")
     builder.adjust(1)
+    return builder.as_markup()
+
+
+def photos_added_keyboard():
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Готово", callback_data="photos_done")
+    builder.button(text="❌ Отмена", callback_data="cancel_operation")
+    builder.adjust(1)
     return builder.as_markup()
\ No newline at end of file
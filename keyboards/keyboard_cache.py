@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from aiogram.types import InlineKeyboardMarkup
+from environs import Env
+
+
+env = Env()
+env.read_env()
+
+KEYBOARD_CACHE_SIZE = env.int("KEYBOARD_CACHE_SIZE", 512)
+
+
+class KeyboardCache:
+    """
+    LRU-кэш готовых InlineKeyboardMarkup.
+
+    Ключ — (экран, parent_id, версия каталога, ...). После правки каталога
+    версия меняется, и старые клавиатуры просто вытесняются по LRU.
+    Закэшированную разметку нельзя изменять после выдачи.
+    """
+
+    def __init__(self, maxsize: int = KEYBOARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: OrderedDict[Hashable, InlineKeyboardMarkup] = OrderedDict()
+
+    def get_or_build(
+        self,
+        key: Hashable,
+        build: Callable[[], InlineKeyboardMarkup]
+    ) -> InlineKeyboardMarkup:
+        markup = self._items.get(key)
+        if markup is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return markup
+
+        self.misses += 1
+        markup = build()
+        self._items[key] = markup
+
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+        return markup
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+keyboard_cache = KeyboardCache()
@@ -0,0 +1,25 @@
+from aiogram.types import InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from databases.pagination import Page
+from handlers.callbacks import PageCallback
+
+
+def page_key(page: Page) -> tuple | None:
+    """Часть ключа кэша клавиатуры: какая это страница списка"""
+    return (page.items[0].id, page.items[-1].id, page.before, page.after) if page else None
+
+
+def page_buttons(builder: InlineKeyboardBuilder, page: Page, screen: str, parent_id: int = 0) -> None:
+    """Ряд ◀️ / ▶️, если у списка есть соседние страницы"""
+    buttons = []
+    if page.before is not None:
+        buttons.append(InlineKeyboardButton(
+            text="◀️", callback_data=PageCallback(screen=screen, parent_id=parent_id, before=page.before).pack()
+        ))
+    if page.after is not None:
+        buttons.append(InlineKeyboardButton(
+            text="▶️", callback_data=PageCallback(screen=screen, parent_id=parent_id, after=page.after).pack()
+        ))
+    if buttons:
+        builder.row(*buttons)
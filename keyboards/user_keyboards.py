@@ -1,21 +1,31 @@
-from aiogram.types import InlineKeyboardMarkup
-from sqlalchemy.ext.asyncio import AsyncSession
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from databases.crud import get_categories
+from databases.pagination import Page
 from handlers.callbacks import (
     BackCallback, ProductCallback, SubcategoryCallback,
     CategoryCallback, AskCallback)
+from keyboards.keyboard_cache import keyboard_cache
+from keyboards.pagination import page_buttons, page_key
 
 MANAGER_USERNAME = "mgnnbv"
 
 
 async def categories_keyboard(
-    session: AsyncSession,
-    row_amount: int = 2
+    categories: Page,
+    row_amount: int = 2,
+    version: int | None = None
 ) -> InlineKeyboardMarkup:
-    """Клавиатура с категориями товаров"""
-    categories = await get_categories(session)
+    """Клавиатура со страницей категорий товаров (version — версия каталога для кэша)"""
+    if version is None:
+        return _build_categories_keyboard(categories, row_amount)
 
+    return keyboard_cache.get_or_build(
+        ("categories", None, version, row_amount, page_key(categories)),
+        lambda: _build_categories_keyboard(categories, row_amount)
+    )
+
+
+def _build_categories_keyboard(categories: Page, row_amount: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     if not categories:
@@ -29,14 +39,27 @@ async def categories_keyboard(
                 callback_data=CategoryCallback(category_id=category.id).pack())
 
     builder.adjust(row_amount)
+    page_buttons(builder, categories, "catalog")
+    builder.row(InlineKeyboardButton(text="🔍 Поиск", callback_data="search_products"))
     return builder.as_markup()
 
 
 async def subcategories_keyboard(
-    subcategories, 
+    subcategories: Page, 
     category_id: int,  
-    row_amount: int = 1) -> InlineKeyboardMarkup:
-    """Клавиатура с подкатегориями"""
+    row_amount: int = 1,
+    version: int | None = None) -> InlineKeyboardMarkup:
+    """Клавиатура со страницей подкатегорий"""
+    if version is None:
+        return _build_subcategories_keyboard(subcategories, category_id, row_amount)
+
+    return keyboard_cache.get_or_build(
+        ("subcategories", category_id, version, row_amount, page_key(subcategories)),
+        lambda: _build_subcategories_keyboard(subcategories, category_id, row_amount)
+    )
+
+
+def _build_subcategories_keyboard(subcategories: Page, category_id: int, row_amount: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     if not subcategories:
@@ -55,19 +78,39 @@ async def subcategories_keyboard(
                     subcategory_id=subcategory.id
                 ).pack())
 
-    builder.button(
+    if subcategories:
+        builder.adjust(row_amount)
+    else:
+        builder.adjust(2)
+    page_buttons(builder, subcategories, "category", category_id)
+    builder.row(InlineKeyboardButton(
         text="⬅️ Назад",
-        callback_data=BackCallback(to="categories").pack())
-
-    builder.adjust(row_amount, 2, 1)
+        callback_data=BackCallback(to="categories", item_id=category_id).pack()))
     return builder.as_markup()
 
 
 async def products_keyboard(
-    products,
+    products: Page,
     subcategory_id: int | None = None,
     category_id: int | None = None,
-    row_amount: int = 1
+    row_amount: int = 1,
+    version: int | None = None
+) -> InlineKeyboardMarkup:
+    """Клавиатура со страницей товаров подкатегории (или категории без подкатегорий)"""
+    if version is None:
+        return _build_products_keyboard(products, subcategory_id, category_id, row_amount)
+
+    return keyboard_cache.get_or_build(
+        ("products", (subcategory_id, category_id), version, row_amount, page_key(products)),
+        lambda: _build_products_keyboard(products, subcategory_id, category_id, row_amount)
+    )
+
+
+def _build_products_keyboard(
+    products: Page,
+    subcategory_id: int | None,
+    category_id: int | None,
+    row_amount: int
 ) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
@@ -83,28 +126,47 @@ async def products_keyboard(
             callback_data="no_products"
         )
     
+    builder.adjust(row_amount)
+    if subcategory_id:
+        page_buttons(builder, products, "subcategory", subcategory_id)
+    else:
+        page_buttons(builder, products, "category", category_id or 0)
+
     if subcategory_id and category_id:
-        builder.button(
+        builder.row(InlineKeyboardButton(
             text="⬅️ Назад",
             callback_data=BackCallback(
                 to="subcategories",
-                parent_id=category_id  
-            ).pack()
-        )
-    elif category_id:
-        builder.button(
-            text="⬅️ Назад",
-            callback_data=BackCallback(
-                to="categories"
+                parent_id=category_id,
+                item_id=subcategory_id
             ).pack()
-        )
+        ))
     else:
-        builder.button(
+        builder.row(InlineKeyboardButton(
             text="⬅️ Назад",
-            callback_data=BackCallback(to="categories").pack()
-        )
+            callback_data=BackCallback(to="categories", item_id=category_id or 0).pack()
+        ))
     
-    builder.adjust(row_amount, 1)  
+    return builder.as_markup()
+
+
+def search_results_keyboard(products) -> InlineKeyboardMarkup:
+    """Клавиатура с найденными товарами"""
+    builder = InlineKeyboardBuilder()
+
+    for product in products:
+        builder.button(
+            text=f"📦 {product.name}",
+            callback_data=ProductCallback(product_id=product.id).pack()
+        )
+
+    builder.button(text="🔍 Новый поиск", callback_data="search_products")
+    builder.button(
+        text="⬅️ Назад в каталог",
+        callback_data=BackCallback(to="categories").pack()
+    )
+
+    builder.adjust(1)
     return builder.as_markup()
 
 
@@ -114,16 +176,30 @@ async def command_keyboard(
     product_id: int = None,
     empty: bool = False
 ) -> InlineKeyboardMarkup:
+    """Клавиатура действий (не зависит от каталога, кэшируется по аргументам)"""
+    return keyboard_cache.get_or_build(
+        ("command", (category_id, subcategory_id, product_id, empty), None),
+        lambda: _build_command_keyboard(category_id, subcategory_id, product_id, empty)
+    )
 
+
+def _build_command_keyboard(
+    category_id: int | None,
+    subcategory_id: int | None,
+    product_id: int | None,
+    empty: bool
+) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     # ---------- КНОПКА НАЗАД ----------
+    # item_id — откуда ушли: «Назад» открывает страницу списка с ним
     if empty and category_id:
         builder.button(
             text="⬅️ Назад к подкатегориям",
             callback_data=BackCallback(
                 to="subcategories",
-                parent_id=category_id
+                parent_id=category_id,
+                item_id=subcategory_id or 0
             ).pack()
         )
 
@@ -132,7 +208,19 @@ async def command_keyboard(
             text="⬅️ Назад к товарам",
             callback_data=BackCallback(
                 to="products",
-                parent_id=subcategory_id
+                parent_id=subcategory_id,
+                item_id=product_id
+            ).pack()
+        )
+
+    elif product_id and category_id:
+        # товар без подкатегории — в списке товаров категории
+        builder.button(
+            text="⬅️ Назад к товарам",
+            callback_data=BackCallback(
+                to="subcategories",
+                parent_id=category_id,
+                item_id=product_id
             ).pack()
         )
 
@@ -141,14 +229,15 @@ async def command_keyboard(
             text="⬅️ Назад к подкатегориям",
             callback_data=BackCallback(
                 to="subcategories",
-                parent_id=category_id
+                parent_id=category_id,
+                item_id=subcategory_id
             ).pack()
         )
 
     else:
         builder.button(
             text="⬅️ Назад в каталог",
-            callback_data=BackCallback(to="categories").pack()
+            callback_data=BackCallback(to="categories", item_id=category_id or 0).pack()
         )
 
     builder.button(
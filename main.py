@@ -10,14 +10,32 @@ import logging
 
 from aiogram.filters import Filter
 from aiogram.types import Message
-from handlers.for_users_handler import user_router
+from handlers.for_users_handler import MANAGER_CHAT_ID, order_outbox, user_router
 from handlers.for_admin_handlers import admin_router
+from databases.fsm_storage import create_fsm_storage
+from databases.search_index import product_search_index
+from databases.file_ids import file_id_writer
+from handlers.product_cards import product_cards
+from keyboards.keyboard_cache import keyboard_cache
+from middlewares.rate_limit import RATE_LIMIT_ENABLED, RATE_LIMIT_GLOBAL, OutgoingScheduler
+from middlewares.metrics import (
+    BotApiMetricsMiddleware, HandlerMetricsMiddleware, UpdateMetricsMiddleware,
+    instrument_engines, metrics, start_metrics_server,
+)
+from databases.engine import engine, pool_stats
+from databases.replicas import replica_router
+from middlewares.media_group import media_groups
 
 
 env = Env()
 env.read_env()
 
-session = AiohttpSession(proxy="http://127.0.0.1:12334")
+# Режим получения апдейтов: polling (по умолчанию), webhook или cluster
+BOT_MODE = env.str("BOT_MODE", "polling")
+# Прокси для запросов к Bot API, например http://127.0.0.1:12334. Пустой — без прокси.
+PROXY_URL = env.str("PROXY_URL", "")
+# Как часто писать в лог счётчики кэшей, сек. 0 — не писать.
+STATS_LOG_INTERVAL = env.float("STATS_LOG_INTERVAL", 300)
 
 
 MANAGERS_IDS = {5129105635, 123456789, 987654321}
@@ -25,14 +43,14 @@ MANAGERS_IDS = {5129105635, 123456789, 987654321}
 class IsUserFilter(Filter):
     def __init__(self, admin_ids: set):
         self.admin_ids = admin_ids
-    
+
     async def __call__(self, message: Message) -> bool:
         return message.from_user.id not in self.admin_ids
 
 class IsAdminFilter(Filter):
     def __init__(self, admin_ids: set):
         self.admin_ids = admin_ids
-    
+
     async def __call__(self, message: Message) -> bool:
         return message.from_user.id in self.admin_ids
 
@@ -40,29 +58,154 @@ class IsAdminFilter(Filter):
 logging.basicConfig(level=logging.INFO)
 
 
-async def main():
-
-    bot =  Bot(token=env('TOKEN'), default=DefaultBotProperties(parse_mode='HTML'), session=session)
+outgoing_scheduler: OutgoingScheduler | None = None
 
 
-    dp = Dispatcher()
-    dp.include_router(router=admin_router)  
+def create_bot(
+    session=None,
+    global_rate: float = RATE_LIMIT_GLOBAL,
+    rate_limit: bool = RATE_LIMIT_ENABLED,
+) -> Bot:
+    """Бот, исходящие сообщения которого идут через планировщик лимитов Telegram"""
+    global outgoing_scheduler
+    if session is None:
+        session = AiohttpSession(proxy=PROXY_URL) if PROXY_URL else AiohttpSession()
+
+    if rate_limit:
+        # уведомления менеджеру пропускают ответы пользователям вперёд
+        outgoing_scheduler = OutgoingScheduler(global_rate=global_rate, low_priority_chats={MANAGER_CHAT_ID})
+        session.middleware(outgoing_scheduler)
+        metrics.add_collector("outgoing", "scheduler", outgoing_scheduler.stats)
+    # после планировщика: время самого запроса, без ожидания лимитов
+    session.middleware(BotApiMetricsMiddleware(metrics))
+
+    return Bot(token=env('TOKEN'), default=DefaultBotProperties(parse_mode='HTML'), session=session)
+
+
+async def warm_search_index() -> None:
+    """Построить поисковый индекс до первых апдейтов"""
+    try:
+        await product_search_index.warm()
+    except Exception:
+        logging.exception("Не удалось построить поисковый индекс, он соберётся при первом поиске")
+
+
+async def log_cache_stats() -> None:
+    while True:
+        await asyncio.sleep(STATS_LOG_INTERVAL)
+        for name, cache in (("карточки товаров", product_cards), ("клавиатуры", keyboard_cache)):
+            logging.info("Кэш %s: %s", name, cache.stats())
+        if outgoing_scheduler is not None:
+            logging.info("Исходящие сообщения: %s", outgoing_scheduler.stats())
+
+
+_stats_task: asyncio.Task | None = None
+
+
+async def start_stats_logging() -> None:
+    global _stats_task
+    if STATS_LOG_INTERVAL > 0 and _stats_task is None:
+        _stats_task = asyncio.create_task(log_cache_stats())
+
+
+async def stop_stats_logging() -> None:
+    global _stats_task
+    if _stats_task is not None:
+        _stats_task.cancel()
+        _stats_task = None
+
+
+_metrics_runner = None
+
+
+async def start_metrics() -> None:
+    global _metrics_runner
+    if _metrics_runner is None:
+        _metrics_runner = await start_metrics_server(metrics)
+
+
+async def stop_metrics() -> None:
+    global _metrics_runner
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
+        _metrics_runner = None
+
+
+def setup_metrics(dp: Dispatcher) -> None:
+    """Время хендлеров, запросы к БД на апдейт и счётчики кэшей/очередей"""
+    instrument_engines(metrics)
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    # внутренние middleware диспетчера действуют и во вложенных роутерах
+    handler_metrics = HandlerMetricsMiddleware(metrics)
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+
+    metrics.add_collector("db_pool", "main", pool_stats.snapshot)
+    for replica in replica_router.replicas:
+        metrics.add_collector("db_pool", replica.name, replica.pool_stats.snapshot)
+    metrics.add_collector("db_replicas", "reads", replica_router.stats)
+    metrics.add_collector("cache", "product_cards", product_cards.stats)
+    metrics.add_collector("cache", "keyboards", keyboard_cache.stats)
+    metrics.add_collector("order_outbox", "manager", order_outbox.stats)
+    metrics.add_collector("media_groups", "messages", media_groups.stats)
+    dp.startup.register(start_metrics)
+    dp.shutdown.register(stop_metrics)
+
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер с роутерами админа и пользователя (вызывать один раз на процесс)"""
+    dp = Dispatcher(storage=create_fsm_storage())
+    # реплики проверяются до прогрева индекса: каталог сразу читается с них
+    dp.startup.register(replica_router.start)
+    dp.startup.register(warm_search_index)
+    dp.startup.register(start_stats_logging)
+    dp.startup.register(order_outbox.start)
+    dp.shutdown.register(file_id_writer.close)
+    dp.shutdown.register(order_outbox.stop)
+    dp.shutdown.register(stop_stats_logging)
+    dp.shutdown.register(replica_router.stop)
+    # последним: до него file_id и outbox дописывают в БД. Соединения aiosqlite
+    # держат потоки, без dispose процесс с SQLite не завершается
+    dp.shutdown.register(engine.dispose)
+    # альбом собирается до метрик: хендлер считается один раз на альбом
+    dp.message.middleware(media_groups)
+    setup_metrics(dp)
+    dp.include_router(router=admin_router)
     dp.include_router(router=user_router)
-    
+
 
     admin_router.name = "admin_router"
     user_router.name = "user_router"
-    
+
     admin_router.message.filter(IsAdminFilter(MANAGERS_IDS))
     admin_router.callback_query.filter(lambda cb: cb.from_user.id in MANAGERS_IDS)
 
     user_router.message.filter(IsUserFilter(MANAGERS_IDS))
     user_router.callback_query.filter(lambda cb: cb.from_user.id not in MANAGERS_IDS)
-    
 
-    await dp.start_polling(bot)
+    return dp
+
+
+async def main():
+
+    bot = create_bot()
+
+    if BOT_MODE == "cluster":
+        from cluster import run_cluster
+
+        # Диспетчеры создаются в воркерах, супервизор только раздаёт апдейты
+        await run_cluster(bot)
+        return
+
+    dp = create_dispatcher()
+
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+
+        await run_webhook(bot, dp)
+    else:
+        await dp.start_polling(bot)
 
 
 if __name__ == '__main__':
     asyncio.run(main())
-
@@ -0,0 +1,88 @@
+"""
+Альбомы одним вызовом хендлера.
+
+Telegram присылает альбом (media group) отдельным апдейтом на каждое фото.
+Для хендлеров с флагом album MediaGroupMiddleware задерживает первое фото
+альбома, пока приходят остальные (пауза MEDIA_GROUP_WINDOW без новых фото),
+и вызывает хендлер один раз: album — все сообщения альбома по порядку.
+Остальные апдейты альбома хендлер не вызывают. Одиночное сообщение
+проходит сразу, album = [message]. Части альбома должны обрабатываться
+параллельно с первой: в режиме кластера они обходят очередь чата (cluster.py).
+
+    @router.message(OrderStates.images, flags={"album": True})
+    async def order_images(message: Message, state: FSMContext, album: list[Message]): ...
+
+    dp.message.middleware(MediaGroupMiddleware())
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message
+from environs import Env
+
+
+env = Env()
+env.read_env()
+
+# Сколько ждать следующее фото альбома, сек. Части альбома приходят подряд
+MEDIA_GROUP_WINDOW = env.float("MEDIA_GROUP_WINDOW", 0.3)
+# Больше частей в альбоме Telegram не бывает: дальше ждать нечего
+MEDIA_GROUP_LIMIT = 10
+
+
+def media_group_key(update: dict[str, Any]) -> tuple[int, str] | None:
+    """(chat_id, media_group_id) для сырого апдейта с частью альбома"""
+    message = update.get("message")
+    if not message or "media_group_id" not in message:
+        return None
+    return message["chat"]["id"], message["media_group_id"]
+
+
+class MediaGroupMiddleware(BaseMiddleware):
+    """Inner middleware на message: альбом — один вызов хендлера с флагом album"""
+
+    def __init__(self, window: float = MEDIA_GROUP_WINDOW):
+        self.window = window
+        self._groups: dict[tuple[int, str], list[Message]] = {}
+        self.albums = 0
+        self.merged = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        if not get_flag(data, "album"):
+            return await handler(event, data)
+        if not event.media_group_id:
+            data["album"] = [event]
+            return await handler(event, data)
+
+        key = (event.chat.id, event.media_group_id)
+        group = self._groups.get(key)
+        if group is not None:
+            group.append(event)
+            self.merged += 1
+            return None
+
+        group = self._groups[key] = [event]
+        try:
+            received = 0
+            while len(group) != received and len(group) < MEDIA_GROUP_LIMIT:
+                received = len(group)
+                await asyncio.sleep(self.window)
+        finally:
+            del self._groups[key]
+
+        self.albums += 1
+        data["album"] = sorted(group, key=lambda message: message.message_id)
+        return await handler(event, data)
+
+    def stats(self) -> dict[str, int]:
+        return {"albums": self.albums, "merged": self.merged, "collecting": len(self._groups)}
+
+
+media_groups = MediaGroupMiddleware()
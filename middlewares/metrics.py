@@ -0,0 +1,380 @@
+"""
+Метрики обработки апдейтов: время каждого хендлера (роутер + имя функции)
+и его ошибки, запросы к БД на апдейт, время запросов к Bot API, а также
+счётчики кэшей, пула БД, планировщика и очереди заказов.
+
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    dp.message.middleware(HandlerMetricsMiddleware(metrics))
+    session.middleware(BotApiMetricsMiddleware(metrics))
+    metrics.add_collector("cache", "product_cards", product_cards.stats)
+
+metrics.render() — текст в формате Prometheus (его отдаёт start_metrics_server
+на METRICS_HOST:METRICS_PORT/metrics), metrics.summary() — сводка для /metrics
+в админке.
+"""
+import bisect
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+from environs import Env
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Адрес для Prometheus. METRICS_PORT=0 — не поднимать (в режиме кластера
+# порт займёт только первый процесс)
+METRICS_HOST = env.str("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = env.int("METRICS_PORT", 0)
+
+# Границы корзин гистограмм, сек — как у клиентов Prometheus
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: память не растёт с числом наблюдений"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последняя — выше всех границ (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам, как histogram_quantile в Prometheus"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def lines(self, name: str, labels: str) -> list[str]:
+        prefix = f"{labels}," if labels else ""
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class _UpdateUsage:
+    """Запросы к БД в рамках одного апдейта"""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_usage: contextvars.ContextVar[_UpdateUsage | None] = contextvars.ContextVar("update_db_usage", default=None)
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(value: str) -> str:
+    return "".join(char if char.isalnum() else "_" for char in value.lower())
+
+
+class Metrics:
+    def __init__(self):
+        self._collectors: dict[tuple[str, str], Callable[[], dict[str, float]]] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Обнулить накопленные метрики (источники add_collector остаются)"""
+        self.handlers: dict[tuple[str, str], Histogram] = {}
+        self.handler_errors: dict[tuple[str, str], int] = {}
+        self.updates = Histogram()
+        self.update_errors = 0
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram()
+        self.db_queries_total = 0
+        self.db_seconds_total = 0.0
+        self.api_calls: dict[str, Histogram] = {}
+        self.api_errors: dict[str, int] = {}
+
+    def add_collector(self, group: str, name: str, stats: Callable[[], dict[str, float]]) -> None:
+        """Источник счётчиков вида stats() у кэшей и очередей; читается при каждом render()"""
+        self._collectors[group, name] = stats
+
+    def observe_handler(self, router: str, handler: str, seconds: float, failed: bool) -> None:
+        key = router, handler
+        histogram = self.handlers.get(key)
+        if histogram is None:
+            histogram = self.handlers[key] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.handler_errors[key] = self.handler_errors.get(key, 0) + 1
+
+    def observe_api_call(self, method: str, seconds: float, failed: bool) -> None:
+        histogram = self.api_calls.get(method)
+        if histogram is None:
+            histogram = self.api_calls[method] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.api_errors[method] = self.api_errors.get(method, 0) + 1
+
+    def observe_query(self, seconds: float) -> None:
+        self.db_queries_total += 1
+        self.db_seconds_total += seconds
+        usage = _usage.get()
+        if usage is not None:
+            usage.queries += 1
+            usage.seconds += seconds
+
+    def _collected(self):
+        for (group, name), stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception:
+                logger.exception("Не удалось снять метрики %s %s", group, name)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    yield group, name, key, value
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = [
+            "# HELP bot_handler_duration_seconds Время хендлера апдейта",
+            "# TYPE bot_handler_duration_seconds histogram",
+        ]
+        for (router, handler), histogram in sorted(self.handlers.items()):
+            lines += histogram.lines("bot_handler_duration_seconds", _labels(router=router, handler=handler))
+        lines += ["# HELP bot_handler_errors_total Исключения в хендлере", "# TYPE bot_handler_errors_total counter"]
+        for (router, handler), errors in sorted(self.handler_errors.items()):
+            lines.append(f"bot_handler_errors_total{{{_labels(router=router, handler=handler)}}} {errors}")
+
+        lines += ["# HELP bot_update_duration_seconds Полное время апдейта", "# TYPE bot_update_duration_seconds histogram"]
+        lines += self.updates.lines("bot_update_duration_seconds", "")
+        lines += ["# TYPE bot_update_errors_total counter", f"bot_update_errors_total {self.update_errors}"]
+
+        lines += ["# HELP bot_update_db_queries Запросов к БД за апдейт", "# TYPE bot_update_db_queries histogram"]
+        lines += self.db_queries.lines("bot_update_db_queries", "")
+        lines += ["# HELP bot_update_db_seconds Время запросов к БД за апдейт", "# TYPE bot_update_db_seconds histogram"]
+        lines += self.db_seconds.lines("bot_update_db_seconds", "")
+        lines += [
+            "# TYPE bot_db_queries_total counter", f"bot_db_queries_total {self.db_queries_total}",
+            "# TYPE bot_db_query_seconds_total counter", f"bot_db_query_seconds_total {self.db_seconds_total:.6f}",
+        ]
+
+        lines += ["# HELP bot_api_request_duration_seconds Запрос к Bot API", "# TYPE bot_api_request_duration_seconds histogram"]
+        for method, histogram in sorted(self.api_calls.items()):
+            lines += histogram.lines("bot_api_request_duration_seconds", _labels(method=method))
+        lines += ["# TYPE bot_api_errors_total counter"]
+        for method, errors in sorted(self.api_errors.items()):
+            lines.append(f"bot_api_errors_total{{{_labels(method=method)}}} {errors}")
+
+        declared = set()
+        for group, name, key, value in self._collected():
+            metric = f"bot_{_metric_name(group)}_{_metric_name(key)}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{{{_labels(name=name)}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top: int = 10) -> str:
+        """Короткая сводка для админа: самые медленные хендлеры, БД, Bot API, кэши"""
+        lines = [f"📈 <b>Метрики</b> (апдейтов: {self.updates.count}, ошибок: {self.update_errors})", ""]
+
+        slowest = sorted(self.handlers.items(), key=lambda item: item[1].quantile(0.95), reverse=True)[:top]
+        if slowest:
+            lines.append("<b>Хендлеры</b> (p50 / p95, мс, вызовов, ошибок):")
+        for (router, handler), histogram in slowest:
+            errors = self.handler_errors.get((router, handler), 0)
+            lines.append(
+                f"• {router}.{handler}: {histogram.quantile(0.5) * 1000:.1f} / "
+                f"{histogram.quantile(0.95) * 1000:.1f}, {histogram.count}, {errors}"
+            )
+
+        if self.db_queries.count:
+            lines += [
+                "",
+                f"<b>БД за апдейт</b>: запросов в среднем {self.db_queries.sum / self.db_queries.count:.1f}, "
+                f"p95 {self.db_queries.quantile(0.95):.0f}; время p95 {self.db_seconds.quantile(0.95) * 1000:.1f} мс",
+            ]
+
+        if self.api_calls:
+            lines += ["", "<b>Bot API</b> (p50 / p95, мс, вызовов, ошибок):"]
+        for method, histogram in sorted(self.api_calls.items(), key=lambda item: -item[1].count)[:top]:
+            lines.append(
+                f"• {method}: {histogram.quantile(0.5) * 1000:.1f} / {histogram.quantile(0.95) * 1000:.1f}, "
+                f"{histogram.count}, {self.api_errors.get(method, 0)}"
+            )
+
+        collected: dict[tuple[str, str], list[str]] = {}
+        for group, name, key, value in self._collected():
+            collected.setdefault((group, name), []).append(f"{key}={value:.3g}" if isinstance(value, float) else f"{key}={value}")
+        if collected:
+            lines.append("")
+        for (group, name), values in collected.items():
+            lines.append(f"<b>{group} {name}</b>: {', '.join(values)}")
+        return "\n".join(lines)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: полное время апдейта и запросы к БД за него"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        usage = _UpdateUsage()
+        token = _usage.set(usage)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.update_errors += 1
+            raise
+        finally:
+            _usage.reset(token)
+            self.metrics.updates.observe(time.perf_counter() - started)
+            self.metrics.db_queries.observe(usage.queries)
+            self.metrics.db_seconds.observe(usage.seconds)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware (dp.message, dp.callback_query): время и ошибки хендлера"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        router = data.get("event_router")
+        callback = data["handler"].callback
+        router_name = router.name if router is not None else "?"
+        handler_name = getattr(callback, "__name__", type(callback).__name__)
+
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe_handler(router_name, handler_name, time.perf_counter() - started, failed)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: время запроса к Bot API по методам. Ставится
+    после OutgoingScheduler, чтобы не считать ожидание лимитов (оно в его stats()).
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.metrics.observe_api_call(method.__api_method__, time.perf_counter() - started, failed)
+
+
+def instrument_engines(metrics: Metrics) -> None:
+    """Считать запросы всех движков SQLAlchemy (в том числе созданных позже)"""
+    global _instrumented
+    if _instrumented is metrics:
+        return
+    _instrumented = metrics
+
+    def finished(connection) -> None:
+        starts = connection.info.get("metrics_query_start") if connection is not None else None
+        if starts:
+            metrics.observe_query(time.perf_counter() - starts.pop())
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        finished(conn)
+
+    @event.listens_for(Engine, "handle_error")
+    def on_error(context):
+        finished(context.connection)
+
+
+_instrumented: Metrics | None = None
+
+
+async def start_metrics_server(
+    metrics: Metrics, host: str = METRICS_HOST, port: int = METRICS_PORT,
+) -> web.AppRunner | None:
+    """HTTP /metrics для Prometheus; None, если порт не задан или занят"""
+    if not port:
+        return None
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+    except OSError as e:
+        logger.warning("Метрики не поднялись на %s:%s: %s", host, port, e)
+        await runner.cleanup()
+        return None
+    logger.info("Метрики: http://%s:%s/metrics", host, port)
+    return runner
+
+
+metrics = Metrics()
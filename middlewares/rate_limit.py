@@ -0,0 +1,235 @@
+"""
+Планировщик исходящих запросов к Bot API.
+
+Ставится middleware на сессию бота и пропускает отправку сообщений
+(send*, copy*, forward*) через корзины токенов с лимитами Telegram:
+общий (~30 сообщений/с), на личный чат и на группу (20 в минуту).
+Когда общий лимит исчерпан, первыми уходят ответы пользователям, а
+уведомления менеджерам (чаты low_priority_chats или блок
+outgoing_priority(Priority.NOTIFICATION)) ждут. На 429 чат и общая
+очередь ставятся на паузу retry_after, запрос повторяется.
+
+    session.middleware(OutgoingScheduler(low_priority_chats={MANAGER_CHAT_ID}))
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from environs import Env
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Выключать только для нагрузочных прогонов с заглушкой Bot API
+RATE_LIMIT_ENABLED = env.bool("RATE_LIMIT_ENABLED", True)
+# Сообщений в секунду на весь бот
+RATE_LIMIT_GLOBAL = env.float("RATE_LIMIT_GLOBAL", 30)
+# Сообщений в секунду в личный чат и сколько можно отправить подряд без паузы
+RATE_LIMIT_CHAT = env.float("RATE_LIMIT_CHAT", 1)
+RATE_LIMIT_CHAT_BURST = env.int("RATE_LIMIT_CHAT_BURST", 3)
+# Сообщений в минуту в группу
+RATE_LIMIT_GROUP_PER_MINUTE = env.float("RATE_LIMIT_GROUP_PER_MINUTE", 20)
+# Сколько раз повторять запрос после 429
+RATE_LIMIT_MAX_RETRIES = env.int("RATE_LIMIT_MAX_RETRIES", 3)
+
+# Сколько корзин чатов держать, прежде чем выбрасывать простаивающие
+_CHAT_LANES_LIMIT = 10_000
+
+_LIMITED_PREFIXES = ("send", "copy", "forward")
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # ответы пользователю
+    NOTIFICATION = 1  # уведомления менеджерам, рассылки
+
+
+_priority: contextvars.ContextVar[Priority | None] = contextvars.ContextVar("outgoing_priority", default=None)
+
+
+@contextmanager
+def outgoing_priority(priority: Priority):
+    """Приоритет всех сообщений, отправленных внутри блока"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до свободного токена (0 — можно сейчас)"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие seconds секунд"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _ChatLane:
+    """Корзина чата и замок, чтобы сообщения одного чата шли по порядку"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.lock = asyncio.Lock()
+
+
+class OutgoingScheduler(BaseRequestMiddleware):
+    def __init__(
+        self,
+        global_rate: float = RATE_LIMIT_GLOBAL,
+        chat_rate: float = RATE_LIMIT_CHAT,
+        chat_burst: int = RATE_LIMIT_CHAT_BURST,
+        group_per_minute: float = RATE_LIMIT_GROUP_PER_MINUTE,
+        low_priority_chats=(),
+        max_retries: int = RATE_LIMIT_MAX_RETRIES,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60
+        self.low_priority_chats = set(low_priority_chats)
+        self.max_retries = max_retries
+
+        # общий лимит — равномерно, без пачек: Telegram считает сообщения
+        # за любую секунду, а не за секунду от первой отправки
+        self._global = TokenBucket(global_rate, 1)
+        self._chats: dict[int | str, _ChatLane] = {}
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._pump: asyncio.Task | None = None
+
+        self.sent = 0
+        self.retries = 0
+        self.max_queue = 0
+        self.wait_total = {priority: 0.0 for priority in Priority}
+        self.wait_max = {priority: 0.0 for priority in Priority}
+        self.waited = {priority: 0 for priority in Priority}
+
+    def _lane(self, chat_id: int | str) -> _ChatLane:
+        lane = self._chats.get(chat_id)
+        if lane is None:
+            if len(self._chats) >= _CHAT_LANES_LIMIT:
+                self._chats = {
+                    key: value for key, value in self._chats.items()
+                    if value.lock.locked() or not value.bucket.idle
+                }
+            # id групп и каналов отрицательные, @username — только у каналов
+            group = isinstance(chat_id, str) or chat_id < 0
+            bucket = (
+                TokenBucket(self.group_rate, self.chat_burst) if group
+                else TokenBucket(self.chat_rate, self.chat_burst)
+            )
+            lane = self._chats[chat_id] = _ChatLane(bucket)
+        return lane
+
+    def _priority_of(self, chat_id) -> Priority:
+        priority = _priority.get()
+        if priority is not None:
+            return priority
+        return Priority.NOTIFICATION if chat_id in self.low_priority_chats else Priority.INTERACTIVE
+
+    async def _run_pump(self) -> None:
+        """Выпускает очередь по общему лимиту, сначала более срочные"""
+        while self._queue:
+            delay = self._global.delay()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                self._global.take()
+                waiter.set_result(None)
+
+    async def _acquire(self, lane: _ChatLane, priority: Priority) -> None:
+        # токен чата берём только после общей очереди: пока держим замок,
+        # токенов в корзине чата может стать только больше
+        delay = lane.bucket.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), waiter))
+        self.max_queue = max(self.max_queue, len(self._queue))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await waiter
+        lane.bucket.take()
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not method.__api_method__.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        priority = self._priority_of(chat_id)
+        lane = self._lane(chat_id)
+        for attempt in itertools.count():
+            started = time.monotonic()
+            async with lane.lock:
+                await self._acquire(lane, priority)
+
+            waited = time.monotonic() - started
+            self.waited[priority] += 1
+            self.wait_total[priority] += waited
+            self.wait_max[priority] = max(self.wait_max[priority], waited)
+
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retries += 1
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning("429 для чата %s, пауза %s с", chat_id, e.retry_after)
+                # по ответу не понять, превышен лимит чата или общий, поэтому
+                # ждут оба: так 429 не идут пачкой, пока бот выше лимита
+                lane.bucket.pause(e.retry_after)
+                self._global.pause(e.retry_after)
+                continue
+
+            self.sent += 1
+            return response
+
+    def stats(self) -> dict[str, float]:
+        stats = {
+            "sent": self.sent,
+            "retries": self.retries,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "chats": len(self._chats),
+        }
+        for priority in Priority:
+            name = priority.name.lower()
+            count = self.waited[priority]
+            stats[f"{name}_wait_avg_ms"] = self.wait_total[priority] / count * 1000 if count else 0.0
+            stats[f"{name}_wait_max_ms"] = self.wait_max[priority] * 1000
+        return stats
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import secrets
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from environs import Env
+
+from middlewares.concurrency import ConcurrencyLimitMiddleware
+
+
+env = Env()
+env.read_env()
+
+logger = logging.getLogger(__name__)
+
+# Публичный адрес, на который Telegram шлёт апдейты (без пути). Если пустой —
+# вебхук не регистрируется (например, его выставили вручную или это локальный стенд).
+WEBHOOK_BASE_URL = env.str("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = env.str("WEBHOOK_PATH", "/webhook")
+# Секрет заголовка X-Telegram-Bot-Api-Secret-Token. Пустой — случайный на каждый
+# запуск; тогда вебхук должен регистрировать сам бот (WEBHOOK_BASE_URL задан).
+WEBHOOK_SECRET = env.str("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = env.str("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = env.int("WEBHOOK_PORT", 8080)
+# Сколько апдейтов обрабатывается одновременно внутри процесса
+WEBHOOK_MAX_CONCURRENCY = env.int("WEBHOOK_MAX_CONCURRENCY", 100)
+# Сколько параллельных соединений Telegram открывает к вебхуку (1-100)
+WEBHOOK_MAX_CONNECTIONS = env.int("WEBHOOK_MAX_CONNECTIONS", 40)
+
+
+def create_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    path: str = WEBHOOK_PATH,
+    secret_token: str = WEBHOOK_SECRET,
+    max_concurrency: int = WEBHOOK_MAX_CONCURRENCY,
+) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты Telegram"""
+    limiter = ConcurrencyLimitMiddleware(max_concurrency)
+    dp.update.outer_middleware(limiter)
+
+    app = web.Application()
+    app["concurrency_limiter"] = limiter
+
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=True,
+    ).register(app, path=path)
+
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def register_webhook(bot: Bot, webhook_secret: str) -> None:
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=webhook_secret,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=["message", "callback_query"],
+    )
+    logger.info("Вебхук зарегистрирован: %s%s", WEBHOOK_BASE_URL, WEBHOOK_PATH)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Запуск бота в режиме вебхука"""
+    if not WEBHOOK_BASE_URL and not WEBHOOK_SECRET:
+        # вебхук выставлен вручную: случайный секрет Telegram не узнает и все апдейты будут отклонены
+        raise RuntimeError(
+            "WEBHOOK_BASE_URL пуст, значит вебхук регистрируется вручную: "
+            "задайте WEBHOOK_SECRET тот же, что передан Telegram в setWebhook"
+        )
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    if WEBHOOK_BASE_URL:
+        dp["webhook_secret"] = secret
+        dp.startup.register(register_webhook)
+
+    app = create_webhook_app(bot, dp, secret_token=secret)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    logger.info("Вебхук слушает %s:%s%s", WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()